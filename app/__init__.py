@@ -3,18 +3,27 @@
 import os
 import uuid
 import click
+import pytz
 from .commands import register_commands
 from flask import Flask, render_template, request, session, g
 from dotenv import load_dotenv
 from flask_talisman import Talisman
-from flask_assets import Environment, Bundle
+from werkzeug.middleware.proxy_fix import ProxyFix
 from whitenoise import WhiteNoise
 
 # Charger les variables d'environnement
 basedir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
 load_dotenv(dotenv_path=os.path.join(basedir, '.env'))
 
-from .extensions import db, bcrypt, login_manager, mail, moment, csrf, migrate, assets, sitemap
+from .extensions import db, bcrypt, login_manager, mail, moment, csrf, migrate, assets, sitemap, db_router, limiter, cache, lazy_context, compressor
+from .utils.rate_limits import rate_limit_exceeded
+from .utils.asset_pipeline import register_bundles, init_asset_manifest, is_immutable_file
+from .utils.streaming import init_streaming
+from .serving import build_engine_options
+from .identity import init_identity
+from .utils.image_helpers import image_url
+from .payments.webhooks import worker as webhook_worker
+from .utils.notification_worker import worker as notification_worker
 
 # Configuration du LoginManager
 login_manager.login_view = 'auth.login'
@@ -27,8 +36,6 @@ def create_app(config_overrides=None):
     """Crée et configure une instance de l'application Flask."""
     app = Flask(__name__, template_folder=os.path.join(basedir, 'templates'), static_folder=os.path.join(basedir, 'static'))
 
-    app = Flask(__name__, template_folder=os.path.join(basedir, 'templates'), static_folder=os.path.join(basedir, 'static'))
-
     # Configuration de l'application
     app.config.from_mapping(
         SECRET_KEY=os.environ.get('SECRET_KEY'),
@@ -36,6 +43,8 @@ def create_app(config_overrides=None):
         
         SQLALCHEMY_DATABASE_URI=os.environ.get('DATABASE_URL') or 'sqlite:///' + os.path.join(basedir, 'site.db'),
         SQLALCHEMY_TRACK_MODIFICATIONS=False,
+        # Réplique en lecture seule (optionnelle) pour le trafic de consultation du catalogue
+        SQLALCHEMY_BINDS={'replica': os.environ['DATABASE_REPLICA_URL']} if os.environ.get('DATABASE_REPLICA_URL') else {},
         MOMENT_DEFAULT_LOCALE='fr',
         MAIL_SERVER='smtp.gmail.com',
         MAIL_PORT=587,
@@ -48,14 +57,56 @@ def create_app(config_overrides=None):
         STRIPE_PUBLIC_KEY=os.environ.get('STRIPE_PUBLIC_KEY'),
         STRIPE_SECRET_KEY=os.environ.get('STRIPE_SECRET_KEY'),
         STRIPE_ENDPOINT_SECRET=os.environ.get('STRIPE_ENDPOINT_SECRET'),
+        # Adresse de l'API Stripe (à remplacer par un bouchon local pour les tests)
+        STRIPE_API_BASE=os.environ.get('STRIPE_API_BASE'),
+        STRIPE_TIMEOUT_SECONDS=10,
+        STRIPE_SESSION_TTL_SECONDS=3600,
+        STRIPE_SESSION_REUSE_MARGIN_SECONDS=300,
+        STRIPE_SWEEP_GRACE_SECONDS=3600,
         ENABLE_ORANGE_MONEY=os.environ.get('ENABLE_ORANGE_MONEY') == '1',
         ENABLE_WAVE_MONEY=os.environ.get('ENABLE_WAVE_MONEY') == '1',
+        WAVE_WEBHOOK_SECRET=os.environ.get('WAVE_WEBHOOK_SECRET'),
+        ORANGE_MONEY_WEBHOOK_SECRET=os.environ.get('ORANGE_MONEY_WEBHOOK_SECRET'),
+        CLOUDINARY_CLOUD_NAME=os.environ.get('CLOUDINARY_CLOUD_NAME'),
+        CLOUDINARY_API_KEY=os.environ.get('CLOUDINARY_API_KEY'),
+        CLOUDINARY_API_SECRET=os.environ.get('CLOUDINARY_API_SECRET'),
         SITEMAP_URL_SCHEME='https',
+        # Stockage partagé des compteurs de limitation (ex. redis://...) ; memory:// est propre à chaque worker
+        RATELIMIT_STORAGE_URI=os.environ.get('RATELIMIT_STORAGE_URI', 'memory://'),
+        # Nombre de proxys de confiance devant l'application (1 derrière le routeur Heroku, qui définit DYNO) :
+        # seules les adresses qu'ils ajoutent à X-Forwarded-For sont crues (limitation par IP)
+        TRUSTED_PROXY_COUNT=int(os.environ.get('TRUSTED_PROXY_COUNT', 1 if os.environ.get('DYNO') else 0)),
+        BCRYPT_MAX_CONCURRENT=int(os.environ.get('BCRYPT_MAX_CONCURRENT', 2)),
+        # Cache partagé (ex. RedisCache avec CACHE_REDIS_URL) ; SimpleCache est propre à chaque worker
+        CACHE_TYPE=os.environ.get('CACHE_TYPE', 'SimpleCache'),
+        CACHE_REDIS_URL=os.environ.get('CACHE_REDIS_URL'),
+        CACHE_DEFAULT_TIMEOUT=300,
+        # Délai maximal avant qu'un worker voie une modification du catalogue faite ailleurs
+        CATALOG_SNAPSHOT_CHECK_SECONDS=int(os.environ.get('CATALOG_SNAPSHOT_CHECK_SECONDS', 5)),
+        SMART_SHOPPING_RESERVATION_HOURS=24,
+        # Destinataires du récapitulatif de stock faible (par défaut : les administrateurs)
+        LOW_STOCK_DIGEST_RECIPIENTS=[email.strip() for email in os.environ.get('LOW_STOCK_DIGEST_RECIPIENTS', '').split(',') if email.strip()],
+        # Fuseau d'affichage des dates enregistrées en UTC (filtre local_datetime)
+        DISPLAY_TIMEZONE=os.environ.get('DISPLAY_TIMEZONE', 'Europe/Paris'),
+        # Pages lourdes envoyées au fil du rendu (voir utils/streaming.py)
+        STREAM_TEMPLATES=os.environ.get('STREAM_TEMPLATES', '1') == '1',
+        # Compression gzip/brotli des pages et du JSON (voir utils/compression.py)
+        COMPRESS_RESPONSES=os.environ.get('COMPRESS_RESPONSES', '1') == '1',
     )
 
     if config_overrides:
         app.config.update(config_overrides)
 
+    # Traitement en arrière-plan : 'thread' (défaut, un thread par worker web) ou 'external'
+    # (processus dédié, voir `flask send-notifications --loop` et `flask process-webhooks --loop`)
+    for worker_setting in ('NOTIFICATION_WORKER', 'WEBHOOK_WORKER'):
+        if os.environ.get(worker_setting):
+            app.config.setdefault(worker_setting, os.environ[worker_setting])
+
+    # Pool de connexions dimensionné selon le profil de service (workers x threads)
+    app.config.setdefault('SQLALCHEMY_ENGINE_OPTIONS',
+                          build_engine_options(app.config['SQLALCHEMY_DATABASE_URI']))
+
     # Désactiver le cache Jinja2 en mode debug pour s'assurer que les modifications de template sont prises en compte
     if app.debug:
         app.jinja_env.cache = None
@@ -70,14 +121,17 @@ def create_app(config_overrides=None):
     migrate.init_app(app, db)
     assets.init_app(app)
     sitemap.init_app(app)
-
-    # Configuration explicite de Cloudinary
-    import cloudinary
-    cloudinary.config(
-        cloud_name=os.environ.get('CLOUDINARY_CLOUD_NAME'),
-        api_key=os.environ.get('CLOUDINARY_API_KEY'),
-        api_secret=os.environ.get('CLOUDINARY_API_SECRET')
-    )
+    db_router.init_app(app)
+    limiter.init_app(app)
+    cache.init_app(app)
+    lazy_context.init_app(app)
+    init_streaming(app)
+    compressor.init_app(app)
+    init_identity(app, login_manager)
+    webhook_worker.init_app(app)
+    notification_worker.init_app(app)
+
+    # Cloudinary est configuré à la première utilisation (voir utils/image_helpers.py)
     if app.config["TESTING"]:
         Talisman(app, force_https=False)
     else:
@@ -103,62 +157,54 @@ def create_app(config_overrides=None):
             }
         )
 
+    if app.config['TRUSTED_PROXY_COUNT']:
+        app.wsgi_app = ProxyFix(app.wsgi_app, x_for=app.config['TRUSTED_PROXY_COUNT'])
+
     # Whitenoise for static files
     if not app.config.get('TESTING'):
-        app.wsgi_app = WhiteNoise(app.wsgi_app, root=os.path.join(basedir, 'static'))
-
-    # Définition des bundles d'assets
-    css_bundle = Bundle(
-        'css/bootstrap.min.css',
-        'css/custom.css',
-        filters='cssmin',
-        output='gen/packed.css'
-    )
-    js_bundle = Bundle(
-        'js/bootstrap.bundle.min.js',
-        filters='jsmin',
-        output='gen/packed.js'
-    )
+        # Les fichiers empreintés (gen/*.<hash>.*) sont servis avec un cache d'un an 'immutable'
+        app.wsgi_app = WhiteNoise(app.wsgi_app, root=os.path.join(basedir, 'static'),
+                                  immutable_file_test=is_immutable_file)
 
-    # Enregistrement des bundles
-    if 'css_all' not in assets:
-        assets.register('css_all', css_bundle)
-    if 'js_all' not in assets:
-        assets.register('js_all', js_bundle)
+    # Enregistrement des bundles d'assets. Ils sont compilés en amont par
+    # `flask build-assets` ; les templates passent par le manifeste généré.
+    register_bundles(assets)
+    init_asset_manifest(app)
 
     from . import models
+    # Versions du catalogue (hooks de session)
+    from . import versioning
+    # Instantané du catalogue en mémoire, invalidé après les commits qui le modifient
+    from . import catalog_snapshot
+    # Alertes de stock faible ouvertes et fermées à chaque flush
+    from .utils import stock_alerts
+    # Veilles de prix évaluées au commit d'un changement de prix
+    from .utils import price_watch
+    # Retours en stock enregistrés au commit, diffusés par le worker de notifications
+    from .utils import restock
+    # Statistiques clients recalculées au commit d'un changement de statut
+    from .utils import customer_stats
+    from .utils import sales_facts
+    # Métadonnées des réalisations calculées au flush, cartes en cache invalidées au commit
+    from .utils import post_media
 
     with app.app_context():
         # Importer les modèles ici pour éviter les importations circulaires
         from .models import StaffUser, Customer, Product, ContactMessage, Category, PageVisit, Banner, NewsletterSubscriber
         from .forms import NewsletterForm
 
-        @login_manager.user_loader
-        def load_user(user_id_str):
-            try:
-                user_type, user_id = user_id_str.split('-')
-                user_id = int(user_id)
-            except (ValueError, TypeError):
-                return None
-
-            if user_type == 'staff':
-                return db.session.get(StaffUser, user_id)
-            elif user_type == 'customer':
-                return db.session.get(Customer, user_id)
-            return None
-
         @app.context_processor
         def inject_user_type():
             return dict(isinstance=isinstance, StaffUser=StaffUser, Customer=Customer)
 
-        @app.context_processor
-        def inject_active_banners():
-            active_banners = db.session.execute(Banner.get_active_banners().order_by(Banner.position, Banner.created_at.desc())).scalars().all()
-            return dict(active_banners=active_banners)
+        # Valeurs calculées seulement si le template les lit (voir utils/lazy_context.py)
+        @lazy_context.value('active_banners')
+        def active_banners():
+            return db.session.execute(Banner.get_active_banners().order_by(Banner.position, Banner.created_at.desc())).scalars().all()
 
-        @app.context_processor
-        def inject_newsletter_form():
-            return dict(newsletter_form=NewsletterForm())
+        @lazy_context.value('newsletter_form')
+        def newsletter_form():
+            return NewsletterForm()
 
         # Gestion des erreurs de l'application
         @app.before_request
@@ -166,9 +212,10 @@ def create_app(config_overrides=None):
             if app.config.get('TESTING'):
                 return
             # On ne veut pas enregistrer les visites pour les fichiers statiques
-            # ou pour les requêtes de l'API de webhook Stripe, pour ne pas polluer les stats.
+            # ou pour les webhooks de paiement, pour ne pas polluer les stats.
             if (request.path.startswith('/static') or
-                request.path.startswith('/auth/stripe-webhook')):
+                request.path.startswith('/stripe-webhook') or
+                request.path.startswith('/paiements/webhook')):
                 return
 
             # Gérer l'identifiant de session
@@ -196,6 +243,8 @@ def create_app(config_overrides=None):
             """Gère les erreurs 404 (page non trouvée)."""
             return render_template('404.html'), 404
 
+        app.register_error_handler(429, rate_limit_exceeded)
+
         @app.errorhandler(500)
         def internal_error(error):
             """Gère les erreurs 500 (erreur interne du serveur)."""
@@ -224,19 +273,25 @@ def create_app(config_overrides=None):
         from .wishlist import wishlist as wishlist_blueprint
         app.register_blueprint(wishlist_blueprint, url_prefix='/wishlist')
 
-        from flask import url_for
+        from .payments import payments as payments_blueprint
+        app.register_blueprint(payments_blueprint)
+
+        from .api import api_bp
+        app.register_blueprint(api_bp, url_prefix='/api/v1')
 
         @app.template_filter('image_url')
         def image_url_filter(image_file_value):
-            if image_file_value and 'cloudinary' in image_file_value:
-                return image_file_value
-            else:
-                # Utilise un nom de fichier par défaut si la valeur est vide
-                filename = 'images/' + (image_file_value or 'default.jpg')
-                return url_for('static', filename=filename)
+            return image_url(image_file_value)
 
         @app.template_filter('format_price')
         def format_price_filter(value):
             return "{:,.2f} FCFA".format(value)
 
+        @app.template_filter('local_datetime')
+        def local_datetime_filter(value, fmt='%d/%m/%Y à %H:%M'):
+            # Les dates sont enregistrées en UTC, sans fuseau
+            if value.tzinfo is None:
+                value = pytz.utc.localize(value)
+            return value.astimezone(pytz.timezone(app.config['DISPLAY_TIMEZONE'])).strftime(fmt)
+
         return app
@@ -0,0 +1,159 @@
+'''
+Listes de l'administration : colonnes déclarées, filtres, tris et pagination
+par curseur.
+
+Une `AdminListing` décrit une liste une fois pour toutes. `listing.page(args)`
+ne sélectionne que les colonnes affichées (plus la clé primaire) et lit
+`per_page + 1` lignes après (ou avant) le curseur de la page courante : le
+tri est complété par la clé primaire, et une page coûte une lecture d'index
+quelle que soit sa position dans la table, là où OFFSET relit toutes les
+lignes précédentes. Les clés de tri doivent donc être des colonnes non nulles,
+de préférence indexées.
+
+Les lignes sont rendues par les macros de templates/admin/_listing.html, qui
+formatent les dates dans le fuseau DISPLAY_TIMEZONE (filtre `local_datetime`).
+'''
+from typing import NamedTuple
+import sqlalchemy as sa
+from flask import url_for
+from ..extensions import db
+from ..utils.pagination import encode_cursor, decode_cursor, after_cursor
+
+SORT_ORDERS = ('asc', 'desc')
+# Paramètres de navigation : remis à zéro quand le tri ou les filtres changent
+CURSOR_ARGS = ('after', 'before')
+
+
+class ListColumn(NamedTuple):
+    """Colonne affichée ; `format` : None, 'datetime', 'date', 'bool', 'truncate' ou 'image'."""
+    name: str
+    label: str
+    expression: object
+    sortable: bool = False
+    format: str = None
+
+
+class ListFilter(NamedTuple):
+    """Filtre lu dans le paramètre `name` ; `choices` donne une liste déroulante."""
+    name: str
+    label: str
+    criterion: object  # valeur saisie -> critère SQL
+    choices: tuple = ()
+
+
+def search_filter(label, *expressions):
+    """Recherche texte (paramètre `q`) dans les colonnes données."""
+    return ListFilter('q', label, lambda value: sa.or_(*(expression.ilike(f'%{value}%')
+                                                        for expression in expressions)))
+
+
+def choice_filter(name, label, expression, choices):
+    """Égalité avec l'une des valeurs proposées ; les autres valeurs sont ignorées."""
+    allowed = {str(value) for value, _ in choices}
+    return ListFilter(name, label, lambda value: expression == value if value in allowed else None,
+                      tuple(choices))
+
+
+class ListingPage:
+    """Une page de résultats, avec de quoi construire les liens de tri, de filtre et de navigation."""
+
+    def __init__(self, listing, args, rows, filters, sort_by, sort_order, next_values, prev_values):
+        self.listing = listing
+        self.args = args
+        self.rows = rows
+        self.filters = filters
+        self.sort_by = sort_by
+        self.sort_order = sort_order
+        self.next_cursor = encode_cursor(next_values) if next_values else None
+        self.prev_cursor = encode_cursor(prev_values) if prev_values else None
+
+    @property
+    def columns(self):
+        return self.listing.columns
+
+    def url(self, **changes):
+        """URL de la liste avec les paramètres courants modifiés (None retire un paramètre)."""
+        args = {key: value for key, value in self.args.items() if key not in CURSOR_ARGS}
+        args.update(changes)
+        return url_for(self.listing.endpoint, **{key: value for key, value in args.items() if value not in (None, '')})
+
+    def sort_url(self, column_name):
+        order = 'asc' if self.sort_by == column_name and self.sort_order == 'desc' else 'desc'
+        return self.url(sort_by=column_name, sort_order=order)
+
+    @property
+    def next_url(self):
+        return self.url(after=self.next_cursor) if self.next_cursor else None
+
+    @property
+    def prev_url(self):
+        return self.url(before=self.prev_cursor) if self.prev_cursor else None
+
+
+class AdminListing:
+    """Description d'une liste de l'administration (voir le docstring du module)."""
+
+    def __init__(self, endpoint, model, columns, default_sort, default_order='desc',
+                 filters=(), joins=(), per_page=50):
+        self.endpoint = endpoint
+        self.model = model
+        self.columns = tuple(columns)
+        self.filters = tuple(filters)
+        self.joins = tuple(joins)
+        self.per_page = per_page
+        self.primary_key = sa.inspect(model).primary_key[0]
+        self.sort_keys = {column.name: column.expression for column in self.columns if column.sortable}
+        if default_sort not in self.sort_keys or default_order not in SORT_ORDERS:
+            raise ValueError(f'Tri par défaut invalide pour {endpoint} : {default_sort} {default_order}')
+        self.default_sort = default_sort
+        self.default_order = default_order
+
+    def _select(self):
+        expressions = {'id': self.primary_key}
+        expressions.update((column.name, column.expression) for column in self.columns)
+        query = sa.select(*(expression.label(name) for name, expression in expressions.items())).select_from(self.model)
+        for target, onclause in self.joins:
+            query = query.outerjoin(target, onclause)
+        return query
+
+    def page(self, args):
+        """Page correspondant aux paramètres de la requête (request.args)."""
+        filters = {}
+        query = self._select()
+        for list_filter in self.filters:
+            value = (args.get(list_filter.name) or '').strip()
+            filters[list_filter.name] = value
+            criterion = list_filter.criterion(value) if value else None
+            if criterion is not None:
+                query = query.where(criterion)
+
+        sort_by = args.get('sort_by') if args.get('sort_by') in self.sort_keys else self.default_sort
+        sort_order = args.get('sort_order') if args.get('sort_order') in SORT_ORDERS else self.default_order
+        keys = (self.sort_keys[sort_by], self.primary_key)
+
+        # Page précédente : on lit à rebours à partir du curseur, puis on remet les lignes dans l'ordre
+        backwards = bool(args.get('before'))
+        cursor = decode_cursor(args.get('before') or args.get('after'), keys)
+        if cursor is None:
+            backwards = False
+        descending = (sort_order == 'desc') != backwards
+        if cursor is not None:
+            query = query.where(after_cursor(keys, cursor, descending))
+        query = query.order_by(*(key.desc() if descending else key.asc() for key in keys))
+
+        rows = db.session.execute(query.limit(self.per_page + 1)).all()
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        if backwards:
+            rows.reverse()
+
+        def key_of(row):
+            return (row._mapping[sort_by], row.id)
+
+        if backwards:
+            next_values = key_of(rows[-1]) if rows else None
+            prev_values = key_of(rows[0]) if rows and has_more else None
+        else:
+            next_values = key_of(rows[-1]) if rows and has_more else None
+            prev_values = key_of(rows[0]) if rows and cursor is not None else None
+        return ListingPage(self, dict(args.items()), rows, filters, sort_by, sort_order, next_values, prev_values)
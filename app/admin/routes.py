@@ -4,16 +4,22 @@ from sqlalchemy import func, distinct
 from . import admin
 from .. import db, bcrypt
 from ..models import (Product, Category, ContactMessage, StaffUser, Order, OrderItem, Customer, 
-                     ProductImage, Post, PageContent, Banner, Milestone, Newsletter, NewsletterSubscriber)
+                     ProductImage, Post, PageContent, Banner, Milestone, Newsletter, NewsletterSubscriber,
+                     LowStockAlert, CustomerStats)
 from ..forms import (CategoryForm, ProductForm, DeleteForm, StaffUserEditForm, 
-                   ContactMessageEditForm, ReplyForm, CustomerEditForm, StaffRegistrationForm, PostForm, PageContentForm, BannerForm, MilestoneForm, NewsletterCreationForm, SendForm)
+                   ContactMessageEditForm, ReplyForm, CustomerEditForm, StaffRegistrationForm, PostForm, PageContentForm, BannerForm, MilestoneForm, NewsletterCreationForm, SendForm, ProductImportForm,
+                   BANNER_POSITIONS, STAFF_ROLES)
 from ..utils.image_helpers import save_image, allowed_file, delete_image_from_cloudinary
-from openpyxl import Workbook
+from ..identity import bump_credential_version, forget_identity, invalidate_identity
+from ..utils.order_events import set_order_status
+from ..utils.order_sequence import assign_sequence_number
+from ..utils.sales_facts import sales_rollup
+from ..utils.catalog_import import import_catalog, CatalogImportError
+from .listing import AdminListing, ListColumn, ListFilter, search_filter, choice_filter
 from io import BytesIO
 from functools import wraps
 from werkzeug.datastructures import FileStorage
 from datetime import date, timedelta, datetime, timezone
-import pytz
 import os
 from flask_mailman import EmailMessage
 
@@ -88,13 +94,15 @@ def admin_dashboard():
     revenue_today = db.session.query(db.func.sum(Order.total_price)).filter(db.func.date(Order.date_ordered) == today).scalar() or 0
     orders_today = db.session.query(func.count(Order.id)).filter(db.func.date(Order.date_ordered) == today).scalar()
 
-    low_stock_products = db.session.execute(db.select(Product).filter(Product.stock <= Product.min_stock_threshold)).scalars().all()
+    # Alertes tenues à jour à chaque mouvement de stock (voir utils/stock_alerts.py)
+    low_stock_alerts = db.session.execute(
+        db.select(LowStockAlert).options(db.joinedload(LowStockAlert.product)).order_by(LowStockAlert.stock, LowStockAlert.id)
+    ).scalars().all()
+    new_low_stock_alerts = sum(1 for alert in low_stock_alerts if alert.notified_at is None)
     latest_orders = db.session.execute(db.select(Order).order_by(Order.date_ordered.desc()).limit(5)).scalars().all()
 
-    top_selling_products = db.session.query(
-        Product.name,
-        db.func.sum(OrderItem.quantity).label('total_quantity')
-    ).join(OrderItem).join(Order).filter(Order.date_ordered.between(start_date, end_date + timedelta(days=1))).group_by(Product.name).order_by(db.desc('total_quantity')).limit(5).all()
+    # Ventes des commandes finalisées, lues dans la table de faits (voir utils/sales_facts.py)
+    top_selling_products = sales_rollup(start_date, end_date, by='product', limit=5)
 
     # --- Sales Chart ---
     delta = end_date - start_date
@@ -103,14 +111,8 @@ def admin_dashboard():
         day = start_date + timedelta(days=i)
         sales_data[day.strftime('%Y-%m-%d')] = 0
 
-    sales_in_range = db.session.query(
-        db.func.date(Order.date_ordered),
-        db.func.sum(Order.total_price)
-    ).filter(Order.date_ordered.between(start_date, end_date + timedelta(days=1))).group_by(db.func.date(Order.date_ordered)).all()
-
-    for day, total in sales_in_range:
-        if day:
-            sales_data[day] = total
+    for row in sales_rollup(start_date, end_date, by='day'):
+        sales_data[row.label] = row.revenue
     
     chart_labels = list(sales_data.keys())
     chart_values = list(sales_data.values())
@@ -145,7 +147,8 @@ def admin_dashboard():
                            total_products=total_products,
                            revenue_today=revenue_today,
                            orders_today=orders_today,
-                           low_stock_products=low_stock_products,
+                           low_stock_alerts=low_stock_alerts,
+                           new_low_stock_alerts=new_low_stock_alerts,
                            latest_orders=latest_orders,
                            top_selling_products=top_selling_products,
                            chart_labels=chart_labels,
@@ -159,23 +162,23 @@ def admin_dashboard():
                                'end_date': end_date.strftime('%Y-%m-%d')
                            })
 
+POSTS_LISTING = AdminListing(
+    'admin.admin_posts', Post,
+    columns=[
+        ListColumn('title', 'Titre', Post.title, sortable=True),
+        ListColumn('created_at', 'Date de Création', Post.created_at, sortable=True, format='datetime'),
+        ListColumn('author', 'Auteur', StaffUser.username),
+    ],
+    joins=[(StaffUser, Post.author_id == StaffUser.id)],
+    filters=[search_filter('Rechercher (titre)', Post.title)],
+    default_sort='created_at',
+)
+
 @admin.route('/posts')
 @staff_required
 def admin_posts():
-    posts = db.session.execute(db.select(Post).order_by(Post.created_at.desc())).scalars().all()
     delete_form = DeleteForm()
-    
-    # Convertir les dates UTC en heure locale de Paris et les formater
-    paris_tz = pytz.timezone('Europe/Paris')
-    for post in posts:
-        if post.created_at:
-            utc_dt = pytz.utc.localize(post.created_at)
-            paris_dt = utc_dt.astimezone(paris_tz)
-            post.created_at_formatted = paris_dt.strftime('%d/%m/%Y à %H:%M')
-        else:
-            post.created_at_formatted = "N/A"
-
-    return render_template('admin/posts.html', posts=posts, delete_form=delete_form)
+    return render_template('admin/posts.html', listing=POSTS_LISTING.page(request.args), delete_form=delete_form)
 
 @admin.route('/post/add', methods=['GET', 'POST'])
 @staff_required
@@ -230,12 +233,21 @@ def edit_post(post_id):
 
     return render_template('admin/add_post.html', form=form, title="Modifier la réalisation", post=post)
 
+CATEGORIES_LISTING = AdminListing(
+    'admin.admin_categories', Category,
+    columns=[
+        ListColumn('id', '#ID', Category.id, sortable=True),
+        ListColumn('name', 'Nom', Category.name, sortable=True),
+    ],
+    filters=[search_filter('Rechercher (nom)', Category.name)],
+    default_sort='id', default_order='asc',
+)
+
 @admin.route('/categories')
 @staff_required
 def admin_categories():
     delete_form = DeleteForm()
-    categories = db.session.execute(db.select(Category)).scalars().all()
-    return render_template('admin_categories.html', categories=categories, delete_form=delete_form)
+    return render_template('admin_categories.html', listing=CATEGORIES_LISTING.page(request.args), delete_form=delete_form)
 
 @admin.route('/category/add', methods=['GET', 'POST'])
 @staff_required
@@ -280,12 +292,26 @@ def delete_category(category_id):
         flash("Catégorie introuvable.", "danger")
     return redirect(url_for('admin.admin_categories'))
 
+CONTACT_MESSAGES_LISTING = AdminListing(
+    'admin.admin_contact_messages', ContactMessage,
+    columns=[
+        ListColumn('id', '#ID', ContactMessage.id, sortable=True),
+        ListColumn('name', 'Nom', ContactMessage.name, sortable=True),
+        ListColumn('email', 'Email', ContactMessage.email),
+        ListColumn('message', 'Message', ContactMessage.message),
+        ListColumn('date_posted', 'Date', ContactMessage.date_posted, sortable=True, format='datetime'),
+    ],
+    filters=[search_filter('Rechercher (nom, email ou message)',
+                           ContactMessage.name, ContactMessage.email, ContactMessage.message)],
+    default_sort='date_posted',
+)
+
 @admin.route('/contact-messages')
 @staff_required
 def admin_contact_messages():
     delete_form = DeleteForm()
-    messages = db.session.execute(db.select(ContactMessage).order_by(ContactMessage.date_posted.desc())).scalars().all()
-    return render_template('admin_contact_messages.html', messages=messages, delete_form=delete_form)
+    return render_template('admin_contact_messages.html', listing=CONTACT_MESSAGES_LISTING.page(request.args),
+                           delete_form=delete_form)
 
 @admin.route('/contact-message/edit/<int:message_id>', methods=['GET', 'POST'])
 @admin_required
@@ -381,6 +407,27 @@ def add_product():
         return redirect(url_for('admin.admin_products'))
     return render_template('add_product.html', form=form)
 
+@admin.route('/products/import', methods=['GET', 'POST'])
+@admin_required
+def import_products():
+    form = ProductImportForm()
+    report = None
+    if form.validate_on_submit():
+        upload = form.file.data
+        try:
+            report = import_catalog(upload.stream, upload.filename, dry_run=form.dry_run.data)
+        except CatalogImportError as e:
+            flash(str(e), 'danger')
+        except Exception as e:
+            current_app.logger.error(f"Erreur lors de l'import du catalogue : {e}")
+            flash("Une erreur est survenue pendant l'import : aucune modification n'a été enregistrée.", 'danger')
+        else:
+            if report.dry_run:
+                flash('Simulation terminée : aucune modification enregistrée.', 'info')
+            else:
+                flash(f'Import terminé : {report.created} produit(s) créé(s), {report.updated} mis à jour.', 'success')
+    return render_template('admin/import_products.html', form=form, report=report)
+
 @admin.route('/reply/<int:message_id>', methods=['GET', 'POST'])
 @staff_required
 def reply_to_contact_message(message_id):
@@ -472,11 +519,8 @@ def update_order_status(order_id):
         return redirect(url_for('admin.admin_orders'))
     new_status = request.form.get('status')
     if new_status:
-        if order.status_history:
-            order.status_history += f";{order.status}"
-        else:
-            order.status_history = order.status
-        order.status = new_status
+        set_order_status(order, new_status)
+        assign_sequence_number(order)
         db.session.commit()
         try:
             subject = f"Mise à jour du statut de votre commande #{order.id}"
@@ -494,12 +538,24 @@ def update_order_status(order_id):
         flash("Veuillez sélectionner un nouveau statut.", "danger")
     return redirect(url_for('admin.admin_orders'))
 
+USERS_LISTING = AdminListing(
+    'admin.admin_users', StaffUser,
+    columns=[
+        ListColumn('id', '#ID', StaffUser.id, sortable=True),
+        ListColumn('username', "Nom d'utilisateur", StaffUser.username, sortable=True),
+        ListColumn('email', 'Email', StaffUser.email),
+        ListColumn('role', 'Rôle', StaffUser.role),
+    ],
+    filters=[search_filter("Rechercher (nom d'utilisateur ou email)", StaffUser.username, StaffUser.email),
+             choice_filter('role', 'Rôle', StaffUser.role, STAFF_ROLES)],
+    default_sort='id', default_order='asc',
+)
+
 @admin.route('/users')
 @admin_required
 def admin_users():
     delete_form = DeleteForm()
-    users = db.session.execute(db.select(StaffUser)).scalars().all()
-    return render_template('admin_users.html', users=users, delete_form=delete_form)
+    return render_template('admin_users.html', listing=USERS_LISTING.page(request.args), delete_form=delete_form)
 
 @admin.route('/staff/add', methods=['GET', 'POST'])
 @admin_required
@@ -530,8 +586,10 @@ def edit_user(user_id):
         user.role = form.role.data
         if form.password.data:
             user.password = bcrypt.generate_password_hash(form.password.data).decode('utf-8')
+        bump_credential_version(user)
         try:
             db.session.commit()
+            invalidate_identity(user)
             flash('Utilisateur du personnel mis à jour avec succès !', 'success')
             return redirect(url_for('admin.admin_users'))
         except Exception as e:
@@ -547,22 +605,59 @@ def delete_user(user_id):
     if user_to_delete.id == current_user.id:
         flash("Vous ne pouvez pas supprimer votre propre compte !", 'danger')
         return redirect(url_for('admin.admin_users'))
+    deleted_identity = user_to_delete.get_id()
     try:
         db.session.delete(user_to_delete)
         db.session.commit()
+        forget_identity(deleted_identity)
         flash('Utilisateur du personnel supprimé avec succès !', 'success')
     except Exception as e:
         db.session.rollback()
         flash("Une erreur est survenue lors de la suppression de l'utilisateur.", 'danger')
     return redirect(url_for('admin.admin_users'))
 
+# Tris de l'annuaire des clients : colonnes indexées de customer / customer_stats
+CUSTOMER_SORTS = {
+    'registered': Customer.id,
+    'username': Customer.username,
+    'orders': CustomerStats.order_count,
+    'revenue': CustomerStats.revenue,
+    'basket': CustomerStats.average_basket,
+    'last_order': CustomerStats.last_order_at,
+}
+
 @admin.route('/customers')
 @staff_required
 def admin_customers():
-    customers = db.session.execute(db.select(Customer)).scalars().all()
-    customer_count = len(customers)
+    page = request.args.get('page', 1, type=int)
+    per_page = 50
+
+    filters = {
+        'q': request.args.get('q', '').strip(),
+        'sort_by': request.args.get('sort_by', 'registered'),
+        'sort_order': request.args.get('sort_order', 'desc')
+    }
+
+    query = (db.select(Customer)
+             .outerjoin(Customer.stats)
+             .options(db.contains_eager(Customer.stats)))
+    if filters['q']:
+        pattern = f"%{filters['q']}%"
+        query = query.filter(Customer.username.ilike(pattern) | Customer.email.ilike(pattern))
+    sort_column = CUSTOMER_SORTS.get(filters['sort_by'], Customer.id)
+    if filters['sort_order'] == 'asc':
+        query = query.order_by(sort_column.asc(), Customer.id.asc())
+    else:
+        query = query.order_by(sort_column.desc(), Customer.id.desc())
+
+    customers_pagination = db.paginate(query, page=page, per_page=per_page, error_out=False)
     delete_form = DeleteForm()
-    return render_template('admin_customers.html', customers=customers, customer_count=customer_count, delete_form=delete_form)
+    return render_template('admin_customers.html',
+                           customers_pagination=customers_pagination,
+                           customer_count=customers_pagination.total,
+                           filters=filters,
+                           delete_form=delete_form,
+                           merge_query_args=merge_query_args)
 
 @admin.route('/customer/edit/<int:customer_id>', methods=['GET', 'POST'])
 @admin_required
@@ -572,8 +667,10 @@ def edit_customer_admin(customer_id):
     if form.validate_on_submit():
         customer.username = form.username.data
         customer.email = form.email.data
+        bump_credential_version(customer)
         try:
             db.session.commit()
+            invalidate_identity(customer)
             flash('Client mis à jour avec succès !', 'success')
             return redirect(url_for('admin.admin_customers'))
         except Exception as e:
@@ -587,13 +684,16 @@ def edit_customer_admin(customer_id):
 def delete_customer_admin(customer_id):
     customer_to_delete = db.session.get(Customer, customer_id) or abort(404)
     
-    if customer_to_delete.orders:
+    has_orders = db.session.execute(db.select(db.exists().where(Order.customer_id == customer_id))).scalar()
+    if has_orders:
         flash('Vous ne pouvez pas supprimer un client qui a déjà passé des commandes.', 'danger')
         return redirect(url_for('admin.admin_customers'))
         
+    deleted_identity = customer_to_delete.get_id()
     try:
         db.session.delete(customer_to_delete)
         db.session.commit()
+        forget_identity(deleted_identity)
         flash('Client supprimé avec succès !', 'success')
     except Exception as e:
         db.session.rollback()
@@ -762,6 +862,7 @@ def delete_product(product_id):
 @admin_required
 def export_contact_messages_excel():
     messages = db.session.execute(db.select(ContactMessage)).scalars().all()
+    from openpyxl import Workbook
     wb = Workbook()
     ws = wb.active
     ws.title = "Messages de Contact"
@@ -777,6 +878,7 @@ def export_contact_messages_excel():
 @admin_required
 def export_orders_excel():
     orders = db.session.execute(db.select(Order).options(db.joinedload(Order.items).joinedload(OrderItem.product), db.joinedload(Order.customer))).scalars().all()
+    from openpyxl import Workbook
     wb = Workbook()
     ws = wb.active
     ws.title = "Commandes"
@@ -804,6 +906,7 @@ def export_orders_excel():
 @admin_required
 def export_products_excel():
     products = db.session.execute(db.select(Product)).scalars().all()
+    from openpyxl import Workbook
     wb = Workbook()
     ws = wb.active
     ws.title = "Produits"
@@ -827,6 +930,7 @@ def export_products_excel():
 @admin_required
 def export_customers_excel():
     customers = db.session.execute(db.select(Customer)).scalars().all()
+    from openpyxl import Workbook
     wb = Workbook()
     ws = wb.active
     ws.title = "Clients Inscrits"
@@ -898,12 +1002,31 @@ def edit_page(page_name):
     return render_template('admin/edit_page.html', form=form, content=content)
 
 
+BANNERS_LISTING = AdminListing(
+    'admin.admin_banners', Banner,
+    columns=[
+        ListColumn('id', 'ID', Banner.id, sortable=True),
+        ListColumn('title', 'Titre', Banner.title, sortable=True),
+        ListColumn('message', 'Message', Banner.message, format='truncate'),
+        ListColumn('image_file', 'Image', Banner.image_file, format='image'),
+        ListColumn('is_active', 'Active', Banner.is_active, format='bool'),
+        ListColumn('start_date', 'Début', Banner.start_date, format='date'),
+        ListColumn('end_date', 'Fin', Banner.end_date, format='date'),
+        ListColumn('position', 'Position', Banner.position),
+    ],
+    filters=[search_filter('Rechercher (titre ou message)', Banner.title, Banner.message),
+             choice_filter('position', 'Position', Banner.position, BANNER_POSITIONS),
+             ListFilter('is_active', 'Active', lambda value: Banner.is_active == (value == '1') if value in ('0', '1') else None,
+                        (('1', 'Oui'), ('0', 'Non')))],
+    # Identifiants croissants dans l'ordre de création (created_at peut être nul)
+    default_sort='id',
+)
+
 @admin.route('/banners')
 @admin_required
 def admin_banners():
-    banners = db.session.execute(db.select(Banner).order_by(Banner.created_at.desc())).scalars().all()
     delete_form = DeleteForm()
-    return render_template('admin/admin_banners.html', banners=banners, delete_form=delete_form)
+    return render_template('admin/admin_banners.html', listing=BANNERS_LISTING.page(request.args), delete_form=delete_form)
 
 @admin.route('/banner/add', methods=['GET', 'POST'])
 @admin_required
@@ -995,13 +1118,19 @@ def delete_banner(banner_id):
         flash(f"Une erreur est survenue lors de la suppression de la bannière : {e}", 'danger')
     return redirect(url_for('admin.admin_banners'))
 
+MILESTONES_LISTING = AdminListing(
+    'admin.admin_milestones', Milestone,
+    columns=[ListColumn('order_number', 'Palier n°', Milestone.order_number, sortable=True)],
+    default_sort='order_number', default_order='asc',
+)
+
 @admin.route('/milestones')
 @admin_required
 def admin_milestones():
-    milestones = db.session.execute(db.select(Milestone).order_by(Milestone.order_number.asc())).scalars().all()
     add_form = MilestoneForm()
     delete_form = DeleteForm()
-    return render_template('admin/milestones.html', milestones=milestones, add_form=add_form, delete_form=delete_form)
+    return render_template('admin/milestones.html', listing=MILESTONES_LISTING.page(request.args),
+                           add_form=add_form, delete_form=delete_form)
 
 @admin.route('/milestone/add', methods=['POST'])
 @admin_required
@@ -1104,3 +1233,14 @@ def send_newsletter(newsletter_id):
         flash(f"Erreur lors de l'envoi de la newsletter: {e}", 'danger')
 
     return redirect(url_for('admin.newsletters'))
+
+@admin.route('/metrics')
+@staff_required
+def metrics_snapshot():
+    """Compteurs du worker courant (requêtes rejetées par la limitation, opérations bcrypt...)."""
+    from ..utils.metrics import metrics
+    from ..utils.compression import compression_ratio
+    snapshot = metrics.snapshot()
+    snapshot['compression_ratio'] = [{'labels': {'encoding': encoding}, 'value': ratio}
+                                     for encoding, ratio in compression_ratio().items()]
+    return jsonify(snapshot)
@@ -0,0 +1,143 @@
+'''
+API JSON en lecture seule du catalogue (/api/v1).
+
+- Pagination par curseur : `?limit=50&after=<id>` (tri par identifiant), la
+  réponse contient le curseur `next` de la page suivante.
+- Champs au choix : `?fields=name,price` ('id' est toujours renvoyé).
+- ETag : les listes dépendent de la version globale du catalogue, une fiche
+  produit de la version de sa ligne. Avec `If-None-Match`, une réponse 304 est
+  renvoyée sans requête sur les tables du catalogue (listes) ni sérialisation.
+- Synchronisation incrémentale : `?changed_since=<date ISO 8601>` ne renvoie
+  que les lignes créées ou modifiées depuis (champ `updated_at`).
+'''
+from datetime import datetime
+from flask import request, jsonify, make_response, url_for
+from flask_restful import Resource, abort
+from . import api
+from . import serializers
+from ..extensions import db
+from ..models import Product, ProductImage, Review
+from ..versioning import catalog_version, make_etag, etag_matches, modified_after
+
+DEFAULT_LIMIT = 50
+MAX_LIMIT = 200
+
+
+def _not_modified(etag):
+    response = make_response('', 304)
+    response.set_etag(etag, weak=True)
+    return response
+
+
+def _json(payload, etag):
+    response = jsonify(payload)
+    response.set_etag(etag, weak=True)
+    # Les clients revalident à chaque appel : un 304 ne coûte presque rien
+    response.headers['Cache-Control'] = 'public, no-cache'
+    return response
+
+
+def _page_args():
+    limit = request.args.get('limit', DEFAULT_LIMIT, type=int)
+    after = request.args.get('after', 0, type=int)
+    if limit is None or not 1 <= limit <= MAX_LIMIT:
+        abort(400, message=f'limit doit être compris entre 1 et {MAX_LIMIT}')
+    return limit, after
+
+
+def _changed_since(model):
+    raw = request.args.get('changed_since')
+    if not raw:
+        return []
+    try:
+        since = datetime.fromisoformat(raw)
+    except ValueError:
+        abort(400, message='changed_since doit être une date ISO 8601')
+    return [modified_after(model, since)]
+
+
+def _compiled(serializer):
+    try:
+        return serializer.compile(serializer.parse_fields(request.args.get('fields')))
+    except ValueError as e:
+        abort(400, message=str(e))
+
+
+class CatalogListResource(Resource):
+    serializer = None
+
+    def filters(self, **kwargs):
+        return []
+
+    def get(self, **kwargs):
+        etag = make_etag('list', request.full_path, catalog_version())
+        if etag_matches(etag):
+            return _not_modified(etag)
+
+        limit, after = _page_args()
+        compiled = _compiled(self.serializer)
+        model = self.serializer.model
+        rows = db.session.execute(
+            db.select(*compiled.columns)
+            .filter(model.id > after, *self.filters(**kwargs), *_changed_since(model))
+            .order_by(model.id)
+            .limit(limit + 1)
+        ).all()
+
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = rows[-1][0]
+        payload = {'data': compiled.rows(rows), 'next': None}
+        if next_cursor is not None:
+            args = request.args.to_dict()
+            args['after'] = next_cursor
+            payload['next'] = url_for(request.endpoint, **kwargs, **args)
+        return _json(payload, etag)
+
+
+class ProductList(CatalogListResource):
+    serializer = serializers.products
+
+    def filters(self):
+        category_id = request.args.get('category_id', type=int)
+        return [Product.category_id == category_id] if category_id else []
+
+
+class ProductDetail(Resource):
+    def get(self, product_id):
+        compiled = _compiled(serializers.products)
+        row = db.session.execute(
+            db.select(Product.version, *compiled.columns).filter(Product.id == product_id)
+        ).first()
+        if row is None:
+            abort(404, message='Produit introuvable')
+        etag = make_etag('product', product_id, row[0], request.args.get('fields', ''))
+        if etag_matches(etag):
+            return _not_modified(etag)
+        return _json({'data': compiled.row(row[1:])}, etag)
+
+
+class CategoryList(CatalogListResource):
+    serializer = serializers.categories
+
+
+class ProductImageList(CatalogListResource):
+    serializer = serializers.product_images
+
+    def filters(self, product_id):
+        return [ProductImage.product_id == product_id]
+
+
+class ProductReviewList(CatalogListResource):
+    serializer = serializers.reviews
+
+    def filters(self, product_id):
+        return [Review.product_id == product_id]
+
+
+api.add_resource(ProductList, '/products')
+api.add_resource(ProductDetail, '/products/<int:product_id>')
+api.add_resource(CategoryList, '/categories')
+api.add_resource(ProductImageList, '/products/<int:product_id>/images')
+api.add_resource(ProductReviewList, '/products/<int:product_id>/reviews')
@@ -0,0 +1,99 @@
+'''
+Sérialiseurs précompilés de l'API.
+
+Un `Serializer` décrit les champs exposés pour un modèle (expression SQL et
+éventuelle conversion). Pour un jeu de champs demandé (`?fields=`), il compile
+une seule fois la liste des colonnes à sélectionner et la fonction qui
+transforme les lignes en dictionnaires : les requêtes ne chargent ni objets
+ORM ni colonnes inutiles, et aucune introspection n'a lieu par objet.
+'''
+from functools import lru_cache
+from ..models import Product, Category, ProductImage, Review
+from ..utils.image_helpers import image_url
+
+
+def _isoformat(value):
+    return value.isoformat() if value is not None else None
+
+
+class CompiledSerializer:
+    def __init__(self, names, columns, converters):
+        self.names = names
+        self.columns = columns
+        # Positions des champs à convertir, calculées une fois pour toutes
+        self._conversions = tuple((i, converter) for i, converter in enumerate(converters) if converter)
+
+    def row(self, row):
+        if self._conversions:
+            row = list(row)
+            for i, converter in self._conversions:
+                row[i] = converter(row[i])
+        return dict(zip(self.names, row))
+
+    def rows(self, rows):
+        return [self.row(row) for row in rows]
+
+
+class Serializer:
+    def __init__(self, model, fields, default_fields):
+        self.model = model
+        # nom -> (expression SQL, conversion ou None) ; 'id' est toujours renvoyé
+        self.fields = fields
+        self.default_fields = tuple(default_fields)
+
+    def parse_fields(self, raw):
+        """Champs demandés via `?fields=a,b` ; lève ValueError pour un champ inconnu."""
+        if not raw:
+            return self.default_fields
+        names = tuple(dict.fromkeys(name.strip() for name in raw.split(',') if name.strip()))
+        unknown = [name for name in names if name not in self.fields]
+        if unknown:
+            raise ValueError(f"Champs inconnus : {', '.join(unknown)}")
+        return names
+
+    @lru_cache(maxsize=64)
+    def compile(self, names):
+        names = ('id',) + tuple(name for name in names if name != 'id')
+        columns = [self.fields[name][0].label(name) for name in names]
+        converters = [self.fields[name][1] for name in names]
+        return CompiledSerializer(names, columns, converters)
+
+
+products = Serializer(Product, {
+    'id': (Product.id, None),
+    'name': (Product.name, None),
+    'description': (Product.description, None),
+    'price': (Product.price, None),
+    'stock': (Product.stock, None),
+    'in_stock': (Product.stock > 0, bool),
+    'category_id': (Product.category_id, None),
+    'image_url': (Product.image_file, image_url),
+    'version': (Product.version, None),
+    'updated_at': (Product.updated_at, _isoformat),
+}, default_fields=('name', 'price', 'in_stock', 'category_id', 'image_url', 'version'))
+
+categories = Serializer(Category, {
+    'id': (Category.id, None),
+    'name': (Category.name, None),
+    'version': (Category.version, None),
+    'updated_at': (Category.updated_at, _isoformat),
+}, default_fields=('name', 'version'))
+
+product_images = Serializer(ProductImage, {
+    'id': (ProductImage.id, None),
+    'product_id': (ProductImage.product_id, None),
+    'image_url': (ProductImage.image_file, image_url),
+    'position': (ProductImage.position, None),
+    'version': (ProductImage.version, None),
+    'updated_at': (ProductImage.updated_at, _isoformat),
+}, default_fields=('product_id', 'image_url', 'position'))
+
+reviews = Serializer(Review, {
+    'id': (Review.id, None),
+    'product_id': (Review.product_id, None),
+    'rating': (Review.rating, None),
+    'comment': (Review.comment, None),
+    'date_posted': (Review.date_posted, _isoformat),
+    'version': (Review.version, None),
+    'updated_at': (Review.updated_at, _isoformat),
+}, default_fields=('product_id', 'rating', 'comment', 'date_posted'))
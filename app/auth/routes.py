@@ -1,9 +1,13 @@
 from flask import render_template, redirect, url_for, flash, request, session, current_app
 from flask_login import login_user, logout_user, login_required, current_user
 from . import auth
-from .. import db, bcrypt
+from .. import db
+from ..extensions import limiter
+from ..utils.rate_limits import (check_password_hash, generate_password_hash, limit_from_config,
+                                 username_key, current_user_key)
 from ..models import Customer, StaffUser, CartItem
 from ..forms import LoginForm, RegistrationForm, PasswordResetRequestForm, ResetPasswordForm, ChangePasswordForm
+from ..identity import bump_credential_version, invalidate_identity
 from flask_mailman import EmailMessage
 
 def send_reset_email(user):
@@ -21,19 +25,21 @@ Si vous n\'avez pas fait cette demande, veuillez ignorer cet e-mail et aucun cha
     msg.send()
 
 @auth.route('/login', methods=['GET', 'POST'])
+@limiter.limit(limit_from_config('RATELIMIT_LOGIN_IP'), methods=['POST'])
+@limiter.limit(limit_from_config('RATELIMIT_LOGIN_USERNAME'), key_func=username_key, methods=['POST'])
 def login():
     if current_user.is_authenticated:
         return redirect(url_for('main.index'))
     form = LoginForm()
     if form.validate_on_submit():
         staff_user = StaffUser.query.filter_by(username=form.username.data).first()
-        if staff_user and bcrypt.check_password_hash(staff_user.password, form.password.data):
+        if staff_user and check_password_hash(staff_user.password, form.password.data):
             login_user(staff_user)
             flash('Connexion réussie en tant que personnel !', 'success')
             return redirect(url_for('admin.admin_dashboard'))
 
         customer_user = Customer.query.filter_by(username=form.username.data).first()
-        if customer_user and bcrypt.check_password_hash(customer_user.password, form.password.data):
+        if customer_user and check_password_hash(customer_user.password, form.password.data):
             login_user(customer_user)
             
             # Vider systématiquement le panier de l'utilisateur en base de données avant la fusion
@@ -65,12 +71,13 @@ def login():
     return render_template('login.html', form=form)
 
 @auth.route('/register', methods=['GET', 'POST'])
+@limiter.limit(limit_from_config('RATELIMIT_REGISTER_IP'), methods=['POST'])
 def register():
     if current_user.is_authenticated:
         return redirect(url_for('main.index'))
     form = RegistrationForm()
     if form.validate_on_submit():
-        hashed_password = bcrypt.generate_password_hash(form.password.data).decode('utf-8')
+        hashed_password = generate_password_hash(form.password.data)
         new_customer = Customer(username=form.username.data, email=form.email.data, password=hashed_password)
         db.session.add(new_customer)
         db.session.commit()
@@ -86,6 +93,7 @@ def logout():
     return redirect(url_for('auth.login'))
 
 @auth.route("/reset_password/", methods=['GET', 'POST'])
+@limiter.limit(limit_from_config('RATELIMIT_PASSWORD_IP'), methods=['POST'])
 def reset_request():
     if current_user.is_authenticated:
         return redirect(url_for('main.index'))
@@ -101,6 +109,7 @@ def reset_request():
     return render_template('reset_request.html', title='Réinitialiser le mot de passe', form=form)
 
 @auth.route("/reset_password/<token>/", methods=['GET', 'POST'])
+@limiter.limit(limit_from_config('RATELIMIT_PASSWORD_IP'), methods=['POST'])
 def reset_token(token):
     if current_user.is_authenticated:
         return redirect(url_for('main.index'))
@@ -112,18 +121,21 @@ def reset_token(token):
         return redirect(url_for('auth.reset_request'))
     form = ResetPasswordForm()
     if form.validate_on_submit():
-        if bcrypt.check_password_hash(user.password, form.password.data):
+        if check_password_hash(user.password, form.password.data):
             flash("Le nouveau mot de passe doit être différent de l'ancien.", 'danger')
             return render_template('reset_token.html', title='Réinitialiser le mot de passe', form=form, token=token)
             
-        hashed_password = bcrypt.generate_password_hash(form.password.data).decode('utf-8')
+        hashed_password = generate_password_hash(form.password.data)
         user.password = hashed_password
+        bump_credential_version(user)
         db.session.commit()
+        invalidate_identity(user)
         flash('Votre mot de passe a été mis à jour ! Vous pouvez maintenant vous connecter', 'success')
         return redirect(url_for('auth.login'))
     return render_template('reset_token.html', title='Réinitialiser le mot de passe', form=form, token=token)
 
 @auth.route('/change_password', methods=['GET', 'POST'])
+@limiter.limit(limit_from_config('RATELIMIT_PASSWORD_USER'), key_func=current_user_key, methods=['POST'])
 @login_required
 def change_password():
     form = ChangePasswordForm()
@@ -131,16 +143,18 @@ def change_password():
         old_password = form.old_password.data
         new_password = form.new_password.data
 
-        if not bcrypt.check_password_hash(current_user.password, old_password):
+        if not check_password_hash(current_user.password, old_password):
             flash("L'ancien mot de passe est incorrect.", 'danger')
-        elif bcrypt.check_password_hash(current_user.password, new_password):
+        elif check_password_hash(current_user.password, new_password):
             flash("Le nouveau mot de passe doit être différent de l'actuel.", 'danger')
-        elif current_user.previous_password and bcrypt.check_password_hash(current_user.previous_password, new_password):
+        elif current_user.previous_password and check_password_hash(current_user.previous_password, new_password):
             flash("Le nouveau mot de passe ne peut pas être identique au précédent.", 'danger')
         else:
             current_user.previous_password = current_user.password
-            current_user.password = bcrypt.generate_password_hash(new_password).decode('utf-8')
+            current_user.password = generate_password_hash(new_password)
+            bump_credential_version(current_user)
             db.session.commit()
+            invalidate_identity(current_user)
             flash('Votre mot de passe a été mis à jour avec succès !', 'success')
             return redirect(url_for('main.index'))
 
@@ -2,14 +2,21 @@ from flask import render_template, request, flash, redirect, url_for, session, c
 from flask_login import login_required, current_user
 from . import cart
 from .. import db
-from ..models import Product, Order, OrderItem, Customer, CartItem, Milestone
+from ..models import Product, Order, OrderItem, Customer, CartItem
 from ..forms import CheckoutForm
 from ..admin.routes import customer_required
 from flask_mailman import EmailMessage
 from ..utils.stock_helpers import check_and_update_stock
 from ..utils.recommendations import get_product_recommendations # NOUVELLE IMPORTATION
-import stripe
-from sqlalchemy import func
+from ..db_routing import use_primary
+from ..catalog_snapshot import current_catalog
+from ..extensions import csrf
+from ..payments.webhooks import ingest_webhook
+from ..payments.providers import take_paid_order_stock
+from ..payments.stripe_checkout import start_stripe_checkout
+from ..utils.order_events import set_order_status
+from ..utils.order_sequence import (assign_sequence_number, is_milestone_number, peek_next_order_number,
+                                    PAID_AWAITING_STOCK_STATUS)
 
 # NOUVELLES IMPORTATIONS pour la réservation
 from datetime import datetime, timedelta, timezone
@@ -76,35 +83,32 @@ def add_to_cart():
     return redirect(url_for('products.produits')) # Default redirect if no specific error
 
 @cart.route('/cart')
+@use_primary
 def cart_view():
     cart_items_list = []
     total_price = 0
     current_cart_product_ids = [] # Pour collecter les IDs des produits dans le panier
     
+    # Quantités du panier (base ou session) ; les produits viennent de l'instantané du catalogue
     if current_user.is_authenticated and isinstance(current_user, Customer):
-        cart_items = db.session.execute(db.select(CartItem).filter_by(customer_id=current_user.id)).scalars().all()
-        for item in cart_items:
-            item_total = item.product.price * item.quantity
+        quantities = db.session.execute(
+            db.select(CartItem.product_id, CartItem.quantity).filter_by(customer_id=current_user.id)
+        ).all()
+    else:
+        quantities = [(int(product_id_str), quantity) for product_id_str, quantity in session.get('cart', {}).items()]
+
+    catalog = current_catalog()
+    for product_id, quantity in quantities:
+        product = catalog.product(product_id)
+        if product:
+            item_total = product.price * quantity
             total_price += item_total
             cart_items_list.append({
-                'product': item.product,
-                'quantity': item.quantity,
+                'product': product,
+                'quantity': quantity,
                 'item_total': item_total
             })
-            current_cart_product_ids.append(item.product.id) # Ajouter l'ID du produit
-    else:
-        if 'cart' in session and session['cart']:
-            for product_id_str, quantity in session['cart'].items():
-                product = db.session.get(Product, int(product_id_str))
-                if product:
-                    item_total = product.price * quantity
-                    total_price += item_total
-                    cart_items_list.append({
-                        'product': product,
-                        'quantity': quantity,
-                        'item_total': item_total
-                    })
-                    current_cart_product_ids.append(product.id) # Ajouter l'ID du produit
+            current_cart_product_ids.append(product.id) # Ajouter l'ID du produit
     
     # Obtenir les recommandations
     recommended_products = []
@@ -170,7 +174,33 @@ def update_cart():
     
     return redirect(url_for('cart.cart_view'))
 
+def _order_lines(cart_items_list):
+    """
+    Relit en base les produits du panier pour passer la commande : l'instantané
+    du catalogue ne sert qu'à l'affichage, le prix facturé et le stock viennent
+    des lignes Product. Retourne les lignes et les erreurs de stock.
+    """
+    product_ids = [item['product'].id for item in cart_items_list]
+    products = {product.id: product for product in db.session.execute(
+        db.select(Product).filter(Product.id.in_(product_ids)).execution_options(populate_existing=True)
+    ).scalars()}
+    order_lines, stock_errors = [], []
+    for item in cart_items_list:
+        product = products.get(item['product'].id)
+        if not product or product.stock < item['quantity']:
+            stock_errors.append(f"Le stock pour {item['product'].name} est insuffisant. Disponible: {product.stock if product else 0}, Demandé: {item['quantity']}.")
+            continue
+        order_lines.append({'product': product, 'quantity': item['quantity'],
+                            'item_total': product.price * item['quantity']})
+    return order_lines, stock_errors
+
+
+def _lines_total(order_lines):
+    return sum(line['item_total'] for line in order_lines)
+
+
 @cart.route('/checkout', methods=['GET', 'POST'])
+@use_primary
 @login_required
 @customer_required
 def checkout():
@@ -187,17 +217,23 @@ def checkout():
     items_to_remove_from_cart = []
     expired_product_names = [] # Nouvelle liste pour stocker les noms des produits expirés
 
+    catalog = current_catalog()
     for item in cart_items:
+        product = catalog.product(item.product_id)
+        if product is None:
+            # Produit retiré du catalogue entre-temps
+            items_to_remove_from_cart.append(item)
+            expired_items_removed = True
         # Vérifier si l'article a une date de réservation et si elle est expirée
-        if item.reserved_until and datetime.now(timezone.utc) > item.reserved_until.replace(tzinfo=timezone.utc):
-            expired_product_names.append(item.product.name) # Ajouter le nom du produit
+        elif item.reserved_until and datetime.now(timezone.utc) > item.reserved_until.replace(tzinfo=timezone.utc):
+            expired_product_names.append(product.name) # Ajouter le nom du produit
             items_to_remove_from_cart.append(item)
             expired_items_removed = True
         else:
-            item_total = item.product.price * item.quantity
+            item_total = product.price * item.quantity
             total_order_price += item_total
             cart_items_list.append({
-                'product': item.product,
+                'product': product,
                 'quantity': item.quantity,
                 'item_total': item_total,
                 'reserved_until': item.reserved_until # Passer la date de réservation au template si besoin
@@ -236,22 +272,11 @@ def checkout():
         return redirect(url_for('cart.cart_view'))
 
     # --- LOGIQUE DE LA COMMANDE GAGNANTE (GET) ---
+    # Simple indication : le rang définitif est attribué à la finalisation de la commande
     is_milestone_order = False
     next_milestone = None
-    milestone_orders_db = db.session.execute(db.select(Milestone).order_by(Milestone.order_number.asc())).scalars().all()
-    milestone_numbers = [m.order_number for m in milestone_orders_db]
-    
-    # On compte les commandes qui sont considérées comme "finalisées"
-    completed_orders_count = db.session.query(func.count(Order.id)).filter(Order.status.in_([
-        'Paiement à la livraison',
-        'Payée',
-        'En cours de traitement',
-        'Expédiée',
-        'Terminée'
-    ])).scalar()
-    
-    next_order_number = completed_orders_count + 1
-    if next_order_number in milestone_numbers:
+    next_order_number = peek_next_order_number()
+    if is_milestone_number(next_order_number):
         is_milestone_order = True
         next_milestone = next_order_number
     # --- FIN DE LA LOGIQUE ---
@@ -260,12 +285,7 @@ def checkout():
         payment_method = checkout_form.payment_method.data
         if payment_method == 'cod':
             try:
-                final_stock_errors = []
-                for item in cart_items_list:
-                    product = db.session.get(Product, item['product'].id)
-                    if not product or product.stock < item['quantity']:
-                        final_stock_errors.append(f"Le stock pour {item['product'].name} est insuffisant. Disponible: {product.stock if product else 0}, Demandé: {item['quantity']}.")
-                
+                order_lines, final_stock_errors = _order_lines(cart_items_list)
                 if final_stock_errors:
                     db.session.rollback()
                     for error in final_stock_errors:
@@ -274,19 +294,19 @@ def checkout():
 
                 new_order = Order(
                     customer_id=current_user.id,
-                    total_price=total_order_price,
-                    status='Paiement à la livraison'
+                    total_price=_lines_total(order_lines)
                 )
+                set_order_status(new_order, 'Paiement à la livraison')
                 db.session.add(new_order)
                 db.session.flush()
 
-                for item in cart_items_list:
-                    product = db.session.get(Product, item['product'].id)
-                    product.stock -= item['quantity']
+                for line in order_lines:
+                    product = line['product']
+                    product.stock -= line['quantity']
                     order_item = OrderItem(
                         order_id=new_order.id,
                         product_id=product.id,
-                        quantity=item['quantity'],
+                        quantity=line['quantity'],
                         price_at_purchase=product.price
                     )
                     db.session.add(order_item)
@@ -296,9 +316,7 @@ def checkout():
                 for item in items_to_delete:
                     db.session.delete(item)
 
-                if new_order.id in milestone_numbers:
-                    new_order.is_milestone = True
-                
+                assign_sequence_number(new_order)
                 db.session.commit()
 
                 try:
@@ -318,7 +336,7 @@ def checkout():
 
                 # --- LOGIQUE DE LA COMMANDE GAGNANTE (POST) ---
                 if new_order.is_milestone:
-                    flash(f'Félicitations ! Vous êtes notre client n°{new_order.id} ! Un cadeau surprise sera ajouté à votre commande.', 'milestone-win')
+                    flash(f'Félicitations ! Vous êtes notre client n°{new_order.sequence_number} ! Un cadeau surprise sera ajouté à votre commande.', 'milestone-win')
                 else:
                     flash('Votre commande a été passée avec succès ! Vous paierez à la livraison.', 'success')
                 # --- FIN DE LA LOGIQUE ---
@@ -330,68 +348,21 @@ def checkout():
                 return redirect(url_for('cart.checkout'))
         
         elif payment_method == 'stripe':
+            order_lines, final_stock_errors = _order_lines(cart_items_list)
+            if final_stock_errors:
+                for error in final_stock_errors:
+                    flash(error, 'danger')
+                return redirect(url_for('cart.cart_view'))
+
             # Vérification du montant minimum pour Stripe
             MIN_AMOUNT_XOF = 330  # Correspond à environ 0.50 EUR
-            if total_order_price < MIN_AMOUNT_XOF:
+            if _lines_total(order_lines) < MIN_AMOUNT_XOF:
                 flash(f'Le montant total de la commande doit être d\'au moins {MIN_AMOUNT_XOF} XOF pour un paiement par carte.', 'danger')
                 return redirect(url_for('cart.cart_view'))
 
             try:
-                # Supprimer les anciennes commandes en attente pour éviter les doublons
-                existing_pending_orders = db.session.execute(db.select(Order).filter_by(customer_id=current_user.id, status='En attente de paiement')).scalars().all()
-                if existing_pending_orders:
-                    for old_order in existing_pending_orders:
-                        db.session.query(OrderItem).filter_by(order_id=old_order.id).delete()
-                        db.session.delete(old_order)
-                    db.session.commit()
-
-                # Create a new order with status 'En attente de paiement'
-                new_order = Order(
-                    customer_id=current_user.id,
-                    total_price=total_order_price,
-                    status='En attente de paiement'
-                )
-                db.session.add(new_order)
-                db.session.flush()
-
-                if new_order.id in milestone_numbers:
-                    new_order.is_milestone = True
-
-                for item in cart_items_list:
-                    product = db.session.get(Product, item['product'].id)
-                    order_item = OrderItem(
-                        order_id=new_order.id,
-                        product_id=product.id,
-                        quantity=item['quantity'],
-                        price_at_purchase=product.price
-                    )
-                    db.session.add(order_item)
-                
-                db.session.commit()
-
-                stripe.api_key = current_app.config['STRIPE_SECRET_KEY']
-                line_items = []
-                for item in cart_items_list:
-                    line_items.append({
-                        'price_data': {
-                            'currency': 'xof',
-                            'product_data': {
-                                'name': item['product'].name,
-                            },
-                            'unit_amount': int(item['product'].price),
-                        },
-                        'quantity': item['quantity'],
-                    })
-                
-                checkout_session = stripe.checkout.Session.create(
-                    payment_method_types=['card'],
-                    line_items=line_items,
-                    mode='payment',
-                    success_url=url_for('cart.success', order_id=new_order.id, _external=True),
-                    cancel_url=url_for('cart.cancel', _external=True),
-                    metadata={'order_id': new_order.id}
-                )
-                return redirect(checkout_session.url, code=303)
+                checkout_url = start_stripe_checkout(current_user.id, order_lines)
+                return redirect(checkout_url, code=303)
             except Exception as e:
                 db.session.rollback()
                 flash(f'Erreur lors de la création de la session de paiement : {e}', 'danger')
@@ -400,6 +371,7 @@ def checkout():
     return render_template('checkout.html', cart_items=cart_items_list, total_order_price=total_order_price, checkout_form=checkout_form, is_milestone_order=is_milestone_order, next_milestone=next_milestone)
 
 @cart.route('/success')
+@use_primary
 @login_required
 def success():
     order_id = request.args.get('order_id', type=int)
@@ -416,16 +388,11 @@ def success():
     try:
         # Logique de finalisation de la commande déplacée ici
         if order.status == 'En attente de paiement':
-            order.status = 'Payée'
-            
-            # Décrémenter le stock
-            for item in order.items:
-                product = db.session.get(Product, item.product_id)
-                if product.stock < item.quantity:
-                    flash(f'Erreur: le stock pour {product.name} est devenu insuffisant.', 'danger')
-                    db.session.rollback()
-                    return redirect(url_for('cart.cart_view'))
-                product.stock -= item.quantity
+            # Décrémenter le stock ; le paiement est encaissé, même si le stock est devenu insuffisant
+            set_order_status(order, take_paid_order_stock(order))
+            if order.status == PAID_AWAITING_STOCK_STATUS:
+                flash("Votre paiement est bien reçu, mais un article n'est plus en stock : notre équipe vous contactera.", 'warning')
+            assign_sequence_number(order)
 
             # Envoyer l'email de confirmation
             try:
@@ -452,7 +419,7 @@ def success():
 
         # --- LOGIQUE DE LA COMMANDE GAGNANTE (Stripe) ---
         if order.is_milestone:
-            flash(f'Félicitations ! Vous êtes notre client n°{order.id} ! Un cadeau surprise sera ajouté à votre commande.', 'milestone-win')
+            flash(f'Félicitations ! Vous êtes notre client n°{order.sequence_number} ! Un cadeau surprise sera ajouté à votre commande.', 'milestone-win')
         # --- FIN DE LA LOGIQUE ---
 
     except Exception as e:
@@ -468,81 +435,9 @@ def cancel():
     return render_template('cancel.html')
 
 @cart.route('/stripe-webhook', methods=['POST'])
+@csrf.exempt
+@use_primary
 def stripe_webhook():
-    payload = request.get_data(as_text=True)
-    sig_header = request.headers.get('Stripe-Signature')
-    endpoint_secret = current_app.config.get('STRIPE_ENDPOINT_SECRET')
-    
-    if not endpoint_secret:
-        current_app.logger.error('Stripe endpoint secret not configured')
-        return 'Stripe endpoint secret not configured', 500
-
-    try:
-        event = stripe.Webhook.construct_event(
-            payload, sig_header, endpoint_secret
-        )
-    except ValueError as e:
-        # Invalid payload
-        current_app.logger.error(f'Invalid payload: {e}')
-        return 'Invalid payload', 400
-    except stripe.error.SignatureVerificationError as e:
-        # Invalid signature
-        current_app.logger.error(f'Invalid signature: {e}')
-        return 'Invalid signature', 400
-
-    # Handle the checkout.session.completed event
-    if event['type'] == 'checkout.session.completed':
-        session = event['data']['object']
-        order_id = session.get('metadata', {}).get('order_id')
-        
-        if not order_id:
-            current_app.logger.error('Missing order_id in Stripe session metadata')
-            return 'Missing order_id', 400
-            
-        order = db.session.get(Order, order_id)
-        
-        if not order:
-            current_app.logger.error(f'Order not found for order_id: {order_id}')
-            return 'Order not found', 404
-            
-        if order.status != 'En attente de paiement':
-            current_app.logger.warning(f'Order {order_id} already processed')
-            return 'Order already processed', 200
-            
-        try:
-            order.status = 'Payée'
-            
-            # Decrease stock
-            for item in order.items:
-                product = db.session.get(Product, item.product_id)
-                if product.stock < item.quantity:
-                    raise Exception(f'Not enough stock for product {product.name}')
-                product.stock -= item.quantity
-            
-            # Clear the cart
-            items_to_delete = db.session.execute(db.select(CartItem).filter_by(customer_id=order.customer_id)).scalars().all()
-            for item in items_to_delete:
-                db.session.delete(item)
-            
-            db.session.commit()
-            
-            # Send confirmation email
-            try:
-                subject = f"Confirmation de votre commande #{order.id}"
-                html_body = render_template('order_confirmation.html', order=order)
-                text_content = "Veuillez activer l'affichage HTML pour voir le contenu de cet e-mail."
-                msg = EmailMessage(subject=subject,
-                                   body=text_content,
-                                   from_email=current_app.config['MAIL_DEFAULT_SENDER'],
-                                   to=[order.customer.email],
-                                   html=html_body)
-                msg.send()
-            except Exception as e:
-                current_app.logger.error(f"Error sending email for order {order.id}: {e}")
-        
-        except Exception as e:
-            db.session.rollback()
-            current_app.logger.error(f"Error processing order {order_id}: {e}")
-            return 'Error processing order', 500
-
-    return 'Success', 200
\ No newline at end of file
+    # URL déclarée dans le tableau de bord Stripe : l'événement est enregistré
+    # puis traité en arrière-plan (voir payments/webhooks.py)
+    return ingest_webhook('stripe')
@@ -0,0 +1,164 @@
+'''
+Instantané en mémoire du catalogue (produits et catégories).
+
+Le catalogue est petit mais lu en permanence : chaque processus en garde une
+copie immuable (tuples nommés, index par identifiant, ordres de tri calculés
+d'avance) reconstruite quand la version globale du catalogue change (voir
+versioning.py). La version n'est relue en base qu'au plus toutes les
+CATALOG_SNAPSHOT_CHECK_SECONDS secondes ; un commit qui modifie le catalogue
+dans ce processus invalide l'instantané immédiatement. Les autres processus le
+voient donc avec au plus ce délai de retard.
+
+Les données servent à l'affichage (liste, panier, recommandations, sitemap) :
+les décisions qui doivent être exactes (décrément du stock, paiement) relisent
+toujours la ligne en base.
+'''
+import threading
+import time
+from datetime import datetime
+from types import MappingProxyType
+from typing import NamedTuple, Optional
+import sqlalchemy as sa
+from flask import current_app
+from flask_sqlalchemy.pagination import Pagination
+from .db_routing import RoutingSession
+from .extensions import db
+from .models import Category, Product
+from .utils.metrics import metrics
+from .versioning import catalog_version, CATALOG_BUMPED_INFO_KEY
+
+DEFAULT_CHECK_SECONDS = 5
+
+SORT_ORDERS = ('name_asc', 'name_desc', 'price_asc', 'price_desc')
+
+
+class CategoryRecord(NamedTuple):
+    id: int
+    name: str
+
+
+class ProductRecord(NamedTuple):
+    id: int
+    name: str
+    description: Optional[str]
+    image_file: Optional[str]
+    price: float
+    stock: int
+    category_id: int
+    category: Optional[CategoryRecord]
+    updated_at: datetime
+
+
+class CatalogSnapshot:
+    """Catalogue figé à une version donnée ; ne jamais modifier ses données."""
+
+    def __init__(self, version, categories, products):
+        self.version = version
+        self.categories = tuple(sorted(categories, key=lambda c: c.id))
+        self.products = tuple(sorted(products, key=lambda p: p.id))
+        self._categories_by_id = MappingProxyType({c.id: c for c in self.categories})
+        self._products_by_id = MappingProxyType({p.id: p for p in self.products})
+        # Textes de recherche en minuscules : nom du produit et de sa catégorie
+        self._search_text = MappingProxyType({
+            p.id: (p.name.casefold(), p.category.name.casefold() if p.category else '')
+            for p in self.products
+        })
+        by_name = tuple(sorted(self.products, key=lambda p: (p.name.casefold(), p.id)))
+        by_price = tuple(sorted(self.products, key=lambda p: (p.price, p.id)))
+        self._orders = MappingProxyType({
+            'name_asc': by_name,
+            'name_desc': by_name[::-1],
+            'price_asc': by_price,
+            'price_desc': by_price[::-1],
+        })
+
+    def product(self, product_id):
+        return self._products_by_id.get(product_id)
+
+    def category(self, category_id):
+        return self._categories_by_id.get(category_id)
+
+    def products_by_ids(self, product_ids):
+        """Produits existants, dans l'ordre des identifiants donnés."""
+        return [p for p in map(self._products_by_id.get, product_ids) if p is not None]
+
+    def search(self, query='', category_id=None, sort_by='name_asc'):
+        """
+        Équivalent en mémoire de la requête de la page produits : recherche dans
+        le nom du produit ou de sa catégorie, filtre par catégorie, tri.
+        """
+        products = self._orders.get(sort_by, self._orders['name_asc'])
+        if category_id:
+            products = [p for p in products if p.category_id == category_id]
+        if query:
+            needle = query.casefold()
+            search_text = self._search_text
+            products = [p for p in products if any(needle in text for text in search_text[p.id])]
+        return products
+
+
+class SequencePagination(Pagination):
+    """Pagination d'une séquence déjà en mémoire (même interface que db.paginate)."""
+
+    def _query_items(self):
+        items = self._query_args['items']
+        start = (self.page - 1) * self.per_page
+        return list(items[start:start + self.per_page])
+
+    def _query_count(self):
+        return len(self._query_args['items'])
+
+
+def paginate(items, page=None, per_page=None, **kwargs):
+    return SequencePagination(page=page, per_page=per_page, items=items, **kwargs)
+
+
+def build_snapshot():
+    """Charge le catalogue complet (colonnes utiles seulement, sans objets ORM)."""
+    # Version lue avant les lignes : une modification concurrente provoquera une nouvelle reconstruction
+    version = catalog_version()
+    categories = {row.id: CategoryRecord(row.id, row.name)
+                  for row in db.session.execute(db.select(Category.id, Category.name))}
+    products = [
+        ProductRecord(row.id, row.name, row.description, row.image_file, row.price, row.stock,
+                      row.category_id, categories.get(row.category_id), row.updated_at)
+        for row in db.session.execute(db.select(
+            Product.id, Product.name, Product.description, Product.image_file,
+            Product.price, Product.stock, Product.category_id, Product.updated_at))
+    ]
+    metrics.incr('catalog_snapshot_builds')
+    return CatalogSnapshot(version, categories.values(), products)
+
+
+_lock = threading.Lock()
+_snapshot = None
+_checked_at = 0.0
+
+
+def current_catalog():
+    """Instantané du catalogue à jour (à l'intervalle de vérification près)."""
+    global _snapshot, _checked_at
+    interval = current_app.config.get('CATALOG_SNAPSHOT_CHECK_SECONDS', DEFAULT_CHECK_SECONDS)
+    snapshot = _snapshot
+    if snapshot is not None and time.monotonic() - _checked_at < interval:
+        return snapshot
+    with _lock:
+        if _snapshot is not None and time.monotonic() - _checked_at < interval:
+            return _snapshot
+        if _snapshot is None or catalog_version() != _snapshot.version:
+            _snapshot = build_snapshot()
+        _checked_at = time.monotonic()
+        return _snapshot
+
+
+def invalidate_catalog_snapshot():
+    """Oublie l'instantané du processus ; le prochain accès relit le catalogue."""
+    global _snapshot
+    with _lock:
+        _snapshot = None
+
+
+@sa.event.listens_for(RoutingSession, 'after_commit')
+def _drop_snapshot_after_catalog_commit(session):
+    if session.info.pop(CATALOG_BUMPED_INFO_KEY, False):
+        invalidate_catalog_snapshot()
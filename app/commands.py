@@ -1,10 +1,21 @@
 '''
 Ce fichier enregistre les commandes CLI personnalisées pour l'application.
 '''
+import time
 import click
 from .extensions import db, bcrypt
 from .models import StaffUser, PageVisit
-from datetime import date
+from .utils.asset_pipeline import build_bundles
+from .utils.order_events import throughput_by_status, time_in_status
+from .payments.webhooks import process_pending_events
+from .payments.stripe_checkout import sweep_abandoned_orders
+from .utils.stock_alerts import send_low_stock_digest
+from .utils.notification_worker import process_notifications
+from .utils.price_watch import expire_reservations
+from .utils.customer_stats import rebuild_customer_stats
+from .utils.sales_facts import rebuild_sales_facts
+from .utils.catalog_import import import_catalog, CatalogImportError
+from datetime import date, datetime, timedelta, timezone
 from sqlalchemy import func
 
 # Importer le groupe de commandes 'seed' depuis le nouveau fichier seed.py
@@ -49,4 +60,107 @@ def register_commands(app):
             click.echo(f"Supprimé {deleted_count} enregistrements de visites pour le {today.strftime('%d/%m/%Y')}.")
         except Exception as e:
             db.session.rollback()
-            click.echo(click.style(f"Une erreur est survenue : {e}", fg='red'))
\ No newline at end of file
+            click.echo(click.style(f"Une erreur est survenue : {e}", fg='red'))
+
+    @app.cli.command('build-assets')
+    @click.argument('names', nargs=-1)
+    def build_assets(names):
+        """Compile les bundles CSS/JS en fichiers empreintés et précompressés (gzip/brotli)."""
+        from .extensions import assets
+        manifest = build_bundles(assets, app.static_folder, names or None)
+        for name, filename in manifest.items():
+            click.echo(f"{name} -> {filename}")
+        click.echo(click.style("Bundles compilés. Redémarrez les workers pour charger le nouveau manifeste.", fg='green'))
+
+    @app.cli.command('order-status-report')
+    @click.option('--days', default=7, show_default=True, help="Période analysée, en jours.")
+    def order_status_report(days):
+        """Affiche les transitions par statut et le temps passé dans chaque statut."""
+        end = datetime.now(timezone.utc).replace(tzinfo=None)
+        start = end - timedelta(days=days)
+        throughput = throughput_by_status(start, end)
+        if not throughput:
+            click.echo("Aucun changement de statut sur la période.")
+            return
+        for status, count in sorted(throughput.items(), key=lambda item: -item[1]):
+            stats = time_in_status(status, start, end, now=end)
+            average = stats['average_seconds'] / 3600 if stats['average_seconds'] is not None else 0
+            click.echo(f"{status:<28} {count:>6} entrées  {average:>8.1f} h en moyenne  "
+                       f"({stats['still_in_status']} encore dans ce statut)")
+
+    @app.cli.command('process-webhooks')
+    @click.option('--loop', is_flag=True, help="Traite les événements en continu (processus dédié).")
+    def process_webhooks(loop):
+        """Traite les notifications de paiement en attente ou à retenter."""
+        while True:
+            processed = process_pending_events()
+            # Nouvelle session à chaque passage : pas d'objets périmés d'un tour à l'autre
+            db.session.remove()
+            if processed:
+                click.echo(f"{processed} événement(s) traité(s).")
+            if not loop:
+                break
+            if not processed:
+                time.sleep(app.config['WEBHOOK_POLL_SECONDS'])
+
+    @app.cli.command('sweep-pending-orders')
+    def sweep_pending_orders():
+        """Annule les commandes en attente de paiement dont la session Stripe a expiré (tâche planifiée)."""
+        swept = sweep_abandoned_orders()
+        click.echo(f"{swept} commande(s) en attente annulée(s).")
+
+    @app.cli.command('low-stock-digest')
+    def low_stock_digest():
+        """Envoie au personnel le récapitulatif des nouvelles alertes de stock faible et des commandes payées en attente de stock (tâche planifiée)."""
+        sent = send_low_stock_digest()
+        click.echo(f"{sent} alerte(s) de stock faible ou commande(s) en attente de stock envoyée(s).")
+
+    @app.cli.command('send-notifications')
+    @click.option('--loop', is_flag=True, help="Traite les notifications en continu (processus dédié).")
+    def send_notifications(loop):
+        """Diffuse les retours en stock et envoie les notifications clients en attente."""
+        while True:
+            processed = process_notifications()
+            db.session.remove()
+            if processed:
+                click.echo(f"{processed} retour(s) en stock et notification(s) traité(s).")
+            if not loop:
+                break
+            if not processed:
+                time.sleep(app.config['NOTIFICATION_POLL_SECONDS'])
+
+    @app.cli.command('expire-reservations')
+    def expire_price_reservations():
+        """Clôt les réservations de l'Achat Intelligent arrivées à échéance (tâche planifiée)."""
+        expired = expire_reservations()
+        click.echo(f"{expired} réservation(s) expirée(s).")
+
+    @app.cli.command('rebuild-customer-stats')
+    def rebuild_customer_stats_command():
+        """Recalcule les statistiques de tous les clients à partir de leurs commandes."""
+        count = rebuild_customer_stats()
+        click.echo(f"Statistiques recalculées pour {count} client(s).")
+
+    @app.cli.command('rebuild-sales-facts')
+    def rebuild_sales_facts_command():
+        """Recalcule la table des ventes par jour et par produit à partir des commandes."""
+        count = rebuild_sales_facts()
+        click.echo(f"{count} ligne(s) de ventes journalières recalculée(s).")
+
+    @app.cli.command('import-catalog')
+    @click.argument('path', type=click.Path(exists=True, dir_okay=False))
+    @click.option('--dry-run', is_flag=True, help="Vérifie le fichier sans rien enregistrer.")
+    @click.option('--chunk-size', default=500, show_default=True, help="Nombre de lignes traitées par lot.")
+    def import_catalog_command(path, dry_run, chunk_size):
+        """Importe ou met à jour des produits et des stocks depuis un fichier CSV ou XLSX."""
+        try:
+            with open(path, 'rb') as stream:
+                report = import_catalog(stream, path, chunk_size=chunk_size, dry_run=dry_run)
+        except CatalogImportError as e:
+            raise click.ClickException(str(e))
+        for line, message in report.errors:
+            click.echo(click.style(f"Ligne {line} : {message}", fg='red'))
+        click.echo(f"{report.rows} ligne(s) lue(s) : {report.created} produit(s) créé(s), "
+                   f"{report.updated} mis à jour, {report.unchanged} inchangé(s), {len(report.errors)} erreur(s).")
+        if dry_run:
+            click.echo("Simulation : aucune modification enregistrée.")
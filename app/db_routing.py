@@ -0,0 +1,160 @@
+'''
+Routage des lectures vers une réplique PostgreSQL.
+
+Les requêtes GET/HEAD de la boutique (catalogue, réalisations, tableau de bord)
+sont servies par la réplique déclarée dans SQLALCHEMY_BINDS['replica'] ; toutes
+les écritures partent sur la base principale. Règles :
+
+- une requête non sûre (POST, PUT, DELETE...) rend le client « collant » à la
+  base principale pendant DB_REPLICA_STICKY_SECONDS, pour qu'il relise ses
+  propres écritures ;
+- dès qu'une requête écrit (flush), elle lit ensuite sur la base principale ;
+- les vues décorées par @use_primary (paiement, webhooks, panier) ne lisent
+  jamais la réplique ;
+- si le retard de réplication dépasse DB_REPLICA_MAX_LAG_SECONDS, ou si la
+  réplique est injoignable, on retombe automatiquement sur la base principale.
+'''
+import time
+import threading
+from functools import wraps
+import sqlalchemy as sa
+from flask import g, request, session, has_request_context, current_app
+from flask_sqlalchemy.session import Session
+
+REPLICA_BIND_KEY = 'replica'
+SAFE_METHODS = frozenset(['GET', 'HEAD', 'OPTIONS'])
+STICKY_SESSION_KEY = '_db_primary_until'
+# Marqueur posé dans Session.info quand la requête a écrit sur la base principale
+PRIMARY_STICKY_INFO_KEY = 'db_primary_sticky'
+
+# Requête de mesure du retard d'une réplique PostgreSQL (0 si elle est à jour)
+PG_REPLICA_LAG_SQL = sa.text(
+    "SELECT CASE WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 "
+    "ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0) END"
+)
+
+
+def use_primary(f):
+    """Décorateur de vue : toutes les lectures de la vue se font sur la base principale."""
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        return f(*args, **kwargs)
+    decorated_function.db_use_primary = True
+    return decorated_function
+
+
+class RoutingSession(Session):
+    """Session Flask-SQLAlchemy qui envoie les lectures vers la réplique quand la requête le permet."""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        primary = super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+        if bind is not None or primary is not self._db.engines.get(None):
+            # Bind explicite ou modèle rattaché à une autre base : on ne touche à rien
+            return primary
+        if not (has_request_context() and g.get('db_use_replica')):
+            return primary
+        if self._flushing or self.info.get(PRIMARY_STICKY_INFO_KEY):
+            return primary
+        if clause is not None and not _is_plain_select(clause):
+            return primary
+        return self._db.engines[REPLICA_BIND_KEY]
+
+
+def _is_plain_select(clause):
+    """Vrai pour un SELECT sans verrou (les SELECT ... FOR UPDATE restent sur la base principale)."""
+    return isinstance(clause, sa.sql.Select) and clause._for_update_arg is None
+
+
+class ReplicaHealth:
+    """Mesure périodique du retard de la réplique, partagée par les threads d'un worker."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.checked_at = 0.0
+        self.healthy = True
+        self.lag = 0.0
+        # Remplaçable (tests, autres SGBD) : fonction(engine) -> retard en secondes
+        self.lag_probe = measure_replica_lag
+
+    def reset(self):
+        with self._lock:
+            self.checked_at = 0.0
+            self.healthy = True
+            self.lag = 0.0
+
+    def is_healthy(self, engine, max_lag, interval):
+        now = time.monotonic()
+        if now - self.checked_at < interval:
+            return self.healthy
+        with self._lock:
+            if now - self.checked_at < interval:
+                return self.healthy
+            try:
+                self.lag = self.lag_probe(engine)
+                self.healthy = self.lag <= max_lag
+            except Exception as e:
+                current_app.logger.warning(f"Réplique injoignable, lectures sur la base principale : {e}")
+                self.healthy = False
+            self.checked_at = now
+            return self.healthy
+
+
+def measure_replica_lag(engine):
+    """Retourne le retard de réplication en secondes (0 pour les SGBD sans réplication, ex. SQLite)."""
+    with engine.connect() as connection:
+        if engine.dialect.name != 'postgresql':
+            connection.execute(sa.text('SELECT 1'))
+            return 0.0
+        return float(connection.execute(PG_REPLICA_LAG_SQL).scalar() or 0)
+
+
+class DatabaseRouter:
+    """Extension qui décide, pour chaque requête, si les lectures peuvent aller sur la réplique."""
+
+    def __init__(self, app=None):
+        self.health = ReplicaHealth()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('DB_REPLICA_STICKY_SECONDS', 10)
+        app.config.setdefault('DB_REPLICA_MAX_LAG_SECONDS', 5)
+        app.config.setdefault('DB_REPLICA_CHECK_INTERVAL', 5)
+        app.extensions['db_router'] = self
+        app.before_request(self._choose_route)
+        app.after_request(self._mark_sticky)
+
+    def replica_configured(self):
+        return REPLICA_BIND_KEY in (current_app.config.get('SQLALCHEMY_BINDS') or {})
+
+    def _choose_route(self):
+        g.db_use_replica = self._can_use_replica()
+
+    def _can_use_replica(self):
+        if not self.replica_configured() or request.method not in SAFE_METHODS:
+            return False
+        view = current_app.view_functions.get(request.endpoint)
+        if view is not None and getattr(view, 'db_use_primary', False):
+            return False
+        if session.get(STICKY_SESSION_KEY, 0) > time.time():
+            return False
+        from .extensions import db
+        return self.health.is_healthy(
+            db.engines[REPLICA_BIND_KEY],
+            current_app.config['DB_REPLICA_MAX_LAG_SECONDS'],
+            current_app.config['DB_REPLICA_CHECK_INTERVAL'],
+        )
+
+    def _mark_sticky(self, response):
+        if request.method not in SAFE_METHODS and self.replica_configured():
+            session[STICKY_SESSION_KEY] = time.time() + current_app.config['DB_REPLICA_STICKY_SECONDS']
+        return response
+
+
+@sa.event.listens_for(RoutingSession, 'after_flush')
+def _stick_to_primary_after_write(db_session, flush_context):
+    """Après une écriture, la suite de la requête lit sur la base principale (sauf modèles exemptés)."""
+    for obj in list(db_session.new) + list(db_session.dirty) + list(db_session.deleted):
+        if getattr(type(obj), '__replica_sticky__', True):
+            db_session.info[PRIMARY_STICKY_INFO_KEY] = True
+            return
@@ -7,8 +7,14 @@ from flask_wtf.csrf import CSRFProtect
 from flask_migrate import Migrate
 from flask_assets import Environment
 from flask_sitemap import Sitemap
+from flask_limiter import Limiter
+from flask_caching import Cache
+from .db_routing import RoutingSession, DatabaseRouter
+from .utils.rate_limits import client_ip, record_breach
+from .utils.lazy_context import LazyContext
+from .utils.compression import ResponseCompressor
 
-db = SQLAlchemy()
+db = SQLAlchemy(session_options={'class_': RoutingSession})
 bcrypt = Bcrypt()
 login_manager = LoginManager()
 mail = Mail()
@@ -17,3 +23,8 @@ csrf = CSRFProtect()
 migrate = Migrate()
 assets = Environment()
 sitemap = Sitemap()
+db_router = DatabaseRouter()
+limiter = Limiter(key_func=client_ip, on_breach=record_breach)
+cache = Cache()
+lazy_context = LazyContext()
+compressor = ResponseCompressor()
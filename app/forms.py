@@ -27,6 +27,14 @@ class MilestoneForm(FlaskForm):
         if milestone:
             raise ValidationError('Ce palier existe déjà.')
 
+BANNER_POSITIONS = [
+    ('top', 'Haut de page (toutes les pages)'),
+    ('homepage', 'Page d\'accueil seulement'),
+    ('product_page', 'Pages produits'),
+    ('sidebar', 'Barre latérale')
+]
+STAFF_ROLES = [('staff', 'Staff'), ('admin', 'Admin')]
+
 class BannerForm(FlaskForm):
     title = StringField('Titre de la bannière', validators=[DataRequired(), Length(min=2, max=100)])
     message = TextAreaField('Message de la bannière', validators=[Optional(), Length(max=500)])
@@ -35,12 +43,7 @@ class BannerForm(FlaskForm):
     is_active = BooleanField('Bannière active')
     start_date = DateField('Date de début (optionnel)', format='%Y-%m-%d', validators=[Optional()])
     end_date = DateField('Date de fin (optionnel)', format='%Y-%m-%d', validators=[Optional()])
-    position = SelectField('Position de la bannière', choices=[
-        ('top', 'Haut de page (toutes les pages)'),
-        ('homepage', 'Page d\'accueil seulement'),
-        ('product_page', 'Pages produits'),
-        ('sidebar', 'Barre latérale')
-    ], validators=[DataRequired()])
+    position = SelectField('Position de la bannière', choices=BANNER_POSITIONS, validators=[DataRequired()])
     submit = SubmitField('Enregistrer la bannière')
 
     def validate_on_submit(self):
@@ -121,6 +124,11 @@ class ProductForm(FlaskForm):
     image_files = MultipleFileField('Images du Produit (plusieurs choix possibles)', validators=[Optional(), FileAllowed(['jpg', 'png', 'jpeg', 'gif', 'webp'], 'Seuls les fichiers images sont autorisés !')])
     submit = SubmitField('Enregistrer le Produit')
 
+class ProductImportForm(FlaskForm):
+    file = FileField('Fichier (CSV ou XLSX)', validators=[DataRequired(), FileAllowed(['csv', 'xlsx'], 'Fichiers CSV ou XLSX uniquement !')])
+    dry_run = BooleanField('Simulation (vérifier le fichier sans rien enregistrer)')
+    submit = SubmitField('Importer')
+
 class DeleteForm(FlaskForm):
     submit = SubmitField('Supprimer')
 
@@ -160,7 +168,7 @@ class StaffRegistrationForm(FlaskForm):
     email = StringField('Email', validators=[DataRequired(), Email()])
     password = PasswordField('Mot de passe', validators=[DataRequired(), Length(min=8), validate_password_strength])
     confirm_password = PasswordField('Confirmer le mot de passe', validators=[DataRequired(), EqualTo('password')])
-    role = SelectField('Rôle', choices=[('staff', 'Staff'), ('admin', 'Admin')], validators=[DataRequired()])
+    role = SelectField('Rôle', choices=STAFF_ROLES, validators=[DataRequired()])
     submit = SubmitField('Inscrire le membre')
 
     def validate_username(self, username):
@@ -176,7 +184,7 @@ class StaffRegistrationForm(FlaskForm):
 class StaffUserEditForm(FlaskForm):
     username = StringField("Nom d'utilisateur", validators=[DataRequired(), Length(min=2, max=20)])
     email = StringField('Email', validators=[DataRequired(), Email()])
-    role = SelectField('Rôle', choices=[('staff', 'Staff'), ('admin', 'Admin')], validators=[DataRequired()])
+    role = SelectField('Rôle', choices=STAFF_ROLES, validators=[DataRequired()])
     password = PasswordField('Nouveau mot de passe (laisser vide pour ne pas changer)', validators=[Optional(), Length(min=8), validate_password_strength])
     confirm_password = PasswordField('Confirmer le nouveau mot de passe', validators=[EqualTo('password', message='Les mots de passe doivent correspondre.')])
     submit = SubmitField("Mettre à jour l'utilisateur")
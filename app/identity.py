@@ -0,0 +1,156 @@
+'''
+Chargement de l'utilisateur connecté sans requête SQL à chaque page.
+
+Après un premier chargement complet, un instantané de l'identité (id, type,
+nom d'utilisateur, e-mail, rôle, version des identifiants) est conservé dans la
+session. Aux requêtes suivantes, `load_identity` reconstruit l'objet StaffUser
+ou Customer à partir de cet instantané et l'attache à la session SQLAlchemy
+sans requête (merge avec load=False) : les vérifications `isinstance` et
+l'affichage du nom fonctionnent sans accès à la base, et les autres colonnes
+(mot de passe, relations) sont chargées seulement si la vue y accède.
+
+L'instantané est revalidé :
+- après IDENTITY_SNAPSHOT_TTL secondes ;
+- dès que la version des identifiants publiée dans le cache diffère de la
+  sienne (voir `invalidate_identity`, appelé après un changement de mot de
+  passe, de rôle, de nom d'utilisateur ou d'e-mail) ;
+- quand aucune version n'est publiée (entrée expirée ou évincée, compte
+  supprimé : voir `forget_identity`) : l'utilisateur est alors rechargé depuis
+  la base, qui republie sa version.
+
+Les versions publiées doivent être vues par tous les workers : l'instantané
+n'est utilisé qu'avec un cache partagé (Redis, Memcached). Avec le cache
+SimpleCache par processus, IDENTITY_SNAPSHOT vaut False par défaut et
+l'utilisateur est chargé depuis la base à chaque requête.
+'''
+import time
+from flask import session, current_app
+from flask_login import user_logged_out
+from sqlalchemy.orm import make_transient_to_detached
+from .extensions import db, cache
+
+SNAPSHOT_SESSION_KEY = '_identity'
+SHARED_CACHE_BACKENDS = ('redis', 'memcached')
+
+
+def _identity_version_key(user_id_str):
+    return f'identity-version:{user_id_str}'
+
+
+def _model_for(user_type):
+    from .models import StaffUser, Customer
+    return {'staff': StaffUser, 'customer': Customer}.get(user_type)
+
+
+def snapshot_identity(user):
+    """Construit l'instantané d'identité stocké dans la session."""
+    user_type = user.get_id().split('-')[0]
+    return {
+        'uid': user.get_id(),
+        'id': user.id,
+        'type': user_type,
+        'username': user.username,
+        'email': user.email,
+        'role': getattr(user, 'role', None),
+        'cv': user.credential_version,
+        'ts': time.time(),
+    }
+
+
+def _identity_from_snapshot(model, snapshot):
+    """Reconstruit l'utilisateur à partir de l'instantané, sans requête SQL."""
+    user = model(id=snapshot['id'], username=snapshot['username'], email=snapshot['email'],
+                 credential_version=snapshot['cv'])
+    if snapshot['type'] == 'staff':
+        user.role = snapshot['role']
+    # Les colonnes absentes de l'instantané sont marquées « expirées » et seront
+    # chargées à la première lecture.
+    make_transient_to_detached(user)
+    return db.session.merge(user, load=False)
+
+
+def _snapshot_is_valid(snapshot, user_id_str):
+    if not snapshot or snapshot.get('uid') != user_id_str:
+        return False
+    if time.time() - snapshot.get('ts', 0) > current_app.config['IDENTITY_SNAPSHOT_TTL']:
+        return False
+    published_version = cache.get(_identity_version_key(user_id_str))
+    return published_version is not None and published_version == snapshot.get('cv')
+
+
+def _publish_version(user_id_str, credential_version):
+    cache.set(_identity_version_key(user_id_str), credential_version,
+              timeout=current_app.config['IDENTITY_SNAPSHOT_TTL'])
+
+
+def load_identity(user_id_str):
+    """Callback `user_loader` de Flask-Login."""
+    try:
+        user_type, user_id = user_id_str.split('-')
+        user_id = int(user_id)
+    except (ValueError, TypeError):
+        return None
+
+    model = _model_for(user_type)
+    if model is None:
+        return None
+
+    if not current_app.config['IDENTITY_SNAPSHOT']:
+        return db.session.get(model, user_id)
+
+    snapshot = session.get(SNAPSHOT_SESSION_KEY)
+    if _snapshot_is_valid(snapshot, user_id_str):
+        return _identity_from_snapshot(model, snapshot)
+
+    user = db.session.get(model, user_id)
+    if user is None:
+        session.pop(SNAPSHOT_SESSION_KEY, None)
+        return None
+    session[SNAPSHOT_SESSION_KEY] = snapshot_identity(user)
+    _publish_version(user_id_str, user.credential_version)
+    return user
+
+
+def bump_credential_version(user):
+    """Incrémente la version des identifiants (à appeler avant le commit de la modification)."""
+    user.credential_version = (user.credential_version or 1) + 1
+
+
+def invalidate_identity(user):
+    """
+    Publie la nouvelle version des identifiants (à appeler après le commit) : les
+    instantanés plus anciens, dans toutes les sessions, seront rechargés depuis la base.
+    """
+    _publish_version(user.get_id(), user.credential_version)
+    _drop_own_snapshot(user.get_id())
+
+
+def forget_identity(user_id_str):
+    """
+    Retire la version publiée d'un compte supprimé (à appeler après le commit) :
+    ses instantanés, dans toutes les sessions, sont rechargés et la session déconnectée.
+    """
+    cache.delete(_identity_version_key(user_id_str))
+    _drop_own_snapshot(user_id_str)
+
+
+def _drop_own_snapshot(user_id_str):
+    snapshot = session.get(SNAPSHOT_SESSION_KEY)
+    if snapshot and snapshot.get('uid') == user_id_str:
+        session.pop(SNAPSHOT_SESSION_KEY, None)
+
+
+def _cache_is_shared(config):
+    cache_type = str(config.get('CACHE_TYPE') or '').lower()
+    return any(backend in cache_type for backend in SHARED_CACHE_BACKENDS)
+
+
+def init_identity(app, login_manager):
+    app.config.setdefault('IDENTITY_SNAPSHOT', _cache_is_shared(app.config))
+    app.config.setdefault('IDENTITY_SNAPSHOT_TTL', 300)
+    login_manager.user_loader(load_identity)
+
+
+@user_logged_out.connect
+def _drop_snapshot(sender, user=None, **extra):
+    session.pop(SNAPSHOT_SESSION_KEY, None)
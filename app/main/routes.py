@@ -10,8 +10,12 @@ from .. import db
 from ..models import Product, ContactMessage, Order, Customer, StaffUser, Post, PageContent, Banner, NewsletterSubscriber
 from ..forms import ContactForm, ProfileForm, NewsletterForm
 from ..admin.routes import customer_required
+from ..extensions import limiter
+from ..utils.rate_limits import limit_from_config
+from ..identity import bump_credential_version, invalidate_identity
 from sqlalchemy.exc import IntegrityError
-from urllib.parse import urlparse, parse_qs
+from ..utils.pagination import encode_cursor, decode_cursor, after_cursor
+from ..utils.post_media import post_cards
 
 @main.route('/')
 def index():
@@ -24,6 +28,7 @@ def index():
     return render_template('index.html', latest_products=latest_products, homepage_banners=homepage_banners)
 
 @main.route('/contact', methods=['GET', 'POST'])
+@limiter.limit(limit_from_config('RATELIMIT_FORM_IP'), methods=['POST'])
 def contact():
     """Affiche le formulaire de contact et gère sa soumission."""
     form = ContactForm()
@@ -55,7 +60,9 @@ def profile():
     if form.validate_on_submit():
         current_user.username = form.username.data
         current_user.email = form.email.data
+        bump_credential_version(current_user)
         db.session.commit()
+        invalidate_identity(current_user)
         flash("Votre profil a été mis à jour avec succès.", "success")
         return redirect(url_for('main.profile'))
     elif request.method == 'GET':
@@ -79,37 +86,34 @@ def order_detail(order_id):
         return redirect(url_for('main.index'))
     return render_template('order_detail.html', order=order)
 
+REALISATIONS_PER_PAGE = 12
+
 @main.route('/realisations')
 def realisations():
-    """Affiche la page des réalisations."""
-    posts = db.session.execute(db.select(Post).order_by(Post.created_at.desc())).scalars().all()
-    return render_template('realisations.html', posts=posts)
+    """Affiche la page des réalisations, par pages de REALISATIONS_PER_PAGE (curseur `after`)."""
+    keys = (Post.created_at, Post.id)
+    query = db.select(*keys, Post.version).order_by(Post.created_at.desc(), Post.id.desc())
+    cursor = decode_cursor(request.args.get('after'), keys)
+    if cursor is not None:
+        query = query.where(after_cursor(keys, cursor, descending=True))
+    rows = db.session.execute(query.limit(REALISATIONS_PER_PAGE + 1)).all()
+    next_url = None
+    if len(rows) > REALISATIONS_PER_PAGE:
+        rows = rows[:REALISATIONS_PER_PAGE]
+        next_url = url_for('main.realisations', after=encode_cursor(rows[-1][:len(keys)]))
+    return render_template('realisations.html', cards=post_cards([(row.id, row.version) for row in rows]),
+                           next_url=next_url, is_later_page=cursor is not None)
 
 @main.route('/realisations/<int:post_id>')
 def post_detail(post_id):
     post = Post.query.get_or_404(post_id)
-    embed_url = None
-    if post.video_url:
-        try:
-            video_id = None
-            parsed_url = urlparse(post.video_url)
-            if 'youtube.com' in parsed_url.netloc:
-                if 'watch' in parsed_url.path:
-                    video_id = parse_qs(parsed_url.query).get('v', [None])[0]
-                elif '/shorts/' in parsed_url.path:
-                    video_id = parsed_url.path.split('/shorts/')[1]
-            elif 'youtu.be' in parsed_url.netloc:
-                video_id = parsed_url.path.lstrip('/')
-            
-            if video_id:
-                embed_url = f'https://www.youtube.com/embed/{video_id}'
-        except Exception:
-            embed_url = None
-    return render_template('post_detail.html', post=post, embed_url=embed_url)
+    # URL d'intégration calculée à l'enregistrement (voir utils/post_media.py)
+    return render_template('post_detail.html', post=post, embed_url=post.embed_url)
 
 # The /about route is now handled by the generic dynamic_page route
 
 @main.route('/subscribe_newsletter', methods=['POST'])
+@limiter.limit(limit_from_config('RATELIMIT_FORM_IP'))
 def subscribe_newsletter():
     form = NewsletterForm()
     if form.validate_on_submit():
@@ -143,6 +147,7 @@ def dynamic_page(page_name):
 
 # --- Sitemap Generation ---
 from ..extensions import sitemap
+from ..catalog_snapshot import current_catalog
 
 @sitemap.register_generator
 def static_urls():
@@ -152,26 +157,27 @@ def static_urls():
     yield 'main.realisations', {}
     yield 'products.produits', {}
 
+def _lastmod(updated_at):
+    # Date de dernière modification (colonne updated_at, voir versioning.py) au format du sitemap
+    return updated_at.date().isoformat()
+
 @sitemap.register_generator
 def product_urls():
     """Generator for product detail page URLs."""
-    products = db.session.execute(db.select(Product)).scalars().all()
-    for product in products:
-        yield 'products.product_detail', {'product_id': product.id}
+    for product in current_catalog().products:
+        yield 'products.product_detail', {'product_id': product.id}, _lastmod(product.updated_at)
 
 @sitemap.register_generator
 def post_urls():
     """Generator for post detail page URLs."""
-    posts = db.session.execute(db.select(Post)).scalars().all()
-    for post in posts:
-        yield 'main.post_detail', {'post_id': post.id}
+    for post_id, updated_at in db.session.execute(db.select(Post.id, Post.updated_at)):
+        yield 'main.post_detail', {'post_id': post_id}, _lastmod(updated_at)
 
 @sitemap.register_generator
 def dynamic_page_urls():
     """Generator for dynamic page URLs."""
-    pages = db.session.execute(db.select(PageContent)).scalars().all()
-    for page in pages:
-        yield 'main.dynamic_page', {'page_name': page.page_name}
+    for page_name, updated_at in db.session.execute(db.select(PageContent.page_name, PageContent.updated_at)):
+        yield 'main.dynamic_page', {'page_name': page_name}, _lastmod(updated_at)
 
 @main.route('/sitemap.xml')
 def sitemap_xml():
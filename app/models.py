@@ -9,6 +9,17 @@ class GetTokenMixin:
         s = Serializer(current_app.config['SECRET_KEY'])
         return s.dumps({'user_type': self.get_id().split('-')[0], 'user_id': self.id})
 
+class CatalogVersionedMixin:
+    """
+    Contenu versionné : `version` est incrémentée et `updated_at` (UTC) mis à jour
+    à chaque modification de la ligne. Toute écriture fait aussi avancer la version
+    globale du catalogue (voir versioning.py), sauf si `bumps_catalog_version` est
+    faux (contenus éditoriaux absents de l'instantané du catalogue et de l'API).
+    """
+    bumps_catalog_version = True
+    version = db.Column(db.Integer, nullable=False, default=1, server_default='1')
+    updated_at = db.Column(db.DateTime, nullable=False, default=lambda: datetime.now(timezone.utc), index=True)
+
 class StaffUser(db.Model, UserMixin, GetTokenMixin):
     """
     Ce modèle représente un utilisateur du personnel (administrateur, employé) du site.
@@ -20,6 +31,8 @@ class StaffUser(db.Model, UserMixin, GetTokenMixin):
     password = db.Column(db.String(200), nullable=False)
     previous_password = db.Column(db.String(200), nullable=True)
     role = db.Column(db.String(20), nullable=False, default='staff')
+    # Incrémentée à chaque changement d'identifiants : invalide les identités mises en cache (voir identity.py)
+    credential_version = db.Column(db.Integer, nullable=False, default=1, server_default='1')
 
     def get_id(self):
         return f'staff-{self.id}'
@@ -43,7 +56,7 @@ class StaffUser(db.Model, UserMixin, GetTokenMixin):
         except:
             return None
 
-class Category(db.Model):
+class Category(db.Model, CatalogVersionedMixin):
     __tablename__ = 'category'
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(100), unique=True, nullable=False)
@@ -52,7 +65,7 @@ class Category(db.Model):
     def __repr__(self):
         return f'<Category {self.name}>'
 
-class Product(db.Model):
+class Product(db.Model, CatalogVersionedMixin):
     __tablename__ = 'product'
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(100), nullable=False)
@@ -68,8 +81,9 @@ class Product(db.Model):
     order_items = db.relationship('OrderItem', back_populates='product', lazy=True)
     smart_shoppings = db.relationship('SmartShopping', back_populates='product', lazy=True)
     cart_items = db.relationship('CartItem', back_populates='product', lazy=True)
+    low_stock_alert = db.relationship('LowStockAlert', back_populates='product', uselist=False, cascade="all, delete-orphan")
 
-class ProductImage(db.Model):
+class ProductImage(db.Model, CatalogVersionedMixin):
     __tablename__ = 'product_image'
     id = db.Column(db.Integer, primary_key=True)
     image_file = db.Column(db.String(255), nullable=False)
@@ -80,33 +94,109 @@ class ProductImage(db.Model):
     def __repr__(self):
         return f'<ProductImage {self.image_file} for product {self.product_id}>'
 
+class LowStockAlert(db.Model):
+    """
+    Produit actuellement sous son seuil de stock (une ligne au plus par produit).
+    Tenue à jour à chaque modification du stock (voir utils/stock_alerts.py).
+    """
+    __tablename__ = 'low_stock_alert'
+    id = db.Column(db.Integer, primary_key=True)
+    product_id = db.Column(db.Integer, db.ForeignKey('product.id'), nullable=False, unique=True)
+    product = db.relationship('Product', back_populates='low_stock_alert')
+    stock = db.Column(db.Integer, nullable=False)
+    threshold = db.Column(db.Integer, nullable=False)
+    created_at = db.Column(db.DateTime, nullable=False, default=lambda: datetime.now(timezone.utc))
+    updated_at = db.Column(db.DateTime, nullable=False, default=lambda: datetime.now(timezone.utc))
+    # Date d'envoi du récapitulatif au personnel ; NULL tant que l'alerte est nouvelle
+    notified_at = db.Column(db.DateTime, nullable=True, index=True)
+
+    def __repr__(self):
+        return f'<LowStockAlert product={self.product_id} stock={self.stock}/{self.threshold}>'
+
 class ContactMessage(db.Model):
     __tablename__ = 'contact_message'
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(100), nullable=False)
     email = db.Column(db.String(120), nullable=False)
     message = db.Column(db.Text, nullable=False)
-    date_posted = db.Column(db.DateTime, nullable=False, default=lambda: datetime.now(timezone.utc))
+    date_posted = db.Column(db.DateTime, nullable=False, default=lambda: datetime.now(timezone.utc), index=True)
 
     def __repr__(self):
         return f"ContactMessage('{self.name}', '{self.email}', '{self.date_posted}')"
 
 class Order(db.Model):
     __tablename__ = 'orders'
+    __table_args__ = (
+        db.Index('ix_orders_status_stripe_session_expires_at', 'status', 'stripe_session_expires_at'),
+        # Commandes d'un client (statistiques clients, test d'existence avant suppression)
+        db.Index('ix_orders_customer_id_status', 'customer_id', 'status'),
+    )
     id = db.Column(db.Integer, primary_key=True)
     customer_id = db.Column(db.Integer, db.ForeignKey('customer.id'), nullable=False)
     total_price = db.Column(db.Float, nullable=False)
     status = db.Column(db.String(50), nullable=False, default='En attente')
-    status_history = db.Column(db.Text, nullable=True)
     date_ordered = db.Column(db.DateTime, nullable=False, default=lambda: datetime.now(timezone.utc))
     is_milestone = db.Column(db.Boolean, default=False, nullable=False)
+    # Rang de la commande parmi les commandes finalisées (client n°...), attribué par utils/order_sequence.py
+    sequence_number = db.Column(db.Integer, unique=True, nullable=True)
+    # Session Stripe Checkout de la commande en attente de paiement (voir payments/stripe_checkout.py)
+    cart_hash = db.Column(db.String(64), nullable=True)
+    stripe_session_id = db.Column(db.String(255), nullable=True)
+    stripe_session_url = db.Column(db.Text, nullable=True)
+    stripe_session_expires_at = db.Column(db.DateTime, nullable=True)
 
     customer = db.relationship('Customer', back_populates='orders')
     items = db.relationship('OrderItem', back_populates='order', lazy=True, cascade="all, delete-orphan")
+    status_events = db.relationship('OrderStatusEvent', back_populates='order', lazy=True, cascade="all, delete-orphan",
+                                    order_by='OrderStatusEvent.created_at')
 
     def __repr__(self):
         return f"Order('{self.id}', customer='{self.customer_id}', total_price='{self.total_price}')"
 
+class OrderStatusEvent(db.Model):
+    """Changement de statut d'une commande (voir utils/order_events.py)."""
+    __tablename__ = 'order_status_event'
+    __table_args__ = (
+        db.Index('ix_order_status_event_order_created', 'order_id', 'created_at'),
+        db.Index('ix_order_status_event_to_created', 'to_status', 'created_at'),
+    )
+    id = db.Column(db.Integer, primary_key=True)
+    order_id = db.Column(db.Integer, db.ForeignKey('orders.id'), nullable=False)
+    from_status = db.Column(db.String(50), nullable=True)
+    to_status = db.Column(db.String(50), nullable=False)
+    created_at = db.Column(db.DateTime, nullable=False, default=lambda: datetime.now(timezone.utc), index=True)
+    # Auteur du changement : 'staff-3', 'customer-12', 'stripe', 'system'...
+    actor = db.Column(db.String(50), nullable=True)
+
+    order = db.relationship('Order', back_populates='status_events')
+
+    def __repr__(self):
+        return f"<OrderStatusEvent order={self.order_id} {self.from_status} -> {self.to_status}>"
+
+class WebhookEvent(db.Model):
+    """Notification de paiement reçue et vérifiée, traitée en arrière-plan (voir payments/webhooks.py)."""
+    __tablename__ = 'webhook_event'
+    __table_args__ = (
+        db.UniqueConstraint('provider', 'event_id', name='uq_webhook_event_provider_event_id'),
+        db.Index('ix_webhook_event_status_next_attempt', 'status', 'next_attempt_at'),
+    )
+    id = db.Column(db.Integer, primary_key=True)
+    provider = db.Column(db.String(20), nullable=False)
+    event_id = db.Column(db.String(255), nullable=False)
+    event_type = db.Column(db.String(100), nullable=False)
+    order_id = db.Column(db.Integer, db.ForeignKey('orders.id'), nullable=True)
+    payload = db.Column(db.Text, nullable=False)
+    # pending -> processing -> done, ou failed après WEBHOOK_MAX_ATTEMPTS tentatives (ou une erreur définitive)
+    status = db.Column(db.String(20), nullable=False, default='pending')
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    last_error = db.Column(db.Text, nullable=True)
+    received_at = db.Column(db.DateTime, nullable=False, default=lambda: datetime.now(timezone.utc))
+    next_attempt_at = db.Column(db.DateTime, nullable=False, default=lambda: datetime.now(timezone.utc))
+    processed_at = db.Column(db.DateTime, nullable=True)
+
+    def __repr__(self):
+        return f'<WebhookEvent {self.provider}:{self.event_id} {self.status}>'
+
 class OrderItem(db.Model):
     __tablename__ = 'order_item'
     id = db.Column(db.Integer, primary_key=True)
@@ -129,6 +219,7 @@ class Customer(db.Model, UserMixin, GetTokenMixin):
     password = db.Column(db.String(200), nullable=False)
     previous_password = db.Column(db.String(200), nullable=True)
     date_registered = db.Column(db.DateTime, nullable=False, default=lambda: datetime.now(timezone.utc))
+    credential_version = db.Column(db.Integer, nullable=False, default=1, server_default='1')
 
     def get_id(self):
         return f'customer-{self.id}'
@@ -139,6 +230,7 @@ class Customer(db.Model, UserMixin, GetTokenMixin):
     reviews = db.relationship('Review', back_populates='customer', lazy=True)
     smart_shoppings = db.relationship('SmartShopping', back_populates='customer', lazy=True)
     review_votes = db.relationship('ReviewVote', back_populates='customer', lazy=True)
+    stats = db.relationship('CustomerStats', back_populates='customer', uselist=False, cascade="all, delete-orphan")
 
     def __repr__(self):
         return f'<Customer {self.username}>'
@@ -155,6 +247,46 @@ class Customer(db.Model, UserMixin, GetTokenMixin):
         except:
             return None
 
+class CustomerStats(db.Model):
+    """
+    Agrégats des commandes finalisées d'un client, tenus à jour à chaque
+    changement de statut (voir utils/customer_stats.py). Une ligne par client.
+    """
+    __tablename__ = 'customer_stats'
+    customer_id = db.Column(db.Integer, db.ForeignKey('customer.id'), primary_key=True)
+    customer = db.relationship('Customer', back_populates='stats')
+    order_count = db.Column(db.Integer, nullable=False, default=0, index=True)
+    revenue = db.Column(db.Float, nullable=False, default=0, index=True)
+    average_basket = db.Column(db.Float, nullable=False, default=0, index=True)
+    first_order_at = db.Column(db.DateTime, nullable=True)
+    last_order_at = db.Column(db.DateTime, nullable=True, index=True)
+
+    def __repr__(self):
+        return f'<CustomerStats customer={self.customer_id} orders={self.order_count} revenue={self.revenue}>'
+
+class SalesDaily(db.Model):
+    """
+    Ventes des commandes finalisées par jour (UTC) et par produit, avec la
+    catégorie actuelle du produit. Tenue à jour à chaque changement de statut
+    d'une commande (voir utils/sales_facts.py).
+    """
+    __tablename__ = 'sales_daily'
+    __table_args__ = (
+        db.Index('ix_sales_daily_category_id_day', 'category_id', 'day'),
+    )
+    day = db.Column(db.Date, primary_key=True)
+    product_id = db.Column(db.Integer, db.ForeignKey('product.id'), primary_key=True, index=True)
+    category_id = db.Column(db.Integer, db.ForeignKey('category.id', ondelete='SET NULL'), nullable=True)
+    units = db.Column(db.Integer, nullable=False, default=0)
+    revenue = db.Column(db.Float, nullable=False, default=0)
+    # Nombre de commandes contenant le produit ce jour-là
+    order_count = db.Column(db.Integer, nullable=False, default=0)
+
+    product = db.relationship('Product')
+
+    def __repr__(self):
+        return f'<SalesDaily {self.day} product={self.product_id} units={self.units} revenue={self.revenue}>'
+
 class CartItem(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     customer_id = db.Column(db.Integer, db.ForeignKey('customer.id'), nullable=False)
@@ -178,12 +310,16 @@ class WishlistItem(db.Model):
     customer = db.relationship('Customer', back_populates='wishlist_items')
     product = db.relationship('Product')
 
-    __table_args__ = (db.UniqueConstraint('customer_id', 'product_id', name='_customer_product_uc'),)
+    __table_args__ = (
+        db.UniqueConstraint('customer_id', 'product_id', name='_customer_product_uc'),
+        # Clients qui suivent un produit (notifications de retour en stock)
+        db.Index('ix_wishlist_item_product_id', 'product_id'),
+    )
 
     def __repr__(self):
         return f"<WishlistItem customer_id={self.customer_id} product_id={self.product_id}>"
 
-class Review(db.Model):
+class Review(db.Model, CatalogVersionedMixin):
     __tablename__ = 'review'
     id = db.Column(db.Integer, primary_key=True)
     rating = db.Column(db.Integer, nullable=False)
@@ -216,6 +352,10 @@ class ReviewVote(db.Model):
 
 class SmartShopping(db.Model):
     __tablename__ = 'smart_shopping'
+    __table_args__ = (
+        # Veilles actives d'un produit dont le prix souhaité est atteint : une seule plage d'index
+        db.Index('ix_smart_shopping_product_status_price', 'product_id', 'status', 'desired_price'),
+    )
     id = db.Column(db.Integer, primary_key=True)
     customer_id = db.Column(db.Integer, db.ForeignKey('customer.id'), nullable=False)
     product_id = db.Column(db.Integer, db.ForeignKey('product.id'), nullable=False)
@@ -234,6 +374,9 @@ class SmartShopping(db.Model):
 
 class SmartShoppingReservation(db.Model):
     __tablename__ = 'smart_shopping_reservation'
+    __table_args__ = (
+        db.Index('ix_smart_shopping_reservation_status_expires_at', 'status', 'expires_at'),
+    )
     id = db.Column(db.Integer, primary_key=True)
     smart_shopping_id = db.Column(db.Integer, db.ForeignKey('smart_shopping.id'), nullable=False)
     reserved_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc))
@@ -246,8 +389,52 @@ class SmartShoppingReservation(db.Model):
         return f"<SmartShoppingReservation id={self.id} smart_shopping_id={self.smart_shopping_id} status='{self.status}'>"
 
 
-class Banner(db.Model):
+class CustomerNotification(db.Model):
+    """
+    Notification à envoyer à un client (ex. prix souhaité atteint). Les
+    notifications en attente sont regroupées par client dans un seul e-mail
+    (voir utils/notifications.py).
+    """
+    __tablename__ = 'customer_notification'
+    __table_args__ = (
+        db.Index('ix_customer_notification_sent_at_customer_id', 'sent_at', 'customer_id'),
+        # Délai de carence : dernière notification d'un type pour un client et un produit
+        db.Index('ix_customer_notification_customer_product_kind', 'customer_id', 'product_id', 'kind', 'created_at'),
+    )
+    id = db.Column(db.Integer, primary_key=True)
+    customer_id = db.Column(db.Integer, db.ForeignKey('customer.id'), nullable=False)
+    kind = db.Column(db.String(30), nullable=False)  # price_drop, back_in_stock
+    product_id = db.Column(db.Integer, db.ForeignKey('product.id', ondelete='CASCADE'), nullable=True)
+    price = db.Column(db.Float, nullable=True)
+    created_at = db.Column(db.DateTime, nullable=False, default=lambda: datetime.now(timezone.utc))
+    # Prise en charge par un worker d'envoi (bail de NOTIFICATION_CLAIM_SECONDS secondes)
+    claimed_at = db.Column(db.DateTime, nullable=True)
+    sent_at = db.Column(db.DateTime, nullable=True)
+
+    customer = db.relationship('Customer')
+    product = db.relationship('Product')
+
+    def __repr__(self):
+        return f"<CustomerNotification {self.kind} customer={self.customer_id} product={self.product_id}>"
+
+
+class RestockEvent(db.Model):
+    """Retour en stock d'un produit, en attente de diffusion aux clients qui le suivent (voir utils/restock.py)."""
+    __tablename__ = 'restock_event'
+    id = db.Column(db.Integer, primary_key=True)
+    product_id = db.Column(db.Integer, db.ForeignKey('product.id', ondelete='CASCADE'), nullable=False)
+    created_at = db.Column(db.DateTime, nullable=False, default=lambda: datetime.now(timezone.utc))
+    processed_at = db.Column(db.DateTime, nullable=True, index=True)
+    # Nombre de notifications créées lors de la diffusion
+    fanout_count = db.Column(db.Integer, nullable=True)
+
+    def __repr__(self):
+        return f"<RestockEvent product={self.product_id} processed_at={self.processed_at}>"
+
+
+class Banner(db.Model, CatalogVersionedMixin):
     __tablename__ = 'banner'
+    bumps_catalog_version = False
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(100), nullable=False)
     message = db.Column(db.Text, nullable=True)
@@ -277,6 +464,8 @@ class Banner(db.Model):
 
 class PageVisit(db.Model):
     __tablename__ = 'page_visit'
+    # L'enregistrement d'une visite ne force pas la requête à relire la base principale
+    __replica_sticky__ = False
     id = db.Column(db.Integer, primary_key=True)
     timestamp = db.Column(db.DateTime, nullable=False, default=lambda: datetime.now(timezone.utc))
     session_id = db.Column(db.String(255), nullable=True)
@@ -284,15 +473,21 @@ class PageVisit(db.Model):
     def __repr__(self):
         return f'<PageVisit {self.timestamp}>'
 
-class Post(db.Model):
+class Post(db.Model, CatalogVersionedMixin):
     __tablename__ = 'post'
+    bumps_catalog_version = False
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(120), nullable=False)
     description = db.Column(db.Text, nullable=False)
     cover_image = db.Column(db.String(255), nullable=True, default='default_post.jpg')
     video_url = db.Column(db.String(200), nullable=True)
-    created_at = db.Column(db.DateTime, nullable=False, default=lambda: datetime.now(timezone.utc))
+    created_at = db.Column(db.DateTime, nullable=False, default=lambda: datetime.now(timezone.utc), index=True)
     author_id = db.Column(db.Integer, db.ForeignKey('staff_user.id'), nullable=False)
+    # Calculés à l'enregistrement à partir de video_url et description (voir utils/post_media.py)
+    video_id = db.Column(db.String(32), nullable=True)
+    embed_url = db.Column(db.String(255), nullable=True)
+    thumbnail_url = db.Column(db.String(255), nullable=True)
+    summary = db.Column(db.String(255), nullable=True)
 
     author = db.relationship('StaffUser', back_populates='posts')
     images = db.relationship('PostImage', back_populates='post', lazy=True, cascade="all, delete-orphan")
@@ -310,8 +505,9 @@ class PostImage(db.Model):
     def __repr__(self):
         return f'<PostImage {self.image_file} for post {self.post_id}>'
 
-class PageContent(db.Model):
+class PageContent(db.Model, CatalogVersionedMixin):
     __tablename__ = 'page_content'
+    bumps_catalog_version = False
     page_name = db.Column(db.String(50), primary_key=True)
     title = db.Column(db.String(120), nullable=True)
     subtitle = db.Column(db.String(200), nullable=True)
@@ -329,6 +525,27 @@ class Milestone(db.Model):
     def __repr__(self):
         return f'<Milestone {self.order_number}>'
 
+class OrderSequence(db.Model):
+    """Compteurs incrémentés de manière atomique (ex. nombre de commandes finalisées)."""
+    __tablename__ = 'order_sequence'
+    name = db.Column(db.String(50), primary_key=True)
+    value = db.Column(db.Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f'<OrderSequence {self.name}={self.value}>'
+
+class CatalogVersion(db.Model):
+    """
+    Version globale du catalogue (une seule ligne, voir versioning.py), dans sa
+    propre table pour ne pas partager les verrous des compteurs de commandes.
+    """
+    __tablename__ = 'catalog_version'
+    id = db.Column(db.Integer, primary_key=True)
+    value = db.Column(db.Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f'<CatalogVersion {self.value}>'
+
 class NewsletterSubscriber(db.Model):
     __tablename__ = 'newsletter_subscriber'
     id = db.Column(db.Integer, primary_key=True)
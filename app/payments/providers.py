@@ -0,0 +1,218 @@
+'''
+Fournisseurs de paiement qui notifient la boutique par webhook.
+
+Chaque fournisseur sait :
+- dire s'il est activé (`enabled`) ;
+- vérifier l'authenticité d'une notification et en extraire un `VerifiedEvent`
+  (identifiant unique de l'événement, type, commande concernée) ;
+- traiter un événement enregistré (`handle`), en arrière-plan.
+
+Pour ajouter un fournisseur : créer une sous-classe de `PaymentProvider` et
+l'ajouter à `PROVIDERS`.
+'''
+import hmac
+import json
+import time
+import hashlib
+from collections import namedtuple
+from flask import current_app, render_template
+from flask_mailman import EmailMessage
+from ..extensions import db
+from ..models import Order, Product, CartItem
+from ..utils.metrics import metrics
+from ..utils.order_events import set_order_status
+from ..utils.order_sequence import assign_sequence_number, PAID_AWAITING_STOCK_STATUS
+
+VerifiedEvent = namedtuple('VerifiedEvent', 'event_id event_type order_id')
+
+
+class WebhookVerificationError(Exception):
+    """Notification refusée : signature invalide ou contenu illisible (réponse 400)."""
+
+
+class WebhookConfigurationError(Exception):
+    """Fournisseur activé mais secret de vérification absent (réponse 500)."""
+
+
+class PermanentEventError(ValueError):
+    """Événement qui échouera à chaque tentative (commande introuvable) : marqué 'failed' sans nouvel essai."""
+
+
+def take_paid_order_stock(order):
+    """
+    Décrémente le stock d'une commande dont le paiement est encaissé. Un
+    produit en stock insuffisant est décompté jusqu'à zéro : le paiement est
+    gardé, et la commande passe en PAID_AWAITING_STOCK_STATUS au lieu de 'Payée'
+    (listée dans le récapitulatif envoyé au personnel, voir stock_alerts.py).
+    Retourne le statut à donner à la commande.
+    """
+    short = []
+    for item in order.items:
+        product = db.session.get(Product, item.product_id)
+        if product.stock < item.quantity:
+            short.append(product.name)
+        product.stock -= min(item.quantity, max(product.stock, 0))
+    if not short:
+        return 'Payée'
+    current_app.logger.error(f"Commande {order.id} payée mais stock insuffisant : {', '.join(short)}")
+    metrics.incr('paid_orders_awaiting_stock')
+    return PAID_AWAITING_STOCK_STATUS
+
+
+def mark_order_paid(order_id, actor):
+    """
+    Finalise une commande payée : statut 'Payée' (ou PAID_AWAITING_STOCK_STATUS,
+    voir `take_paid_order_stock`), rang de commande, stock, vidage du panier,
+    puis e-mail de confirmation. Sans effet si la commande a déjà été traitée
+    (notification rejouée ou retour client arrivé avant).
+    """
+    order = db.session.get(Order, order_id)
+    if order is None:
+        raise PermanentEventError(f'Commande {order_id} introuvable')
+    if order.status != 'En attente de paiement':
+        current_app.logger.info(f'Commande {order_id} déjà traitée ({order.status})')
+        return False
+
+    set_order_status(order, take_paid_order_stock(order), actor=actor)
+    assign_sequence_number(order)
+    db.session.execute(db.delete(CartItem).filter_by(customer_id=order.customer_id))
+    db.session.commit()
+
+    try:
+        html_body = render_template('order_confirmation.html', order=order)
+        msg = EmailMessage(subject=f"Confirmation de votre commande #{order.id}",
+                           body=html_body,
+                           from_email=current_app.config['MAIL_DEFAULT_SENDER'],
+                           to=[order.customer.email])
+        msg.content_subtype = "html"
+        msg.send()
+    except Exception as e:
+        # La commande est enregistrée : un échec d'envoi ne doit pas rejouer l'événement
+        current_app.logger.error(f"Error sending email for order {order.id}: {e}")
+    return True
+
+
+class PaymentProvider:
+    name = None
+    # Types d'événements qui confirment le paiement d'une commande
+    paid_event_types = ()
+
+    def enabled(self, config):
+        return True
+
+    def verify(self, request):
+        raise NotImplementedError
+
+    def handle(self, event):
+        """
+        Traite un WebhookEvent enregistré. Une exception déclenche une nouvelle
+        tentative, sauf PermanentEventError.
+        """
+        if event.event_type in self.paid_event_types:
+            if event.order_id is None:
+                raise PermanentEventError(f'Événement {event.event_id} sans commande associée')
+            mark_order_paid(event.order_id, actor=self.name)
+
+
+class StripeProvider(PaymentProvider):
+    name = 'stripe'
+    paid_event_types = ('checkout.session.completed',)
+
+    def verify(self, request):
+        import stripe
+        endpoint_secret = current_app.config.get('STRIPE_ENDPOINT_SECRET')
+        if not endpoint_secret:
+            raise WebhookConfigurationError('Stripe endpoint secret not configured')
+        try:
+            event = stripe.Webhook.construct_event(request.get_data(as_text=True),
+                                                   request.headers.get('Stripe-Signature'), endpoint_secret)
+        except ValueError as e:
+            raise WebhookVerificationError(f'Invalid payload: {e}')
+        except stripe.error.SignatureVerificationError as e:
+            raise WebhookVerificationError(f'Invalid signature: {e}')
+
+        order_id = None
+        if event['type'] in self.paid_event_types:
+            order_id = (event['data']['object'].get('metadata') or {}).get('order_id')
+            if not order_id:
+                raise WebhookVerificationError('Missing order_id in Stripe session metadata')
+        return VerifiedEvent(event['id'], event['type'], int(order_id) if order_id else None)
+
+
+class WaveProvider(PaymentProvider):
+    """
+    Wave (Sénégal) : en-tête `Wave-Signature: t=<timestamp>,v1=<hmac>`, où hmac
+    est le HMAC-SHA256 de timestamp + corps, avec WAVE_WEBHOOK_SECRET. La commande
+    est retrouvée via `client_reference`, fixé à l'identifiant de commande.
+    """
+    name = 'wave'
+    paid_event_types = ('checkout.session.completed',)
+
+    def enabled(self, config):
+        return config.get('ENABLE_WAVE_MONEY', False)
+
+    def verify(self, request):
+        secret = current_app.config.get('WAVE_WEBHOOK_SECRET')
+        if not secret:
+            raise WebhookConfigurationError('Wave webhook secret not configured')
+        body = request.get_data()
+        parts = dict(part.split('=', 1) for part in request.headers.get('Wave-Signature', '').split(',') if '=' in part)
+        timestamp, signature = parts.get('t', ''), parts.get('v1', '')
+        expected = hmac.new(secret.encode(), timestamp.encode() + body, hashlib.sha256).hexdigest()
+        if not signature or not hmac.compare_digest(expected, signature):
+            raise WebhookVerificationError('Invalid signature')
+        if not timestamp.isdigit() or abs(time.time() - int(timestamp)) > current_app.config['WEBHOOK_SIGNATURE_TOLERANCE']:
+            raise WebhookVerificationError('Signature timestamp outside tolerance')
+        try:
+            event = json.loads(body)
+            data = event.get('data') or {}
+            order_id = data.get('client_reference')
+            return VerifiedEvent(event['id'], event['type'], int(order_id) if order_id else None)
+        except (ValueError, KeyError, TypeError) as e:
+            raise WebhookVerificationError(f'Invalid payload: {e}')
+
+
+class OrangeMoneyProvider(PaymentProvider):
+    """
+    Orange Money (Web Payment) : la notification ne contient que le statut, le
+    `txnid` et le `notif_token`. La commande est donc portée par l'URL de
+    notification transmise à l'initialisation du paiement (voir
+    `orange_money_notify_params`), signée avec ORANGE_MONEY_WEBHOOK_SECRET.
+    Une même transaction est notifiée à chaque changement de statut (PENDING,
+    puis SUCCESS ou FAILED) : l'identifiant d'événement est `<txnid>:<statut>`.
+    """
+    name = 'orange_money'
+    paid_event_types = ('SUCCESS',)
+
+    def enabled(self, config):
+        return config.get('ENABLE_ORANGE_MONEY', False)
+
+    @staticmethod
+    def _sign(secret, order_id):
+        return hmac.new(secret.encode(), str(order_id).encode(), hashlib.sha256).hexdigest()
+
+    def verify(self, request):
+        secret = current_app.config.get('ORANGE_MONEY_WEBHOOK_SECRET')
+        if not secret:
+            raise WebhookConfigurationError('Orange Money webhook secret not configured')
+        order_id = request.args.get('order_id', '')
+        if not hmac.compare_digest(self._sign(secret, order_id), request.args.get('sig', '')):
+            raise WebhookVerificationError('Invalid signature')
+        payload = request.get_json(silent=True) or {}
+        if not payload.get('txnid') or not payload.get('status'):
+            raise WebhookVerificationError('Invalid payload')
+        return VerifiedEvent(f"{payload['txnid']}:{payload['status']}", payload['status'],
+                             int(order_id) if order_id.isdigit() else None)
+
+
+def orange_money_notify_params(order_id):
+    """Paramètres à ajouter à l'URL de notification Orange Money pour une commande."""
+    secret = current_app.config['ORANGE_MONEY_WEBHOOK_SECRET']
+    return {'order_id': order_id, 'sig': OrangeMoneyProvider._sign(secret, order_id)}
+
+
+PROVIDERS = {provider.name: provider for provider in (StripeProvider(), WaveProvider(), OrangeMoneyProvider())}
+
+
+def get_provider(name):
+    return PROVIDERS.get(name)
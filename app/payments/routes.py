@@ -0,0 +1,12 @@
+from . import payments
+from .webhooks import ingest_webhook
+from ..extensions import csrf
+from ..db_routing import use_primary
+
+
+@payments.route('/paiements/webhook/<provider_name>', methods=['POST'])
+@csrf.exempt
+@use_primary
+def payment_webhook(provider_name):
+    """Point d'entrée commun des notifications de paiement (stripe, wave, orange_money)."""
+    return ingest_webhook(provider_name)
@@ -0,0 +1,197 @@
+'''
+Sessions Stripe Checkout et commandes en attente de paiement.
+
+- Une seule commande 'En attente de paiement' par client : si le panier n'a
+  pas changé (même empreinte) et que la session Stripe est encore valable, le
+  client est renvoyé vers la même session, sans nouvel appel à Stripe. Si le
+  panier a changé, la commande est mise à jour et l'ancienne session expirée.
+- Les appels passent par un client Stripe persistant par processus
+  (connexions HTTP keep-alive). STRIPE_API_BASE permet de viser un bouchon
+  local de l'API (tests).
+- `sweep_abandoned_orders` annule par lots les commandes dont la session a
+  expiré ; elle est lancée périodiquement par `flask sweep-pending-orders`.
+'''
+import os
+import hashlib
+import threading
+from datetime import datetime, timedelta, timezone
+import sqlalchemy as sa
+from flask import current_app, url_for
+from ..extensions import db
+from ..models import Order, OrderItem, OrderStatusEvent, WebhookEvent
+from ..utils.metrics import metrics
+from ..utils.order_events import set_order_status
+
+PENDING_STATUS = 'En attente de paiement'
+# Notifications de paiement pas encore traitées (ou en échec) : la commande ne doit pas être annulée
+UNRESOLVED_WEBHOOK_STATUSES = ('pending', 'processing', 'failed')
+ABANDONED_STATUS = 'Annulée'
+SWEEPER_ACTOR = 'sweeper'
+
+_client_lock = threading.Lock()
+_client = None
+_client_key = None
+
+
+def _utcnow():
+    # Dates naïves en UTC, comme celles relues depuis la base
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def stripe_client():
+    """Client Stripe du processus, avec une session HTTP réutilisée (keep-alive)."""
+    global _client, _client_key
+    api_key = current_app.config['STRIPE_SECRET_KEY']
+    api_base = current_app.config.get('STRIPE_API_BASE')
+    # Recréé après un fork (gunicorn) ou un changement de configuration
+    key = (os.getpid(), api_key, api_base)
+    with _client_lock:
+        if _client is None or _client_key != key:
+            import stripe
+            import requests
+            http_client = stripe.RequestsClient(timeout=current_app.config['STRIPE_TIMEOUT_SECONDS'],
+                                                session=requests.Session())
+            _client = stripe.StripeClient(api_key, http_client=http_client,
+                                          base_addresses={'api': api_base} if api_base else {},
+                                          max_network_retries=2)
+            _client_key = key
+        return _client
+
+
+def cart_fingerprint(cart_items):
+    """Empreinte du contenu du panier (produits, quantités, prix)."""
+    lines = sorted(f"{item['product'].id}:{item['quantity']}:{item['product'].price}" for item in cart_items)
+    return hashlib.sha256('|'.join(lines).encode()).hexdigest()
+
+
+def _session_is_reusable(order, cart_hash, now):
+    margin = timedelta(seconds=current_app.config['STRIPE_SESSION_REUSE_MARGIN_SECONDS'])
+    return (order.cart_hash == cart_hash and order.stripe_session_url is not None
+            and order.stripe_session_expires_at is not None
+            and order.stripe_session_expires_at > now + margin)
+
+
+def _expire_session(client, session_id):
+    """Expire une session devenue obsolète pour qu'elle ne puisse plus être payée (au mieux)."""
+    try:
+        client.checkout.sessions.expire(session_id)
+    except Exception as e:
+        current_app.logger.warning(f"Impossible d'expirer la session Stripe {session_id} : {e}")
+
+
+def start_stripe_checkout(customer_id, cart_items):
+    """
+    Retourne l'URL de paiement Stripe pour le panier, en réutilisant la session
+    existante si possible. `cart_items` porte les lignes Product relues en base
+    (pas l'instantané du catalogue) : le total, les lignes de commande et les
+    montants envoyés à Stripe en sont tirés.
+    """
+    now = _utcnow()
+    total_price = sum(item['product'].price * item['quantity'] for item in cart_items)
+    cart_hash = cart_fingerprint(cart_items)
+    order = db.session.execute(
+        db.select(Order).filter_by(customer_id=customer_id, status=PENDING_STATUS)
+        .order_by(Order.id.desc()).limit(1)
+    ).scalar_one_or_none()
+
+    if order is not None and _session_is_reusable(order, cart_hash, now):
+        metrics.incr('stripe_sessions_reused')
+        return order.stripe_session_url
+
+    client = stripe_client()
+    if order is None:
+        order = Order(customer_id=customer_id, total_price=total_price)
+        set_order_status(order, PENDING_STATUS)
+        db.session.add(order)
+    elif order.stripe_session_id:
+        _expire_session(client, order.stripe_session_id)
+    if order.cart_hash != cart_hash:
+        if order.id is not None:
+            db.session.execute(sa.delete(OrderItem).where(OrderItem.order_id == order.id))
+            db.session.expire(order, ['items'])
+        for item in cart_items:
+            order.items.append(OrderItem(product_id=item['product'].id, quantity=item['quantity'],
+                                         price_at_purchase=item['product'].price))
+        order.cart_hash = cart_hash
+    order.total_price = total_price
+    db.session.flush()
+
+    # Paramètres identiques pendant une minute : un double envoi du formulaire
+    # retombe sur la même session grâce à la clé d'idempotence
+    minute = now.replace(second=0, microsecond=0)
+    expires_at = minute + timedelta(seconds=current_app.config['STRIPE_SESSION_TTL_SECONDS'])
+    line_items = [{
+        'price_data': {
+            'currency': 'xof',
+            'product_data': {'name': item['product'].name},
+            'unit_amount': int(item['product'].price),
+        },
+        'quantity': item['quantity'],
+    } for item in cart_items]
+    checkout_session = client.checkout.sessions.create(
+        params={
+            'payment_method_types': ['card'],
+            'line_items': line_items,
+            'mode': 'payment',
+            'success_url': url_for('cart.success', order_id=order.id, _external=True),
+            'cancel_url': url_for('cart.cancel', _external=True),
+            'metadata': {'order_id': order.id},
+            'expires_at': int(expires_at.replace(tzinfo=timezone.utc).timestamp()),
+        },
+        options={'idempotency_key': f"checkout-{order.id}-{cart_hash[:16]}-{minute:%Y%m%d%H%M}"},
+    )
+    order.stripe_session_id = checkout_session.id
+    order.stripe_session_url = checkout_session.url
+    order.stripe_session_expires_at = expires_at
+    db.session.commit()
+    metrics.incr('stripe_sessions_created')
+    return checkout_session.url
+
+
+def sweep_abandoned_orders(now=None, batch_size=500):
+    """
+    Annule par lots les commandes en attente de paiement abandonnées : session
+    Stripe expirée depuis plus de STRIPE_SWEEP_GRACE_SECONDS (le temps qu'un
+    webhook tardif arrive), ou commande sans session plus ancienne que la durée
+    d'une session. Une commande dont une notification de paiement n'est pas
+    encore traitée (nouvelles tentatives en cours) ou a échoué n'est pas annulée.
+    Retourne le nombre de commandes annulées.
+    """
+    now = now or _utcnow()
+    grace = timedelta(seconds=current_app.config['STRIPE_SWEEP_GRACE_SECONDS'])
+    ttl = timedelta(seconds=current_app.config['STRIPE_SESSION_TTL_SECONDS'])
+    abandoned = sa.and_(
+        sa.or_(
+            Order.stripe_session_expires_at < now - grace,
+            sa.and_(Order.stripe_session_expires_at.is_(None), Order.date_ordered < now - ttl - grace),
+        ),
+        ~sa.exists().where(WebhookEvent.order_id == Order.id,
+                           WebhookEvent.status.in_(UNRESOLVED_WEBHOOK_STATUSES)),
+    )
+    swept = 0
+    while True:
+        order_ids = db.session.execute(
+            db.select(Order.id).filter(Order.status == PENDING_STATUS, abandoned).limit(batch_size)
+        ).scalars().all()
+        if not order_ids:
+            break
+        # Conditions reprises : protègent d'un paiement confirmé ou notifié entre-temps
+        cancelled_ids = db.session.execute(
+            sa.update(Order)
+            .where(Order.id.in_(order_ids), Order.status == PENDING_STATUS, abandoned)
+            .values(status=ABANDONED_STATUS)
+            .returning(Order.id)
+            .execution_options(synchronize_session=False)
+        ).scalars().all()
+        if cancelled_ids:
+            db.session.execute(sa.insert(OrderStatusEvent), [
+                {'order_id': order_id, 'from_status': PENDING_STATUS, 'to_status': ABANDONED_STATUS,
+                 'created_at': now, 'actor': SWEEPER_ACTOR}
+                for order_id in cancelled_ids
+            ])
+        db.session.commit()
+        swept += len(cancelled_ids)
+        if len(order_ids) < batch_size:
+            break
+    metrics.incr('pending_orders_swept', swept)
+    return swept
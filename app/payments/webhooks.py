@@ -0,0 +1,185 @@
+'''
+Réception et traitement des webhooks de paiement.
+
+La réception (`ingest_webhook`) se limite à vérifier la signature et à
+enregistrer l'événement, unique par (fournisseur, identifiant d'événement),
+avant de répondre 200 : une notification rejouée par le fournisseur est
+reconnue et ignorée, et un serveur SMTP lent ne retarde plus la réponse.
+
+Le traitement (`process_pending_events`) se fait ensuite en arrière-plan :
+- WEBHOOK_WORKER='thread' (défaut) : un thread par worker gunicorn, réveillé à
+  chaque réception et toutes les WEBHOOK_POLL_SECONDS secondes ;
+- WEBHOOK_WORKER='external' : un processus dédié, `flask process-webhooks --loop`.
+
+Chaque événement est réservé par un UPDATE conditionnel (un seul worker le
+traite) pour WEBHOOK_LEASE_SECONDS ; en cas d'échec, il est retenté avec un
+délai exponentiel, puis marqué 'failed' après WEBHOOK_MAX_ATTEMPTS tentatives.
+Une erreur qui se reproduirait à l'identique (PermanentEventError : commande
+introuvable) le marque 'failed' dès la première tentative. Un paiement confirmé
+pour un stock devenu insuffisant n'est pas une erreur : la commande est gardée
+comme payée, à traiter par le personnel (voir `take_paid_order_stock`).
+'''
+import os
+import threading
+from datetime import datetime, timedelta, timezone
+import sqlalchemy as sa
+from flask import current_app, request
+from sqlalchemy.exc import IntegrityError
+from ..extensions import db
+from ..models import WebhookEvent
+from ..utils.metrics import metrics
+from .providers import get_provider, PermanentEventError, WebhookVerificationError, WebhookConfigurationError
+
+CLAIMABLE_STATUSES = ('pending', 'processing')
+
+
+def ingest_webhook(provider_name):
+    """Vérifie et enregistre une notification, puis répond immédiatement."""
+    provider = get_provider(provider_name)
+    if provider is None or not provider.enabled(current_app.config):
+        return 'Unknown payment provider', 404
+    try:
+        verified = provider.verify(request)
+    except WebhookConfigurationError as e:
+        current_app.logger.error(str(e))
+        return str(e), 500
+    except WebhookVerificationError as e:
+        current_app.logger.error(f'Webhook {provider_name} refusé : {e}')
+        metrics.incr('webhook_rejected', provider=provider_name)
+        return str(e), 400
+
+    db.session.add(WebhookEvent(provider=provider_name, event_id=verified.event_id,
+                                event_type=verified.event_type, order_id=verified.order_id,
+                                payload=request.get_data(as_text=True)))
+    try:
+        db.session.commit()
+    except IntegrityError:
+        db.session.rollback()
+        metrics.incr('webhook_duplicates', provider=provider_name)
+        return 'Event already received', 200
+
+    metrics.incr('webhook_received', provider=provider_name)
+    worker.notify()
+    return 'Event received', 200
+
+
+def _now():
+    return datetime.now(timezone.utc)
+
+
+def _retry_delay(attempts):
+    base = current_app.config['WEBHOOK_RETRY_BASE_SECONDS']
+    return timedelta(seconds=base * 2 ** max(attempts - 1, 0))
+
+
+def _claim(event_id, now):
+    """Réserve l'événement pour ce worker. Retourne False s'il est déjà pris ou traité."""
+    lease_until = now + timedelta(seconds=current_app.config['WEBHOOK_LEASE_SECONDS'])
+    result = db.session.execute(
+        sa.update(WebhookEvent)
+        .where(WebhookEvent.id == event_id,
+               WebhookEvent.status.in_(CLAIMABLE_STATUSES),
+               WebhookEvent.next_attempt_at <= now)
+        .values(status='processing', attempts=WebhookEvent.attempts + 1, next_attempt_at=lease_until)
+        .execution_options(synchronize_session=False)
+    )
+    db.session.commit()
+    return result.rowcount == 1
+
+
+def process_event(event_id):
+    """Traite un événement réservé ; planifie une nouvelle tentative en cas d'erreur."""
+    event = db.session.get(WebhookEvent, event_id)
+    provider = get_provider(event.provider)
+    try:
+        provider.handle(event)
+    except Exception as e:
+        db.session.rollback()
+        event = db.session.get(WebhookEvent, event_id)
+        event.last_error = str(e)[:1000]
+        if isinstance(e, PermanentEventError) or event.attempts >= current_app.config['WEBHOOK_MAX_ATTEMPTS']:
+            event.status = 'failed'
+            current_app.logger.error(f'Webhook {event.provider}:{event.event_id} abandonné : {e}')
+        else:
+            event.status = 'pending'
+            event.next_attempt_at = _now() + _retry_delay(event.attempts)
+            current_app.logger.warning(f'Webhook {event.provider}:{event.event_id} en échec, nouvel essai prévu : {e}')
+        metrics.incr('webhook_failures', provider=event.provider)
+        db.session.commit()
+        return False
+
+    event = db.session.get(WebhookEvent, event_id)
+    event.status = 'done'
+    event.processed_at = _now()
+    event.last_error = None
+    db.session.commit()
+    metrics.incr('webhook_processed', provider=event.provider)
+    return True
+
+
+def process_pending_events(limit=50):
+    """Traite les événements dus (en attente, à retenter ou dont la réservation a expiré)."""
+    now = _now()
+    event_ids = db.session.execute(
+        db.select(WebhookEvent.id)
+        .filter(WebhookEvent.status.in_(CLAIMABLE_STATUSES), WebhookEvent.next_attempt_at <= now)
+        .order_by(WebhookEvent.next_attempt_at)
+        .limit(limit)
+    ).scalars().all()
+    processed = 0
+    for event_id in event_ids:
+        if _claim(event_id, now):
+            process_event(event_id)
+            processed += 1
+    return processed
+
+
+class WebhookWorker:
+    """Thread de traitement des webhooks, démarré à la demande dans chaque processus."""
+
+    def __init__(self, app=None):
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+        self._pid = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('WEBHOOK_WORKER', 'external' if app.testing else 'thread')
+        app.config.setdefault('WEBHOOK_POLL_SECONDS', 15)
+        app.config.setdefault('WEBHOOK_LEASE_SECONDS', 300)
+        app.config.setdefault('WEBHOOK_RETRY_BASE_SECONDS', 30)
+        app.config.setdefault('WEBHOOK_MAX_ATTEMPTS', 8)
+        app.config.setdefault('WEBHOOK_SIGNATURE_TOLERANCE', 300)
+        app.extensions['webhook_worker'] = self
+
+    def notify(self):
+        """Signale un nouvel événement (démarre le thread si besoin)."""
+        if current_app.config['WEBHOOK_WORKER'] != 'thread':
+            return
+        self._ensure_started(current_app._get_current_object())
+        self._wakeup.set()
+
+    def _ensure_started(self, app):
+        with self._lock:
+            # Après un fork (gunicorn), le thread du processus parent n'existe plus
+            if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, args=(app,), name='webhook-worker', daemon=True)
+            self._thread.start()
+
+    def _run(self, app):
+        while True:
+            self._wakeup.wait(app.config['WEBHOOK_POLL_SECONDS'])
+            self._wakeup.clear()
+            with app.app_context():
+                try:
+                    while process_pending_events():
+                        pass
+                except Exception as e:
+                    app.logger.error(f'Erreur du traitement des webhooks : {e}')
+
+
+worker = WebhookWorker()
@@ -1,4 +1,4 @@
-from flask import render_template, request, flash, redirect, url_for, jsonify
+from flask import request, flash, redirect, url_for, jsonify
 from flask_login import current_user, login_required
 from . import products
 from .. import db
@@ -8,6 +8,11 @@ from sqlalchemy import func, case
 
 from datetime import datetime
 from ..admin.routes import customer_required
+from ..catalog_snapshot import current_catalog, paginate
+from ..utils.streaming import stream_page, deferred
+
+def _banners(position):
+    return db.session.execute(Banner.get_active_banners().filter_by(position=position)).scalars().all()
 
 @products.route('/produits')
 def produits():
@@ -17,42 +22,21 @@ def produits():
     category_id = request.args.get('category', type=int)
     sort_by = request.args.get('sort_by', 'name_asc')
 
-    products_query = db.select(Product)
-
-    if search_query:
-        products_query = products_query.join(Category).filter(
-            (Product.name.ilike(f'%{search_query}%')) |
-            (Category.name.ilike(f'%{search_query}%'))
-        )
-
-    if category_id:
-        products_query = products_query.filter(Product.category_id == category_id)
-
-    if sort_by == 'price_asc':
-        products_query = products_query.order_by(Product.price.asc())
-    elif sort_by == 'price_desc':
-        products_query = products_query.order_by(Product.price.desc())
-    elif sort_by == 'name_desc':
-        products_query = products_query.order_by(Product.name.desc())
-    else: # name_asc is the default
-        products_query = products_query.order_by(Product.name.asc())
-
-    products_pagination = db.paginate(products_query, page=page, per_page=9)
-    categories = db.session.execute(db.select(Category)).scalars().all()
-
-    # Récupérer les bannières pour la page produits
-    product_page_banners = db.session.execute(Banner.get_active_banners().filter_by(position='product_page')).scalars().all()
-    # Récupérer les bannières pour la barre latérale
-    sidebar_banners = db.session.execute(Banner.get_active_banners().filter_by(position='sidebar')).scalars().all()
-
-    return render_template('produits.html', 
-                           products=products_pagination, 
-                           search_query=search_query, 
-                           categories=categories,
-                           selected_category=category_id,
-                           sort_by=sort_by,
-                           product_page_banners=product_page_banners,
-                           sidebar_banners=sidebar_banners)
+    # Filtre, tri et pagination en mémoire sur l'instantané du catalogue
+    catalog = current_catalog()
+    matching_products = catalog.search(search_query, category_id=category_id, sort_by=sort_by)
+    products_pagination = paginate(matching_products, page=page, per_page=9)
+    categories = catalog.categories
+
+    # Bannières de la page produits et de la barre latérale, lues pendant le rendu en flux
+    return stream_page('produits.html',
+                       products=products_pagination,
+                       search_query=search_query,
+                       categories=categories,
+                       selected_category=category_id,
+                       sort_by=sort_by,
+                       product_page_banners=deferred(_banners, 'product_page'),
+                       sidebar_banners=deferred(_banners, 'sidebar'))
 
 @products.route('/produit/<int:product_id>', methods=['GET', 'POST'])
 def product_detail(product_id):
@@ -85,9 +69,20 @@ def product_detail(product_id):
     # Calcul de la note moyenne
     avg_rating = db.session.execute(db.select(db.func.avg(Review.rating)).filter(Review.product_id == product.id)).scalar_one_or_none() or 0
 
+    # Avis et bannières lus pendant le rendu en flux, une fois le haut de page envoyé
+    return stream_page('product_detail.html',
+                       product=product,
+                       form=form,
+                       has_purchased=has_purchased,
+                       avg_rating=avg_rating,
+                       reviews_with_votes=deferred(_reviews_with_votes, product),
+                       product_page_banners=deferred(_banners, 'product_page'))
+
+def _reviews_with_votes(product):
+    """Avis du produit avec leurs votes (et le vote du client connecté)."""
     # Fetch reviews and their vote counts (optimized)
     reviews_with_votes = []
-    
+
     reviews = db.session.execute(db.select(Review).filter(Review.product_id == product.id)).scalars().all()
 
     if reviews:
@@ -117,17 +112,7 @@ def product_detail(product_id):
                 'not_useful_count': vote_counts['not_useful'],
                 'user_vote': user_votes.get(review.id)
             })
-
-    # Récupérer les bannières pour la page de détail du produit
-    product_page_banners = db.session.execute(Banner.get_active_banners().filter_by(position='product_page')).scalars().all()
-
-    return render_template('product_detail.html', 
-                           product=product, 
-                           form=form, 
-                           has_purchased=has_purchased,
-                           avg_rating=avg_rating,
-                           reviews_with_votes=reviews_with_votes,
-                           product_page_banners=product_page_banners)
+    return reviews_with_votes
 
 @products.route('/review/<int:review_id>/vote', methods=['POST'])
 @login_required
@@ -0,0 +1,91 @@
+'''
+Profil de service en production : modèle de workers gunicorn et dimensionnement
+du pool de connexions SQLAlchemy.
+
+Tout est piloté par des variables d'environnement afin de pouvoir ajuster un
+dyno sans modifier le code :
+
+    WEB_WORKER_CLASS      gthread (défaut) ou eventlet
+    WEB_CONCURRENCY       nombre de processus workers (défini par Heroku)
+    WEB_THREADS           threads par worker (gthread)
+    WEB_WORKER_CONNECTIONS  connexions simultanées par worker (eventlet)
+    WEB_TIMEOUT           délai maximal d'une requête, en secondes
+    DB_MAX_CONNECTIONS    connexions autorisées par le plan PostgreSQL, tous dynos confondus
+    WEB_DYNOS             nombre de dynos web se partageant ce budget
+    DB_STATEMENT_TIMEOUT_MS  durée maximale d'une requête SQL (PostgreSQL)
+'''
+import os
+
+WORKER_CLASSES = ('gthread', 'eventlet')
+
+
+def _env_int(env, name, default):
+    try:
+        return int(env.get(name, default))
+    except (TypeError, ValueError):
+        return default
+
+
+def serving_profile(env=None):
+    """Lit le profil de service depuis l'environnement et retourne un dictionnaire normalisé."""
+    env = os.environ if env is None else env
+    worker_class = env.get('WEB_WORKER_CLASS', 'gthread')
+    if worker_class not in WORKER_CLASSES:
+        worker_class = 'gthread'
+    profile = {
+        'worker_class': worker_class,
+        'workers': max(1, _env_int(env, 'WEB_CONCURRENCY', 2)),
+        'threads': max(1, _env_int(env, 'WEB_THREADS', 4)),
+        'worker_connections': max(1, _env_int(env, 'WEB_WORKER_CONNECTIONS', 100)),
+        'timeout': _env_int(env, 'WEB_TIMEOUT', 30),
+        'db_max_connections': max(1, _env_int(env, 'DB_MAX_CONNECTIONS', 20)),
+        'dynos': max(1, _env_int(env, 'WEB_DYNOS', 1)),
+        'statement_timeout_ms': _env_int(env, 'DB_STATEMENT_TIMEOUT_MS', 15000),
+    }
+    if worker_class == 'eventlet':
+        # Les greenlets partagent un seul thread : la concurrence vient des connexions
+        profile['threads'] = 1
+    return profile
+
+
+def pool_dimensions(profile):
+    """
+    Calcule (pool_size, max_overflow) pour un processus worker.
+
+    Chaque worker a besoin d'autant de connexions que de requêtes qu'il peut
+    traiter en parallèle (threads, ou connexions pour eventlet), dans la limite
+    du budget du plan PostgreSQL réparti entre tous les workers de tous les dynos.
+    Le reste du budget (au plus 2 connexions) sert de débordement pour les tâches
+    de fond du worker.
+    """
+    concurrency = profile['threads']
+    if profile['worker_class'] == 'eventlet':
+        concurrency = profile['worker_connections']
+    processes = profile['workers'] * profile['dynos']
+    budget = max(1, profile['db_max_connections'] // processes)
+    pool_size = min(concurrency, budget)
+    max_overflow = min(2, budget - pool_size)
+    return pool_size, max_overflow
+
+
+def build_engine_options(database_uri, profile=None):
+    """Retourne SQLALCHEMY_ENGINE_OPTIONS adapté à la base et au profil de service."""
+    if not database_uri or database_uri.startswith('sqlite'):
+        # SQLite (développement, tests) : on garde le pool par défaut de SQLAlchemy
+        return {}
+
+    profile = profile or serving_profile()
+    pool_size, max_overflow = pool_dimensions(profile)
+    options = {
+        'pool_size': pool_size,
+        'max_overflow': max_overflow,
+        'pool_timeout': 10,
+        'pool_pre_ping': True,
+        # Recycle avant que l'infrastructure ne coupe les connexions inactives
+        'pool_recycle': 300,
+    }
+    if database_uri.startswith('postgres') and profile['statement_timeout_ms'] > 0:
+        options['connect_args'] = {
+            'options': f"-c statement_timeout={profile['statement_timeout_ms']}"
+        }
+    return options
@@ -0,0 +1,129 @@
+'''
+Compilation des bundles CSS/JS au moment du déploiement.
+
+La commande `flask build-assets` construit chaque bundle Flask-Assets, copie
+le résultat sous un nom contenant son empreinte (ex. gen/packed.3f2a9c1b7d4e.css),
+génère les variantes précompressées .gz et .br servies par WhiteNoise, puis
+écrit un manifeste JSON qui associe le nom du bundle à son fichier.
+
+À l'exécution, les templates résolvent les URLs via `asset_urls()` : aucun
+worker ne minifie les fichiers au démarrage ou à la première requête.
+'''
+import os
+import re
+import gzip
+import json
+import hashlib
+from flask import current_app, url_for
+from flask_assets import Bundle
+
+try:
+    import brotli
+except ImportError:  # brotli est optionnel : seule la variante .gz sera produite
+    brotli = None
+
+# Définition des bundles d'assets (nom -> fichiers sources, filtre, sortie)
+BUNDLES = {
+    'css_all': {
+        'contents': ('css/bootstrap.min.css', 'css/custom.css'),
+        'filters': 'cssmin',
+        'output': 'gen/packed.css',
+    },
+    'js_all': {
+        'contents': ('js/bootstrap.bundle.min.js',),
+        'filters': 'jsmin',
+        'output': 'gen/packed.js',
+    },
+}
+
+MANIFEST_FILENAME = 'gen/manifest.json'
+FINGERPRINT_LENGTH = 12
+# Fichiers générés par build_bundles : leur contenu ne change jamais pour une URL donnée.
+IMMUTABLE_FILE_RE = re.compile(r'\.[0-9a-f]{%d}\.\w+$' % FINGERPRINT_LENGTH)
+
+
+def register_bundles(assets_env):
+    """Enregistre les bundles de BUNDLES dans l'environnement Flask-Assets (sans les construire)."""
+    for name, spec in BUNDLES.items():
+        if name not in assets_env:
+            assets_env.register(name, Bundle(*spec['contents'], filters=spec['filters'], output=spec['output']))
+
+
+def fingerprint_name(output, data):
+    """Insère l'empreinte du contenu dans le nom de fichier : gen/packed.css -> gen/packed.<hash>.css"""
+    digest = hashlib.sha256(data).hexdigest()[:FINGERPRINT_LENGTH]
+    base, ext = os.path.splitext(output)
+    return f'{base}.{digest}{ext}'
+
+
+def write_precompressed(path, data):
+    """Écrit les variantes gzip et brotli d'un fichier, à côté de celui-ci."""
+    with open(path + '.gz', 'wb') as f:
+        # mtime=0 pour que la sortie soit identique d'un build à l'autre
+        f.write(gzip.compress(data, compresslevel=9, mtime=0))
+    if brotli is not None:
+        with open(path + '.br', 'wb') as f:
+            f.write(brotli.compress(data, quality=11))
+
+
+def build_bundles(assets_env, static_folder, names=None):
+    """
+    Construit les bundles indiqués (tous par défaut), écrit les fichiers
+    empreintés et précompressés, et retourne le manifeste {nom: fichier}.
+    Doit être appelé dans un contexte d'application.
+    """
+    # Construction partielle : on conserve les entrées des autres bundles
+    manifest = load_manifest(static_folder) if names else {}
+    for name in (names or BUNDLES):
+        bundle = assets_env[name]
+        bundle.build(force=True)
+
+        with open(os.path.join(static_folder, bundle.output), 'rb') as f:
+            data = f.read()
+
+        filename = fingerprint_name(bundle.output, data)
+        path = os.path.join(static_folder, filename)
+        with open(path, 'wb') as f:
+            f.write(data)
+        write_precompressed(path, data)
+        manifest[name] = filename
+
+    manifest_path = os.path.join(static_folder, MANIFEST_FILENAME)
+    with open(manifest_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    return manifest
+
+
+def load_manifest(static_folder):
+    """Charge le manifeste des bundles. Retourne un dictionnaire vide s'il n'a pas été généré."""
+    try:
+        with open(os.path.join(static_folder, MANIFEST_FILENAME), 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def is_immutable_file(path, url):
+    """Test passé à WhiteNoise pour servir les fichiers empreintés avec un cache 'immutable'."""
+    return bool(IMMUTABLE_FILE_RE.search(url))
+
+
+def asset_urls(name):
+    """
+    Retourne la liste des URLs d'un bundle.
+    Avec un manifeste : une seule URL empreintée. Sans manifeste (développement),
+    on retombe sur Flask-Assets qui construit le bundle à la demande.
+    """
+    manifest = current_app.extensions.get('asset_manifest') or {}
+    filename = manifest.get(name)
+    if filename:
+        return [url_for('static', filename=filename)]
+
+    from ..extensions import assets
+    return assets[name].urls()
+
+
+def init_asset_manifest(app):
+    """Charge le manifeste une fois au démarrage et expose `asset_urls` aux templates."""
+    app.extensions['asset_manifest'] = load_manifest(app.static_folder)
+    app.add_template_global(asset_urls)
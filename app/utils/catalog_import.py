@@ -0,0 +1,326 @@
+'''
+Import en masse du catalogue et des stocks (CSV ou XLSX).
+
+Le fichier est lu en flux (csv, ou openpyxl en mode read_only) et traité par
+lots de `chunk_size` lignes. Pour chaque lot :
+
+- les lignes sont validées ; les lignes invalides sont écartées et signalées
+  avec leur numéro ;
+- les produits concernés sont chargés en une requête (par id ou par nom) ;
+- les modifications sont écrites par un UPDATE groupé par ensemble de colonnes
+  modifiées (les autres colonnes, le stock en particulier, ne sont pas
+  réécrites avec la valeur lue), les nouveaux produits par un INSERT groupé ;
+- un produit modifié entre sa lecture et l'écriture (paiement, administration :
+  sa version a changé) n'est pas écrasé : sa ligne est signalée en erreur ;
+- les traitements qui suivent habituellement une sauvegarde ORM sont lancés
+  une fois pour le lot : alertes de stock faible, retours en stock, veilles de
+  prix, catégorie des ventes journalières.
+
+Tout l'import tient dans une seule transaction ; la version du catalogue (et
+donc le snapshot et les caches) avance une fois au commit. En simulation
+(`dry_run`), la transaction est annulée et seul le rapport est produit : les
+traitements qui suivent ne sont pas lancés (ni notification, ni métrique), les
+retours en stock et les veilles de prix atteintes sont seulement comptés.
+
+Les colonnes reconnues sont celles de l'export Excel des produits (ID Produit,
+Nom, Catégorie, Description, Prix, Stock, Seuil de Stock) ou leurs noms
+anglais (id, name, category, ...). Seules les colonnes présentes, et les
+cellules non vides, modifient un produit existant ; une ligne sans id dont le
+nom est inconnu crée le produit (nom, catégorie et prix requis).
+'''
+import csv
+import io
+import os
+from datetime import datetime, timezone
+from itertools import islice
+import sqlalchemy as sa
+from ..extensions import db
+from ..models import Category, Product
+from ..versioning import bump_catalog_version
+from .metrics import metrics
+from .price_watch import count_price_watches_reached, evaluate_price_watches
+from .restock import record_restocks
+from .sales_facts import recategorize_sales_facts
+from .stock_alerts import refresh_low_stock_alerts
+
+IMPORT_EXTENSIONS = ('csv', 'xlsx')
+# En-têtes acceptés (comparés en minuscules) -> champ
+HEADER_ALIASES = {
+    'id': 'id', 'id produit': 'id',
+    'name': 'name', 'nom': 'name',
+    'category': 'category', 'catégorie': 'category', 'categorie': 'category',
+    'description': 'description',
+    'price': 'price', 'prix': 'price',
+    'stock': 'stock',
+    'min_stock_threshold': 'min_stock_threshold', 'seuil de stock': 'min_stock_threshold',
+}
+PRODUCT_FIELDS = ('name', 'category_id', 'description', 'price', 'stock', 'min_stock_threshold')
+NAME_MAX_LENGTH = Product.__table__.c.name.type.length
+
+
+class CatalogImportError(Exception):
+    """Fichier illisible ou sans colonne exploitable."""
+
+
+class ImportReport:
+    def __init__(self, dry_run=False):
+        self.dry_run = dry_run
+        self.rows = 0
+        self.created = 0
+        self.updated = 0
+        self.unchanged = 0
+        self.restocked = 0
+        self.price_watches_triggered = 0
+        self.errors = []  # (numéro de ligne, message)
+
+    def error(self, line, message):
+        self.errors.append((line, message))
+
+    def __repr__(self):
+        return (f'<ImportReport rows={self.rows} created={self.created} updated={self.updated} '
+                f'unchanged={self.unchanged} errors={len(self.errors)}>')
+
+
+def _read_csv(stream):
+    if isinstance(stream, io.TextIOBase):
+        text = stream
+    else:
+        text = io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+    sample = text.read(4096)
+    try:
+        dialect = csv.Sniffer().sniff(sample, delimiters=',;\t')
+    except csv.Error:
+        dialect = csv.excel
+    text.seek(0)
+    yield from csv.reader(text, dialect)
+
+
+def _read_xlsx(stream):
+    from openpyxl import load_workbook
+    workbook = load_workbook(stream, read_only=True, data_only=True)
+    try:
+        yield from workbook.active.iter_rows(values_only=True)
+    finally:
+        workbook.close()
+
+
+def read_rows(stream, filename):
+    """Lignes du fichier sous forme de dictionnaires, avec leur numéro : (ligne, {champ: valeur})."""
+    extension = os.path.splitext(filename)[1].lower().lstrip('.')
+    if extension not in IMPORT_EXTENSIONS:
+        raise CatalogImportError(f"Format non pris en charge : .{extension} (CSV ou XLSX attendu).")
+    rows = _read_xlsx(stream) if extension == 'xlsx' else _read_csv(stream)
+    try:
+        header = next(rows)
+    except StopIteration:
+        raise CatalogImportError('Le fichier est vide.')
+    except Exception as e:
+        raise CatalogImportError(f'Fichier illisible : {e}')
+    fields = [HEADER_ALIASES.get(str(name or '').strip().lower()) for name in header]
+    if 'id' not in fields and 'name' not in fields:
+        raise CatalogImportError("Colonne « ID Produit » ou « Nom » introuvable dans l'en-tête.")
+    for line, values in enumerate(rows, start=2):
+        row = {field: value for field, value in zip(fields, values) if field}
+        if any(value not in (None, '') for value in row.values()):
+            yield line, row
+
+
+def _utcnow():
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def _clean(value):
+    return value.strip() if isinstance(value, str) else value
+
+
+def _number(value, label, integer=False):
+    if isinstance(value, str):
+        # Formats français : « 5 000 », « 2500,50 »
+        value = value.replace('\xa0', '').replace(' ', '').replace(',', '.')
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        raise ValueError(f'{label} invalide : {value!r}')
+    if number < 0:
+        raise ValueError(f'{label} négatif : {value!r}')
+    if integer:
+        if number != int(number):
+            raise ValueError(f'{label} doit être un nombre entier : {value!r}')
+        return int(number)
+    return number
+
+
+def _parse(row, categories):
+    """Valeurs validées d'une ligne : {'id'?, champs de PRODUCT_FIELDS fournis}."""
+    values = {}
+    row = {field: _clean(value) for field, value in row.items() if _clean(value) not in (None, '')}
+    if 'id' in row:
+        values['id'] = _number(row['id'], 'Identifiant', integer=True)
+    if 'name' in row:
+        values['name'] = str(row['name'])
+        if len(values['name']) > NAME_MAX_LENGTH:
+            raise ValueError(f'Nom trop long ({NAME_MAX_LENGTH} caractères au plus)')
+    if 'category' in row:
+        category_id = categories.get(str(row['category']).casefold())
+        if category_id is None:
+            raise ValueError(f"Catégorie inconnue : {row['category']}")
+        values['category_id'] = category_id
+    if 'description' in row:
+        values['description'] = str(row['description'])
+    if 'price' in row:
+        values['price'] = _number(row['price'], 'Prix')
+    if 'stock' in row:
+        values['stock'] = _number(row['stock'], 'Stock', integer=True)
+    if 'min_stock_threshold' in row:
+        values['min_stock_threshold'] = _number(row['min_stock_threshold'], 'Seuil de stock', integer=True)
+    if 'id' not in values and 'name' not in values:
+        raise ValueError('Identifiant ou nom du produit manquant')
+    return values
+
+
+def _write_updates(updates, now):
+    """
+    Écrit les modifications [(id, valeurs lues, colonnes modifiées)] : seules les
+    colonnes modifiées sont écrites (un UPDATE groupé par ensemble de colonnes),
+    et seulement si la ligne a encore la version lue. Retourne les identifiants
+    des produits modifiés entre-temps (paiement, administration), laissés intacts.
+    """
+    if not updates:
+        return set()
+    product = Product.__table__
+    groups = {}
+    for product_id, current, modified in updates:
+        params = {'b_id': product_id, 'b_version': current['version']}
+        params.update((f'b_{field}', value) for field, value in modified.items())
+        groups.setdefault(tuple(sorted(modified)), []).append(params)
+    for fields, params in groups.items():
+        db.session.execute(
+            sa.update(product)
+            .where(product.c.id == sa.bindparam('b_id'), product.c.version == sa.bindparam('b_version'))
+            .values({**{field: sa.bindparam(f'b_{field}') for field in fields},
+                     'version': product.c.version + 1, 'updated_at': now}),
+            params)
+    # Le nombre de lignes d'un UPDATE multiple n'est pas fiable selon le pilote : on relit les versions
+    expected = {product_id: current['version'] + 1 for product_id, current, _ in updates}
+    written = db.session.execute(
+        sa.select(Product.id, Product.version, Product.updated_at).where(Product.id.in_(expected)))
+    return set(expected) - {row.id for row in written if row.version == expected[row.id] and row.updated_at == now}
+
+
+def _import_chunk(chunk, categories, report):
+    parsed = []
+    for line, row in chunk:
+        try:
+            parsed.append((line, _parse(row, categories)))
+        except ValueError as e:
+            report.error(line, str(e))
+
+    # Produits existants du lot, en une requête
+    ids = {values['id'] for _, values in parsed if 'id' in values}
+    names = {values['name'] for _, values in parsed if 'id' not in values}
+    columns = (Product.id, Product.version) + tuple(getattr(Product, field) for field in PRODUCT_FIELDS)
+    existing, by_name = {}, {}
+    if ids or names:
+        for row in db.session.execute(sa.select(*columns).where(sa.or_(Product.id.in_(ids), Product.name.in_(names)))):
+            existing[row.id] = row._asdict()
+            by_name.setdefault(row.name, []).append(row.id)
+
+    changes, creations, lines = {}, {}, {}
+    for line, values in parsed:
+        if 'id' in values:
+            product_id = values.pop('id')
+            if product_id not in existing:
+                report.error(line, f'Produit n°{product_id} introuvable')
+                continue
+        else:
+            matches = by_name.get(values['name'], [])
+            if len(matches) > 1:
+                report.error(line, f"Plusieurs produits s'appellent « {values['name']} » : indiquez l'identifiant")
+                continue
+            if not matches:
+                pending = creations.setdefault(values['name'], {})
+                pending.update(values)
+                pending.setdefault('line', line)
+                continue
+            product_id = matches[0]
+        # Plusieurs lignes pour le même produit : la dernière l'emporte
+        changes.setdefault(product_id, {}).update(values)
+        lines[product_id] = line
+
+    updates = []
+    now = _utcnow()
+    for product_id, values in changes.items():
+        current = existing[product_id]
+        modified = {field: value for field, value in values.items() if current[field] != value}
+        if not modified:
+            report.unchanged += 1
+            continue
+        updates.append((product_id, current, modified))
+
+    conflicts = _write_updates(updates, now)
+    price_changes, restocked, stock_changed, recategorized = {}, [], [], []
+    for product_id, current, modified in updates:
+        if product_id in conflicts:
+            report.error(lines[product_id], f"Produit n°{product_id} modifié pendant l'import : ligne ignorée, relancez l'import")
+            continue
+        report.updated += 1
+        if 'price' in modified:
+            price_changes[product_id] = modified['price']
+        if 'stock' in modified and current['stock'] <= 0 < modified['stock']:
+            restocked.append(product_id)
+        if 'stock' in modified or 'min_stock_threshold' in modified:
+            stock_changed.append(product_id)
+        if 'category_id' in modified:
+            recategorized.append(product_id)
+
+    new_rows = []
+    for name, values in creations.items():
+        line = values.pop('line')
+        missing = [label for field, label in (('category_id', 'catégorie'), ('price', 'prix')) if field not in values]
+        if missing:
+            report.error(line, f"Nouveau produit « {name} » : {', '.join(missing)} manquant(s)")
+            continue
+        new_rows.append({'stock': 0, 'min_stock_threshold': 5, 'version': 1, 'updated_at': now, **values})
+
+    if new_rows:
+        created_ids = db.session.execute(sa.insert(Product).returning(Product.id), new_rows).scalars().all()
+        stock_changed.extend(created_ids)
+    report.created += len(new_rows)
+
+    if report.dry_run:
+        report.restocked += len(set(restocked))
+        report.price_watches_triggered += count_price_watches_reached(price_changes)
+        return
+
+    # Traitements habituellement déclenchés par les hooks ORM, une fois pour le lot
+    refresh_low_stock_alerts(stock_changed)
+    report.restocked += record_restocks(restocked)
+    if price_changes:
+        report.price_watches_triggered += evaluate_price_watches(price_changes)
+    if recategorized:
+        recategorize_sales_facts(recategorized)
+
+
+def import_catalog(stream, filename, chunk_size=500, dry_run=False):
+    """Importe un fichier CSV/XLSX de produits ; retourne un ImportReport (voir le docstring du module)."""
+    report = ImportReport(dry_run=dry_run)
+    categories = {name.casefold(): category_id
+                  for category_id, name in db.session.execute(sa.select(Category.id, Category.name))}
+    rows = read_rows(stream, filename)
+    try:
+        while True:
+            chunk = list(islice(rows, chunk_size))
+            if not chunk:
+                break
+            report.rows += len(chunk)
+            _import_chunk(chunk, categories, report)
+        if dry_run or not (report.created or report.updated):
+            db.session.rollback()
+            return report
+        bump_catalog_version()
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    metrics.incr('catalog_import_rows', report.created + report.updated)
+    return report
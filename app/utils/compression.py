@@ -0,0 +1,186 @@
+'''
+Compression dynamique des réponses (gzip, brotli).
+
+WhiteNoise sert les fichiers statiques précompressés ; cette extension
+compresse le reste : pages HTML, JSON de l'API et des appels AJAX, sitemap.
+L'encodage est négocié sur Accept-Encoding (brotli de préférence s'il est
+installé, sinon gzip) et ajoute `Vary: Accept-Encoding`.
+
+- Les réponses de moins de COMPRESSION_MIN_BYTES octets partent telles quelles :
+  l'en-tête gzip et le temps CPU ne valent pas le gain.
+- Les réponses en flux (utils/streaming.py) sont compressées morceau par
+  morceau, chaque morceau étant vidé du compresseur aussitôt : le haut de page
+  part toujours avant la fin du rendu.
+- Les réponses qui portent un ETag (API du catalogue) ont un corps fixé par
+  cet ETag : leur variante compressée est gardée dans le cache partagé,
+  clé (encodage, URL, ETag), et n'est pas recompressée à chaque requête.
+- Attaque BREACH : une page HTML qui contient le jeton CSRF et reprend des
+  paramètres de la requête (recherche de /produits, formulaire renvoyé avec
+  ses erreurs) laisserait deviner le jeton d'après la taille de la réponse
+  compressée. Une page HTML pour laquelle un jeton CSRF a été généré part donc
+  sans compression dès que la requête porte une query string ou un formulaire.
+
+Métriques (/admin/metrics) : `compression_responses`, `compression_bytes_in`,
+`compression_bytes_out`, `compression_cpu_seconds` et `compression_cache_hits`,
+par encodage ; `compression_ratio()` en déduit le taux de compression.
+`compression_breach_skips` compte les pages laissées non compressées.
+'''
+import time
+import zlib
+from flask import current_app, g, request
+from .metrics import metrics
+
+try:
+    import brotli
+except ImportError:  # brotli est optionnel : seul gzip sera proposé
+    brotli = None
+
+COMPRESSIBLE_MIMETYPES = {
+    'text/html', 'text/plain', 'text/css', 'text/csv', 'text/xml', 'text/javascript',
+    'application/json', 'application/javascript', 'application/xml',
+}
+COMPRESSED_VARIANT_KEY = 'compressed:{}:{}:{}'
+
+
+def available_encodings():
+    return ('br', 'gzip') if brotli is not None else ('gzip',)
+
+
+class _Compressor:
+    """Compresseur incrémental : chaque appel à `compress` rend des octets décodables tout de suite."""
+
+    def __init__(self, encoding, config):
+        self.encoding = encoding
+        if encoding == 'br':
+            self._brotli = brotli.Compressor(quality=config['COMPRESSION_BROTLI_QUALITY'])
+        else:
+            # wbits=31 : format gzip (en-tête et CRC)
+            self._zlib = zlib.compressobj(config['COMPRESSION_GZIP_LEVEL'], zlib.DEFLATED, 31)
+
+    def compress(self, data):
+        if self.encoding == 'br':
+            return self._brotli.process(data) + self._brotli.flush()
+        return self._zlib.compress(data) + self._zlib.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self):
+        if self.encoding == 'br':
+            return self._brotli.finish()
+        return self._zlib.flush()
+
+
+def _record(encoding, size_in, size_out, cpu_seconds):
+    metrics.incr('compression_responses', encoding=encoding)
+    metrics.incr('compression_bytes_in', size_in, encoding=encoding)
+    metrics.incr('compression_bytes_out', size_out, encoding=encoding)
+    metrics.incr('compression_cpu_seconds', cpu_seconds, encoding=encoding)
+
+
+def compress_body(data, encoding, config):
+    """Corps compressé d'un coup, avec ses métriques."""
+    start = time.thread_time()
+    compressor = _Compressor(encoding, config)
+    compressed = compressor.compress(data) + compressor.finish()
+    _record(encoding, len(data), len(compressed), time.thread_time() - start)
+    return compressed
+
+
+def _compress_stream(chunks, source, encoding, config):
+    compressor = _Compressor(encoding, config)
+    size_in = size_out = 0
+    cpu_seconds = 0.0
+    try:
+        for chunk in chunks:
+            start = time.thread_time()
+            compressed = compressor.compress(chunk)
+            cpu_seconds += time.thread_time() - start
+            size_in += len(chunk)
+            size_out += len(compressed)
+            if compressed:
+                yield compressed
+        start = time.thread_time()
+        tail = compressor.finish()
+        cpu_seconds += time.thread_time() - start
+        size_out += len(tail)
+        yield tail
+        _record(encoding, size_in, size_out, cpu_seconds)
+    finally:
+        # Fermer le générateur d'origine : stream_with_context libère alors le contexte de la requête
+        close = getattr(source, 'close', None)
+        if close is not None:
+            close()
+
+
+def compression_ratio():
+    """Taux de compression (octets envoyés / octets d'origine) par encodage."""
+    ratios = {}
+    for encoding in available_encodings():
+        size_in = metrics.get('compression_bytes_in', encoding=encoding)
+        if size_in:
+            ratios[encoding] = metrics.get('compression_bytes_out', encoding=encoding) / size_in
+    return ratios
+
+
+class ResponseCompressor:
+    """Extension qui compresse les réponses éligibles dans un hook after_request (voir le docstring du module)."""
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('COMPRESS_RESPONSES', True)
+        app.config.setdefault('COMPRESSION_MIN_BYTES', 1024)
+        app.config.setdefault('COMPRESSION_GZIP_LEVEL', 6)
+        app.config.setdefault('COMPRESSION_BROTLI_QUALITY', 5)
+        app.config.setdefault('COMPRESSION_CACHE_SECONDS', 3600)
+        app.extensions['compressor'] = self
+        app.after_request(self._compress)
+
+    def _compressible(self, response):
+        return (request.method != 'HEAD' and response.status_code >= 200
+                and response.status_code not in (204, 206, 304) and not response.direct_passthrough and 'Content-Encoding' not in response.headers
+                and response.mimetype in COMPRESSIBLE_MIMETYPES)
+
+    def _exposes_secret(self, response):
+        # Jeton CSRF généré pendant la requête (flask_wtf le garde dans g) et entrée utilisateur reflétable
+        if response.mimetype != 'text/html':
+            return False
+        csrf_field = current_app.config.get('WTF_CSRF_FIELD_NAME', 'csrf_token')
+        return csrf_field in g and bool(request.args or request.form)
+
+    def _compress(self, response):
+        config = current_app.config
+        if not config['COMPRESS_RESPONSES'] or not self._compressible(response):
+            return response
+        if self._exposes_secret(response):
+            metrics.incr('compression_breach_skips')
+            return response
+        response.vary.add('Accept-Encoding')
+        encoding = request.accept_encodings.best_match(available_encodings())
+        if encoding is None:
+            return response
+
+        if response.is_streamed:
+            response.response = _compress_stream(response.iter_encoded(), response.response, encoding, config)
+            response.headers.pop('Content-Length', None)
+        else:
+            data = response.get_data()
+            if len(data) < config['COMPRESSION_MIN_BYTES']:
+                return response
+            response.set_data(self._cached_variant(response, data, encoding, config))
+        response.headers['Content-Encoding'] = encoding
+        return response
+
+    def _cached_variant(self, response, data, encoding, config):
+        etag, _ = response.get_etag()
+        if not etag:
+            return compress_body(data, encoding, config)
+        from ..extensions import cache
+        key = COMPRESSED_VARIANT_KEY.format(encoding, request.full_path, etag)
+        compressed = cache.get(key)
+        if compressed is not None:
+            metrics.incr('compression_cache_hits', encoding=encoding)
+            return compressed
+        compressed = compress_body(data, encoding, config)
+        cache.set(key, compressed, timeout=config['COMPRESSION_CACHE_SECONDS'])
+        return compressed
@@ -0,0 +1,99 @@
+'''
+Statistiques par client (nombre de commandes, chiffre d'affaires cumulé,
+panier moyen, première et dernière commande).
+
+La table `customer_stats` compte les commandes finalisées (FINALIZED_STATUSES).
+Chaque client reçoit sa ligne à l'inscription ; quand une commande entre dans
+un statut finalisé ou en sort (set_order_status), la ligne de son client est
+recalculée juste avant le commit, à partir de ses seules commandes (index
+ix_orders_customer_id_status). L'annuaire des clients trie et pagine donc sur
+des colonnes indexées sans agréger les commandes.
+
+`flask rebuild-customer-stats` recalcule toutes les lignes par lots.
+'''
+import sqlalchemy as sa
+from ..db_routing import RoutingSession
+from ..extensions import db
+from ..models import Customer, CustomerStats, Order, OrderStatusEvent
+from .order_sequence import FINALIZED_STATUSES
+
+# Marqueur posé dans Session.info : clients dont les statistiques sont à recalculer
+STALE_CUSTOMERS_INFO_KEY = 'stale_customer_stats'
+
+
+def _empty_stats(customer_id):
+    return {'customer_id': customer_id, 'order_count': 0, 'revenue': 0, 'average_basket': 0,
+            'first_order_at': None, 'last_order_at': None}
+
+
+def refresh_customer_stats(customer_ids, session=None):
+    """Recalcule les statistiques des clients donnés (à committer par l'appelant)."""
+    customer_ids = sorted(set(customer_ids))
+    if not customer_ids:
+        return 0
+    session = session or db.session
+    values = {customer_id: _empty_stats(customer_id) for customer_id in customer_ids}
+    rows = session.execute(
+        sa.select(Order.customer_id, sa.func.count(Order.id), sa.func.sum(Order.total_price),
+                  sa.func.min(Order.date_ordered), sa.func.max(Order.date_ordered))
+        .where(Order.customer_id.in_(customer_ids), Order.status.in_(FINALIZED_STATUSES))
+        .group_by(Order.customer_id)
+    ).all()
+    for customer_id, order_count, revenue, first_order_at, last_order_at in rows:
+        values[customer_id].update(order_count=order_count, revenue=revenue or 0,
+                                   average_basket=(revenue or 0) / order_count,
+                                   first_order_at=first_order_at, last_order_at=last_order_at)
+
+    existing = set(session.execute(
+        sa.select(CustomerStats.customer_id).where(CustomerStats.customer_id.in_(customer_ids))
+    ).scalars())
+    if existing:
+        # UPDATE groupé par clé primaire
+        session.execute(sa.update(CustomerStats), [values[customer_id] for customer_id in customer_ids
+                                                   if customer_id in existing])
+    missing = [values[customer_id] for customer_id in customer_ids if customer_id not in existing]
+    if missing:
+        session.execute(sa.insert(CustomerStats), missing)
+    return len(customer_ids)
+
+
+def rebuild_customer_stats(batch_size=1000):
+    """Recalcule les statistiques de tous les clients, par lots committés ; retourne leur nombre."""
+    last_id = 0
+    total = 0
+    while True:
+        customer_ids = db.session.execute(
+            db.select(Customer.id).filter(Customer.id > last_id).order_by(Customer.id).limit(batch_size)
+        ).scalars().all()
+        if not customer_ids:
+            break
+        total += refresh_customer_stats(customer_ids)
+        db.session.commit()
+        last_id = customer_ids[-1]
+    return total
+
+
+def _crosses_finalization(event):
+    return (event.from_status in FINALIZED_STATUSES) != (event.to_status in FINALIZED_STATUSES)
+
+
+@sa.event.listens_for(RoutingSession, 'before_flush')
+def _track_customer_stats(session, flush_context, instances):
+    for obj in session.new:
+        if isinstance(obj, Customer) and obj.stats is None:
+            obj.stats = CustomerStats()
+        elif isinstance(obj, OrderStatusEvent) and obj.order is not None and _crosses_finalization(obj):
+            session.info.setdefault(STALE_CUSTOMERS_INFO_KEY, set()).add(obj.order.customer_id)
+
+
+@sa.event.listens_for(RoutingSession, 'before_commit')
+def _refresh_stale_customer_stats(session):
+    session.flush()
+    customer_ids = session.info.pop(STALE_CUSTOMERS_INFO_KEY, None)
+    if customer_ids:
+        refresh_customer_stats(customer_ids, session=session)
+
+
+@sa.event.listens_for(RoutingSession, 'after_rollback')
+def _forget_stale_customer_stats(session):
+    session.info.pop(STALE_CUSTOMERS_INFO_KEY, None)
@@ -1,11 +1,28 @@
 import os
 import filetype
 import uuid
+from flask import current_app, url_for
 from werkzeug.utils import secure_filename
-from PIL import Image
-import cloudinary
-import cloudinary.uploader
-import cloudinary.api
+
+_cloudinary_configured = False
+
+def get_cloudinary():
+    """
+    Importe et configure Cloudinary à la première utilisation.
+    Le SDK n'est ainsi chargé que par les workers qui manipulent réellement des images.
+    """
+    global _cloudinary_configured
+    import cloudinary
+    import cloudinary.uploader
+    import cloudinary.api
+    if not _cloudinary_configured:
+        cloudinary.config(
+            cloud_name=current_app.config.get('CLOUDINARY_CLOUD_NAME'),
+            api_key=current_app.config.get('CLOUDINARY_API_KEY'),
+            api_secret=current_app.config.get('CLOUDINARY_API_SECRET')
+        )
+        _cloudinary_configured = True
+    return cloudinary
 
 def allowed_file(file, allowed_extensions):
     """Vérifie si le fichier a une extension autorisée et un type MIME d'image."""
@@ -28,6 +45,7 @@ def allowed_file(file, allowed_extensions):
 
 def save_image(file, upload_folder=None, image_size=(400, 400)):
     """Traite et sauvegarde une image uploadée sur Cloudinary et retourne son URL."""
+    cloudinary = get_cloudinary()
     public_id = f"{uuid.uuid4()}"
     upload_result = cloudinary.uploader.upload(file.stream, 
                                                 public_id=public_id, 
@@ -49,7 +67,16 @@ def delete_image_from_cloudinary(image_url):
         public_id = os.path.splitext(public_id_with_ext)[0]
         
         # Supprime l'image de Cloudinary
+        cloudinary = get_cloudinary()
         cloudinary.api.delete_resources([public_id], resource_type="image")
     except Exception as e:
         # On ne veut pas que l'application plante si la suppression échoue
-        print(f"Erreur lors de la suppression de l'image {image_url} sur Cloudinary: {e}")
\ No newline at end of file
+        print(f"Erreur lors de la suppression de l'image {image_url} sur Cloudinary: {e}")
+
+
+def image_url(image_file_value):
+    """URL publique d'une image : URL Cloudinary telle quelle, sinon fichier de static/images."""
+    if image_file_value and 'cloudinary' in image_file_value:
+        return image_file_value
+    # Utilise un nom de fichier par défaut si la valeur est vide
+    return url_for('static', filename='images/' + (image_file_value or 'default.jpg'))
@@ -0,0 +1,85 @@
+'''
+Contexte de template paresseux.
+
+Les valeurs injectées dans tous les templates (bannières actives, formulaire de
+newsletter...) ne sont plus calculées à chaque `render_template` : chaque nom
+est exposé sous forme de proxy, calculé au premier accès puis mémorisé jusqu'à
+la fin de la requête. Un e-mail ou une page d'erreur qui n'affiche pas ces
+éléments ne paie ni la requête SQL ni la génération du jeton CSRF.
+
+Chaque rendu comptabilise aussi les valeurs réellement lues par le template
+(métriques `template_renders` et `template_context_used`, visibles sur
+/admin/metrics) : `unused_values()` liste celles qu'un template n'utilise jamais.
+'''
+from functools import partial
+from flask import g, before_render_template, template_rendered
+from werkzeug.local import LocalProxy
+from .metrics import metrics
+
+MEMO_KEY = '_lazy_context'
+RENDER_STACK_KEY = '_lazy_context_renders'
+
+
+class LazyContext:
+    """Registre des valeurs de contexte globales, calculées à la demande."""
+
+    def __init__(self, app=None):
+        self._factories = {}
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.extensions['lazy_context'] = self
+        app.before_request(self._reset)
+        app.context_processor(self._inject)
+        before_render_template.connect(self._push_render, app, weak=False)
+        template_rendered.connect(self._pop_render, app, weak=False)
+
+    def value(self, name):
+        """Décorateur : enregistre `f` comme fabrique de la variable de template `name`."""
+        def decorator(f):
+            self._factories[name] = f
+            return f
+        return decorator
+
+    @property
+    def names(self):
+        return tuple(self._factories)
+
+    def _reset(self):
+        # Le contexte d'application peut être réutilisé d'une requête à l'autre (tests) :
+        # la mémorisation ne doit pas survivre à la requête.
+        g.pop(MEMO_KEY, None)
+        g.pop(RENDER_STACK_KEY, None)
+
+    def _inject(self):
+        return {name: LocalProxy(partial(self._resolve, name)) for name in self._factories}
+
+    def _resolve(self, name):
+        renders = g.get(RENDER_STACK_KEY)
+        if renders:
+            renders[-1]['used'].add(name)
+        memo = g.setdefault(MEMO_KEY, {})
+        if name not in memo:
+            memo[name] = self._factories[name]()
+        return memo[name]
+
+    def _push_render(self, sender, template, context, **extra):
+        g.setdefault(RENDER_STACK_KEY, []).append({'template': template.name or '<string>', 'used': set()})
+
+    def _pop_render(self, sender, template, context, **extra):
+        renders = g.get(RENDER_STACK_KEY)
+        if not renders:
+            return
+        render = renders.pop()
+        metrics.incr('template_renders', template=render['template'])
+        for name in render['used']:
+            metrics.incr('template_context_used', template=render['template'], variable=name)
+
+
+def unused_values(lazy_context, template_name):
+    """Valeurs de contexte jamais lues par un template déjà rendu (candidates à la suppression)."""
+    if not metrics.get('template_renders', template=template_name):
+        return []
+    return [name for name in lazy_context.names
+            if not metrics.get('template_context_used', template=template_name, variable=name)]
@@ -0,0 +1,40 @@
+'''
+Compteurs de métriques en mémoire, propres à chaque worker.
+
+Les valeurs sont exposées en JSON aux membres du personnel sur /admin/metrics
+et peuvent être collectées par un outil de supervision.
+'''
+import threading
+from collections import defaultdict
+
+
+class Metrics:
+    """Registre de compteurs nommés, avec étiquettes optionnelles (thread-safe)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = defaultdict(float)
+
+    def incr(self, name, value=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] += value
+
+    def get(self, name, **labels):
+        return self._counters.get((name, tuple(sorted(labels.items()))), 0)
+
+    def snapshot(self):
+        """Retourne {nom: [{'labels': {...}, 'value': x}, ...]} trié par nom."""
+        with self._lock:
+            items = list(self._counters.items())
+        result = defaultdict(list)
+        for (name, labels), value in sorted(items):
+            result[name].append({'labels': dict(labels), 'value': value})
+        return dict(result)
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+
+
+metrics = Metrics()
@@ -0,0 +1,81 @@
+'''
+Worker des notifications clients.
+
+Diffuse les retours en stock puis envoie les notifications en attente (un
+e-mail par client). Par défaut, un thread de chaque processus web s'en charge :
+il est réveillé après chaque commit qui met des notifications en file
+d'attente, et repasse toutes les NOTIFICATION_POLL_SECONDS secondes. Avec
+NOTIFICATION_WORKER=external, lancer plutôt `flask send-notifications --loop`.
+'''
+import os
+import threading
+import sqlalchemy as sa
+from flask import current_app
+from ..db_routing import RoutingSession
+from .notifications import send_pending_notifications, NOTIFICATIONS_PENDING_INFO_KEY
+from .restock import process_restock_events
+
+
+def process_notifications():
+    """Un passage complet ; retourne le nombre de retours en stock et de notifications traités."""
+    return process_restock_events() + send_pending_notifications()
+
+
+class NotificationWorker:
+    """Thread d'envoi des notifications, démarré à la demande dans chaque processus."""
+
+    def __init__(self, app=None):
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+        self._pid = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('NOTIFICATION_WORKER', 'external' if app.testing else 'thread')
+        app.config.setdefault('NOTIFICATION_POLL_SECONDS', 60)
+        app.config.setdefault('NOTIFICATION_CLAIM_SECONDS', 1800)
+        app.config.setdefault('RESTOCK_NOTIFICATION_COOLDOWN_HOURS', 24)
+        app.extensions['notification_worker'] = self
+
+    def notify(self):
+        """Signale de nouvelles notifications (démarre le thread si besoin)."""
+        if current_app.config['NOTIFICATION_WORKER'] != 'thread':
+            return
+        self._ensure_started(current_app._get_current_object())
+        self._wakeup.set()
+
+    def _ensure_started(self, app):
+        with self._lock:
+            # Après un fork (gunicorn), le thread du processus parent n'existe plus
+            if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, args=(app,), name='notification-worker', daemon=True)
+            self._thread.start()
+
+    def _run(self, app):
+        while True:
+            self._wakeup.wait(app.config['NOTIFICATION_POLL_SECONDS'])
+            self._wakeup.clear()
+            with app.app_context():
+                try:
+                    while process_notifications():
+                        pass
+                except Exception as e:
+                    app.logger.error(f'Erreur du traitement des notifications : {e}')
+
+
+worker = NotificationWorker()
+
+
+@sa.event.listens_for(RoutingSession, 'after_commit')
+def _wake_worker(session):
+    if session.info.pop(NOTIFICATIONS_PENDING_INFO_KEY, False) and current_app:
+        worker.notify()
+
+
+@sa.event.listens_for(RoutingSession, 'after_rollback')
+def _forget_pending_notifications(session):
+    session.info.pop(NOTIFICATIONS_PENDING_INFO_KEY, None)
@@ -0,0 +1,121 @@
+'''
+File d'attente des notifications clients.
+
+Les sous-systèmes (veille de prix, retour en stock) insèrent des lignes
+`customer_notification` dans la transaction qui les motive, sans envoyer
+d'e-mail. `send_pending_notifications` (appelée par le worker de notifications,
+voir notification_worker.py) regroupe ensuite les notifications en attente par
+client et envoie un seul e-mail à chacun.
+
+Plusieurs workers peuvent envoyer en même temps (un thread par processus web) :
+chacun prend d'abord en charge un lot de notifications par un UPDATE
+conditionnel (`claimed_at`), et ne voit donc pas celles d'un autre. Chaque
+e-mail envoyé est enregistré aussitôt (`sent_at`) ; une prise en charge non
+terminée (processus arrêté) est reprise après NOTIFICATION_CLAIM_SECONDS.
+'''
+from datetime import datetime, timedelta, timezone
+from itertools import groupby
+import sqlalchemy as sa
+from flask import current_app, render_template
+from flask_mailman import EmailMessage
+from ..extensions import db
+from ..models import CustomerNotification
+from .metrics import metrics
+
+PRICE_DROP = 'price_drop'
+BACK_IN_STOCK = 'back_in_stock'
+
+# Marqueur posé dans Session.info : le worker de notifications est réveillé après le commit
+NOTIFICATIONS_PENDING_INFO_KEY = 'notifications_pending'
+
+
+def _utcnow():
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def enqueue_notifications(notifications, session=None):
+    """
+    Insère en une seule requête des notifications décrites par des dicts
+    (customer_id, kind, product_id, price). L'envoi a lieu plus tard.
+    """
+    if not notifications:
+        return 0
+    session = session or db.session
+    now = _utcnow()
+    session.info[NOTIFICATIONS_PENDING_INFO_KEY] = True
+    session.execute(sa.insert(CustomerNotification), [
+        {'product_id': None, 'price': None, **notification, 'created_at': now}
+        for notification in notifications
+    ])
+    metrics.incr('customer_notifications_enqueued', len(notifications))
+    return len(notifications)
+
+
+def _claim_pending(limit, now):
+    """Prend en charge jusqu'à `limit` notifications en attente ; retourne leurs identifiants."""
+    stale = now - timedelta(seconds=current_app.config['NOTIFICATION_CLAIM_SECONDS'])
+    claimable = sa.and_(CustomerNotification.sent_at.is_(None),
+                        sa.or_(CustomerNotification.claimed_at.is_(None), CustomerNotification.claimed_at < stale))
+    candidates = (sa.select(CustomerNotification.id).where(claimable)
+                  .order_by(CustomerNotification.customer_id, CustomerNotification.id).limit(limit))
+    # Conditions reprises dans l'UPDATE : une ligne prise entre-temps par un autre worker est écartée
+    claimed = db.session.execute(
+        sa.update(CustomerNotification)
+        .where(CustomerNotification.id.in_(candidates), claimable)
+        .values(claimed_at=now)
+        .returning(CustomerNotification.id)
+        .execution_options(synchronize_session=False)
+    ).scalars().all()
+    db.session.commit()
+    return claimed
+
+
+def _mark(notification_ids, **values):
+    db.session.execute(
+        sa.update(CustomerNotification)
+        .where(CustomerNotification.id.in_(notification_ids))
+        .values(**values)
+        .execution_options(synchronize_session=False)
+    )
+    db.session.commit()
+
+
+def send_pending_notifications(limit=500, now=None):
+    """
+    Envoie les notifications en attente, un e-mail par client. Un envoi en
+    échec libère les notifications du client pour le prochain passage.
+    Retourne le nombre de notifications envoyées.
+    """
+    claimed = _claim_pending(limit, now or _utcnow())
+    if not claimed:
+        return 0
+    pending = db.session.execute(
+        db.select(CustomerNotification)
+        .options(db.joinedload(CustomerNotification.customer), db.joinedload(CustomerNotification.product))
+        .filter(CustomerNotification.id.in_(claimed))
+        .order_by(CustomerNotification.customer_id, CustomerNotification.id)
+    ).scalars().all()
+
+    sent = 0
+    for customer_id, notifications in groupby(pending, key=lambda n: n.customer_id):
+        notifications = list(notifications)
+        notification_ids = [n.id for n in notifications]
+        customer = notifications[0].customer
+        try:
+            msg = EmailMessage(subject="Du nouveau sur les produits que vous suivez",
+                               body=render_template('customer_notifications.html', customer=customer,
+                                                    notifications=notifications),
+                               from_email=current_app.config['MAIL_DEFAULT_SENDER'],
+                               to=[customer.email])
+            msg.content_subtype = "html"
+            msg.send()
+        except Exception as e:
+            current_app.logger.error(f"Échec de l'envoi des notifications au client {customer_id} : {e}")
+            metrics.incr('customer_notification_failures')
+            _mark(notification_ids, claimed_at=None)
+            continue
+        _mark(notification_ids, sent_at=now or _utcnow())
+        sent += len(notification_ids)
+
+    metrics.incr('customer_notifications_sent', sent)
+    return sent
@@ -0,0 +1,98 @@
+'''
+Journal des changements de statut des commandes.
+
+Chaque transition est enregistrée dans la table order_status_event (commande,
+ancien statut, nouveau statut, date, auteur). Les rapports ci-dessous
+s'appuient sur ses index (order_id, created_at) et (to_status, created_at) au
+lieu de parcourir toutes les commandes :
+
+- `orders_entering` : commandes passées à un statut sur une période
+  (ex. « ce qui a été expédié hier ») ;
+- `throughput_by_status` : nombre de transitions vers chaque statut ;
+- `time_in_status` : durée passée dans un statut avant la transition suivante.
+'''
+from datetime import datetime, timezone
+from flask import has_request_context
+from flask_login import current_user
+from ..extensions import db
+from ..models import OrderStatusEvent
+
+
+def current_actor():
+    """Auteur par défaut d'une transition : l'utilisateur connecté, sinon 'system'."""
+    if has_request_context() and current_user and current_user.is_authenticated:
+        return current_user.get_id()
+    return 'system'
+
+
+def set_order_status(order, new_status, actor=None):
+    """
+    Change le statut d'une commande et journalise la transition (à committer
+    avec la commande). Une commande nouvellement créée est journalisée depuis
+    le statut None. Retourne l'événement, ou None si le statut ne change pas.
+    """
+    previous_status = order.status if order.id is not None else None
+    if previous_status == new_status:
+        return None
+    order.status = new_status
+    event = OrderStatusEvent(from_status=previous_status, to_status=new_status,
+                             created_at=datetime.now(timezone.utc),
+                             actor=actor or current_actor())
+    order.status_events.append(event)
+    return event
+
+
+def orders_entering(status, start, end):
+    """Identifiants des commandes passées au statut `status` entre `start` (inclus) et `end` (exclu)."""
+    return db.session.execute(
+        db.select(OrderStatusEvent.order_id)
+        .filter(OrderStatusEvent.to_status == status,
+                OrderStatusEvent.created_at >= start,
+                OrderStatusEvent.created_at < end)
+        .order_by(OrderStatusEvent.created_at)
+    ).scalars().all()
+
+
+def throughput_by_status(start, end):
+    """Nombre de transitions vers chaque statut sur la période : {statut: nombre}."""
+    rows = db.session.execute(
+        db.select(OrderStatusEvent.to_status, db.func.count(OrderStatusEvent.id))
+        .filter(OrderStatusEvent.created_at >= start, OrderStatusEvent.created_at < end)
+        .group_by(OrderStatusEvent.to_status)
+    ).all()
+    return {status: count for status, count in rows}
+
+
+def time_in_status(status, start, end, now=None):
+    """
+    Durée passée dans `status` par les commandes qui y sont entrées sur la période.
+    Les commandes encore dans ce statut sont comptées jusqu'à `now`.
+    Retourne {'orders', 'still_in_status', 'average_seconds', 'max_seconds'}.
+    """
+    now = now or datetime.now(timezone.utc).replace(tzinfo=None)
+    entered = db.select(OrderStatusEvent).filter(
+        OrderStatusEvent.to_status == status,
+        OrderStatusEvent.created_at >= start,
+        OrderStatusEvent.created_at < end,
+    ).subquery()
+    # Transition suivante de la même commande (index order_id, created_at)
+    left_at = (
+        db.select(db.func.min(OrderStatusEvent.created_at))
+        .filter(OrderStatusEvent.order_id == entered.c.order_id,
+                OrderStatusEvent.created_at > entered.c.created_at)
+        .scalar_subquery()
+    )
+    rows = db.session.execute(db.select(entered.c.created_at, left_at)).all()
+
+    durations, still_in_status = [], 0
+    for entered_at, exited_at in rows:
+        if exited_at is None:
+            still_in_status += 1
+            exited_at = now
+        durations.append((exited_at - entered_at).total_seconds())
+    return {
+        'orders': len(durations),
+        'still_in_status': still_in_status,
+        'average_seconds': sum(durations) / len(durations) if durations else None,
+        'max_seconds': max(durations) if durations else None,
+    }
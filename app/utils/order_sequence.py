@@ -0,0 +1,89 @@
+'''
+Numérotation des commandes finalisées et détection des commandes gagnantes.
+
+Quand une commande atteint un statut finalisé, elle reçoit le numéro suivant
+d'un compteur incrémenté atomiquement en base (UPDATE ... RETURNING dans la
+transaction de la commande) : deux paiements simultanés ne peuvent pas obtenir
+le même rang, et les trous dans les identifiants de commande n'ont plus
+d'effet. Les paliers (Milestone) sont lus en base au moment de la
+finalisation (une recherche sur l'index unique de order_number) : un palier
+ajouté ou supprimé depuis n'importe quel worker est pris en compte aussitôt.
+'''
+import sqlalchemy as sa
+from sqlalchemy.exc import IntegrityError
+from ..extensions import db
+from ..models import Milestone, OrderSequence
+
+COMPLETED_ORDERS_SEQUENCE = 'completed_orders'
+
+# Paiement encaissé mais stock insuffisant : à traiter par le personnel (réassort ou remboursement)
+PAID_AWAITING_STOCK_STATUS = 'Payée - stock insuffisant'
+
+# Statuts pour lesquels une commande compte comme « finalisée »
+FINALIZED_STATUSES = (
+    'Paiement à la livraison',
+    'Payée',
+    PAID_AWAITING_STOCK_STATUS,
+    'En cours de traitement',
+    'Expédiée',
+    'Terminée',
+)
+
+
+def is_milestone_number(order_number):
+    """Indique si le rang donné correspond à un palier gagnant."""
+    return db.session.execute(
+        db.select(sa.exists().where(Milestone.order_number == order_number))
+    ).scalar()
+
+
+def _increment(session, name):
+    stmt = (sa.update(OrderSequence)
+            .where(OrderSequence.name == name)
+            .values(value=OrderSequence.value + 1)
+            .returning(OrderSequence.value)
+            .execution_options(synchronize_session=False))
+    return session.execute(stmt).scalar()
+
+
+def next_sequence_value(name=COMPLETED_ORDERS_SEQUENCE, session=None):
+    """
+    Incrémente le compteur et retourne sa nouvelle valeur. La ligne reste
+    verrouillée jusqu'à la fin de la transaction : les appels concurrents
+    obtiennent des valeurs distinctes.
+    """
+    session = session or db.session
+    value = _increment(session, name)
+    if value is None:
+        # Compteur absent (base créée sans la migration) : on le crée puis on réessaie
+        try:
+            with session.begin_nested():
+                session.add(OrderSequence(name=name, value=0))
+        except IntegrityError:
+            pass  # Créé entre-temps par une autre transaction
+        value = _increment(session, name)
+    return value
+
+
+def current_sequence_value(name):
+    """Valeur actuelle d'un compteur (0 s'il n'existe pas encore), lue sans passer par la carte d'identité."""
+    value = db.session.execute(db.select(OrderSequence.value).filter_by(name=name)).scalar()
+    return value or 0
+
+
+def peek_next_order_number():
+    """Numéro qu'obtiendrait la prochaine commande finalisée (lecture d'une seule ligne, sans verrou)."""
+    return current_sequence_value(COMPLETED_ORDERS_SEQUENCE) + 1
+
+
+def assign_sequence_number(order):
+    """
+    Attribue son rang à une commande qui vient d'être finalisée et détermine si
+    elle est gagnante. Sans effet si la commande n'est pas finalisée ou a déjà
+    un rang. Doit être appelé avant le commit de la commande.
+    """
+    if order.sequence_number is not None or order.status not in FINALIZED_STATUSES:
+        return False
+    order.sequence_number = next_sequence_value()
+    order.is_milestone = is_milestone_number(order.sequence_number)
+    return True
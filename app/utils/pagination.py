@@ -0,0 +1,47 @@
+'''
+Curseurs de pagination par clé (keyset).
+
+Un curseur encode les valeurs de tri de la dernière ligne affichée (clé de tri
+puis clé primaire) ; la page suivante reprend strictement après elles, en une
+lecture d'index, quelle que soit sa position dans la table.
+'''
+import base64
+import binascii
+import json
+from datetime import date, datetime
+import sqlalchemy as sa
+
+
+def encode_cursor(values):
+    """Curseur opaque (utilisable dans une URL) pour les valeurs données."""
+    raw = json.dumps([value.isoformat() if isinstance(value, (date, datetime)) else value
+                      for value in values])
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor, expressions):
+    """Valeurs du curseur, typées d'après les colonnes `expressions`, ou None s'il est invalide."""
+    if not cursor:
+        return None
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+        if not isinstance(values, list) or len(values) != len(expressions):
+            return None
+        decoded = []
+        for expression, value in zip(expressions, values):
+            if isinstance(expression.type, sa.DateTime):
+                value = datetime.fromisoformat(value)
+            elif isinstance(expression.type, sa.Date):
+                value = date.fromisoformat(value)
+            decoded.append(value)
+        return decoded
+    except (ValueError, TypeError, binascii.Error):
+        return None
+
+
+def after_cursor(keys, cursor, descending):
+    """Critère « strictement après le curseur » pour un tri sur (clé de tri, clé primaire)."""
+    (sort_key, pk), (sort_value, pk_value) = keys, cursor
+    if descending:
+        return sa.or_(sort_key < sort_value, sa.and_(sort_key == sort_value, pk < pk_value))
+    return sa.or_(sort_key > sort_value, sa.and_(sort_key == sort_value, pk > pk_value))
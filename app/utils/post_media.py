@@ -0,0 +1,100 @@
+'''
+Réalisations : métadonnées calculées à l'enregistrement et cartes en cache.
+
+L'identifiant de la vidéo YouTube, l'URL d'intégration, la miniature et le
+résumé affiché sur les cartes sont calculés quand une réalisation est créée ou
+modifiée (hook before_flush), et non plus à chaque affichage.
+
+Le fil des réalisations ne lit que (created_at, id, version) de la page
+demandée, puis récupère les cartes déjà rendues dans le cache en une seule
+requête (`post_cards`) ; seules les cartes absentes sont rendues, à partir des
+colonnes qu'elles affichent (la description n'est pas chargée). La clé d'une
+carte contient la version de la ligne (voir versioning.py) : une réalisation
+modifiée ne retombe jamais sur son ancienne carte, quel que soit le worker et
+même avec le cache SimpleCache propre à chaque processus. Les cartes
+périmées ou supprimées ne sont plus lues et expirent après
+POST_CARD_CACHE_SECONDS.
+'''
+from urllib.parse import urlparse, parse_qs
+import sqlalchemy as sa
+from flask import render_template
+from markupsafe import Markup
+from sqlalchemy.orm import load_only
+from ..db_routing import RoutingSession
+from ..extensions import db, cache
+from ..models import Post
+
+POST_CARD_CACHE_KEY = 'post-card-{}-v{}'
+POST_CARD_CACHE_SECONDS = 3600
+SUMMARY_LENGTH = 100
+_MEDIA_SOURCES = ('video_url', 'description')
+
+
+def youtube_video_id(url):
+    """Identifiant d'une vidéo YouTube (watch, shorts, embed ou youtu.be), ou None."""
+    if not url:
+        return None
+    parsed = urlparse(url.strip())
+    host = parsed.netloc.lower()
+    video_id = None
+    if host.endswith('youtube.com'):
+        if parsed.path == '/watch':
+            video_id = parse_qs(parsed.query).get('v', [None])[0]
+        elif parsed.path.startswith(('/shorts/', '/embed/')):
+            video_id = parsed.path.split('/')[2]
+    elif host.endswith('youtu.be'):
+        video_id = parsed.path.lstrip('/').split('/')[0]
+    if video_id and len(video_id) <= Post.__table__.c.video_id.type.length:
+        return video_id
+    return None
+
+
+def summarize(text, length=SUMMARY_LENGTH):
+    """Début du texte coupé entre deux mots, comme le filtre truncate de Jinja."""
+    text = ' '.join((text or '').split())
+    if len(text) <= length:
+        return text
+    return text[:length - 3].rsplit(' ', 1)[0] + '...'
+
+
+def apply_post_media(post):
+    video_id = youtube_video_id(post.video_url)
+    post.video_id = video_id
+    post.embed_url = f'https://www.youtube.com/embed/{video_id}' if video_id else None
+    post.thumbnail_url = f'https://img.youtube.com/vi/{video_id}/hqdefault.jpg' if video_id else None
+    post.summary = summarize(post.description)
+
+
+def post_cards(rows):
+    """
+    HTML des cartes des réalisations données par leurs (id, version), dans
+    l'ordre, depuis le cache si possible.
+    """
+    keys = {post_id: POST_CARD_CACHE_KEY.format(post_id, version) for post_id, version in rows}
+    cards = dict(zip(keys, cache.get_many(*keys.values()))) if keys else {}
+    missing = [post_id for post_id, html in cards.items() if html is None]
+    if missing:
+        posts = db.session.execute(
+            db.select(Post)
+            .options(load_only(Post.id, Post.version, Post.title, Post.summary, Post.cover_image,
+                               Post.thumbnail_url))
+            .filter(Post.id.in_(missing))
+        ).scalars().all()
+        rendered = {post.id: render_template('_post_card.html', post=post) for post in posts}
+        # Clé de la version relue : si la ligne a changé entre-temps, la carte ne sert qu'à cette version
+        cache.set_many({POST_CARD_CACHE_KEY.format(post.id, post.version): rendered[post.id] for post in posts},
+                       timeout=POST_CARD_CACHE_SECONDS)
+        cards.update(rendered)
+    return [Markup(cards[post_id]) for post_id in keys if cards.get(post_id)]
+
+
+@sa.event.listens_for(RoutingSession, 'before_flush')
+def _refresh_post_media(session, flush_context, instances):
+    for obj in session.new:
+        if isinstance(obj, Post):
+            apply_post_media(obj)
+    for obj in session.dirty:
+        if isinstance(obj, Post) and session.is_modified(obj, include_collections=False):
+            state = sa.inspect(obj)
+            if any(state.attrs[name].history.has_changes() for name in _MEDIA_SOURCES):
+                apply_post_media(obj)
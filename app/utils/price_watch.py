@@ -0,0 +1,112 @@
+'''
+Moteur de déclenchement de l'Achat Intelligent (veilles de prix).
+
+Quand le prix d'un produit change (édition dans l'administration, ou mise à
+jour en masse qui appelle `evaluate_price_watches`), les veilles actives de ce
+produit dont le prix souhaité est atteint sont trouvées par une seule requête
+sur l'index (product_id, status, desired_price), passées à 'triggered' en une
+seule requête, et reçoivent chacune une réservation limitée dans le temps ainsi
+qu'une notification mise en file d'attente. Le coût dépend donc du nombre de
+veilles déclenchées, pas du nombre total de veilles.
+
+`expire_reservations` (lancée par `flask expire-reservations`) clôt les
+réservations arrivées à échéance.
+'''
+from datetime import datetime, timedelta, timezone
+import sqlalchemy as sa
+from flask import current_app
+from ..db_routing import RoutingSession
+from ..extensions import db
+from ..models import Product, SmartShopping, SmartShoppingReservation
+from .metrics import metrics
+from .notifications import enqueue_notifications, PRICE_DROP
+
+# Marqueur posé dans Session.info : {product_id: nouveau prix} des produits modifiés
+PRICE_CHANGES_INFO_KEY = 'product_price_changes'
+
+
+def _utcnow():
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def evaluate_price_watches(new_prices, session=None, now=None):
+    """
+    Déclenche les veilles atteintes pour des prix {product_id: prix}. À appeler
+    dans la transaction qui modifie les prix ; retourne le nombre de veilles
+    déclenchées.
+    """
+    session = session or db.session
+    now = now or _utcnow()
+    expires_at = now + timedelta(hours=current_app.config['SMART_SHOPPING_RESERVATION_HOURS'])
+    triggered = []
+    for product_id, price in new_prices.items():
+        rows = session.execute(
+            sa.update(SmartShopping)
+            .where(SmartShopping.product_id == product_id,
+                   SmartShopping.status == 'active',
+                   SmartShopping.desired_price >= price)
+            .values(status='triggered', triggered_at=now)
+            .returning(SmartShopping.id, SmartShopping.customer_id)
+            .execution_options(synchronize_session=False)
+        ).all()
+        triggered.extend((watch_id, customer_id, product_id, price) for watch_id, customer_id in rows)
+    if not triggered:
+        return 0
+
+    session.execute(sa.insert(SmartShoppingReservation), [
+        {'smart_shopping_id': watch_id, 'reserved_at': now, 'expires_at': expires_at, 'status': 'active'}
+        for watch_id, _, _, _ in triggered
+    ])
+    enqueue_notifications([
+        {'customer_id': customer_id, 'kind': PRICE_DROP, 'product_id': product_id, 'price': price}
+        for _, customer_id, product_id, price in triggered
+    ], session=session)
+    metrics.incr('price_watches_triggered', len(triggered))
+    return len(triggered)
+
+
+def count_price_watches_reached(new_prices, session=None):
+    """Nombre de veilles actives qu'atteindraient ces prix {product_id: prix}, sans rien modifier (simulation)."""
+    if not new_prices:
+        return 0
+    session = session or db.session
+    return session.execute(
+        sa.select(sa.func.count(SmartShopping.id))
+        .where(SmartShopping.status == 'active',
+               sa.or_(*(sa.and_(SmartShopping.product_id == product_id, SmartShopping.desired_price >= price)
+                        for product_id, price in new_prices.items())))
+    ).scalar()
+
+
+def expire_reservations(now=None):
+    """Passe à 'expired' les réservations actives échues ; retourne leur nombre."""
+    result = db.session.execute(
+        sa.update(SmartShoppingReservation)
+        .where(SmartShoppingReservation.status == 'active',
+               SmartShoppingReservation.expires_at < (now or _utcnow()))
+        .values(status='expired')
+        .execution_options(synchronize_session=False)
+    )
+    db.session.commit()
+    metrics.incr('price_reservations_expired', result.rowcount)
+    return result.rowcount
+
+
+@sa.event.listens_for(RoutingSession, 'before_flush')
+def _collect_price_changes(session, flush_context, instances):
+    for obj in session.dirty:
+        if isinstance(obj, Product) and sa.inspect(obj).attrs.price.history.has_changes():
+            session.info.setdefault(PRICE_CHANGES_INFO_KEY, {})[obj.id] = obj.price
+
+
+@sa.event.listens_for(RoutingSession, 'before_commit')
+def _trigger_price_watches(session):
+    session.flush()
+    new_prices = session.info.pop(PRICE_CHANGES_INFO_KEY, None)
+    if new_prices:
+        evaluate_price_watches(new_prices, session=session)
+
+
+@sa.event.listens_for(RoutingSession, 'after_rollback')
+def _forget_price_changes(session):
+    session.info.pop(PRICE_CHANGES_INFO_KEY, None)
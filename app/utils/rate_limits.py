@@ -0,0 +1,110 @@
+'''
+Protection des points d'entrée coûteux en CPU (bcrypt) contre les rafales de
+requêtes, par exemple lors d'une attaque par bourrage d'identifiants.
+
+- Les limites par IP et par nom d'utilisateur sont appliquées par Flask-Limiter
+  (voir `limiter` dans extensions.py). Le stockage est partagé entre workers via
+  RATELIMIT_STORAGE_URI (ex. redis://...) ; par défaut `memory://`, propre à
+  chaque processus, suffit en développement.
+- Les calculs bcrypt d'un worker passent par un nombre limité de créneaux
+  (BCRYPT_MAX_CONCURRENT) : au-delà, la requête échoue en 503 au lieu de
+  saturer le CPU et de bloquer toutes les autres pages.
+'''
+import threading
+from flask import request, current_app, render_template
+from flask_login import current_user
+from werkzeug.exceptions import ServiceUnavailable
+from .metrics import metrics
+
+# Limites par défaut, surchargeables dans la configuration de l'application
+DEFAULT_LIMITS = {
+    'RATELIMIT_LOGIN_IP': '20 per minute;100 per hour',
+    'RATELIMIT_LOGIN_USERNAME': '5 per minute;30 per hour',
+    'RATELIMIT_REGISTER_IP': '5 per minute;20 per hour',
+    'RATELIMIT_PASSWORD_IP': '5 per minute;20 per hour',
+    'RATELIMIT_PASSWORD_USER': '5 per minute',
+    'RATELIMIT_FORM_IP': '5 per minute;50 per day',
+}
+
+
+def client_ip():
+    """
+    Adresse IP du client. X-Forwarded-For n'est jamais lu ici : le client peut
+    le forger. Derrière des proxys de confiance (routeur Heroku...), ProxyFix
+    (voir TRUSTED_PROXY_COUNT dans create_app) remplace remote_addr par
+    l'adresse ajoutée par le dernier d'entre eux.
+    """
+    return request.remote_addr or '127.0.0.1'
+
+
+def username_key():
+    """Clé de limitation par nom d'utilisateur saisi (formulaire de connexion)."""
+    username = (request.form.get('username') or '').strip().lower()
+    return f'username:{username}'
+
+
+def current_user_key():
+    """Clé de limitation par compte connecté (changement de mot de passe)."""
+    if current_user.is_authenticated:
+        return f'user:{current_user.get_id()}'
+    return f'ip:{client_ip()}'
+
+
+def limit_from_config(name):
+    """Retourne une fonction lisant la limite `name` dans la configuration (évaluée à chaque requête)."""
+    return lambda: current_app.config.get(name, DEFAULT_LIMITS[name])
+
+
+def record_breach(request_limit):
+    """Callback Flask-Limiter : comptabilise et journalise chaque requête rejetée."""
+    metrics.incr('rate_limit_rejections', endpoint=request.endpoint or 'unknown',
+                 limit=str(request_limit.limit))
+    current_app.logger.warning(
+        f"Limite de requêtes atteinte ({request_limit.limit}) pour {request.endpoint} "
+        f"depuis {client_ip()}"
+    )
+
+
+def rate_limit_exceeded(error):
+    """Gestionnaire d'erreur 429 : message clair pour l'utilisateur."""
+    if request.is_json:
+        return {'success': False, 'message': 'Trop de requêtes. Veuillez réessayer plus tard.'}, 429
+    return render_template('429.html'), 429
+
+
+_bcrypt_slots = None
+_bcrypt_slots_lock = threading.Lock()
+
+
+def _slots():
+    global _bcrypt_slots
+    if _bcrypt_slots is None:
+        with _bcrypt_slots_lock:
+            if _bcrypt_slots is None:
+                _bcrypt_slots = threading.BoundedSemaphore(current_app.config.get('BCRYPT_MAX_CONCURRENT', 2))
+    return _bcrypt_slots
+
+
+def _run_with_bcrypt_slot(func, *args):
+    slots = _slots()
+    if not slots.acquire(timeout=current_app.config.get('BCRYPT_SLOT_TIMEOUT', 5)):
+        metrics.incr('bcrypt_slot_timeouts', endpoint=request.endpoint or 'unknown')
+        raise ServiceUnavailable("Le service est momentanément surchargé. Veuillez réessayer.")
+    try:
+        return func(*args)
+    finally:
+        slots.release()
+
+
+def check_password_hash(pw_hash, password):
+    """bcrypt.check_password_hash, dans la limite des créneaux bcrypt du worker."""
+    from ..extensions import bcrypt
+    metrics.incr('bcrypt_operations', kind='check')
+    return _run_with_bcrypt_slot(bcrypt.check_password_hash, pw_hash, password)
+
+
+def generate_password_hash(password):
+    """bcrypt.generate_password_hash (décodé en str), dans la limite des créneaux bcrypt du worker."""
+    from ..extensions import bcrypt
+    metrics.incr('bcrypt_operations', kind='hash')
+    return _run_with_bcrypt_slot(bcrypt.generate_password_hash, password).decode('utf-8')
@@ -1,5 +1,6 @@
 from .. import db
-from ..models import Product, OrderItem
+from ..models import OrderItem
+from ..catalog_snapshot import current_catalog
 from sqlalchemy import func
 
 def get_product_recommendations(current_cart_product_ids, limit=4):
@@ -20,11 +21,5 @@ def get_product_recommendations(current_cart_product_ids, limit=4):
         ~OrderItem.product_id.in_(current_cart_product_ids) # Exclure les produits déjà dans le panier
     ).group_by(OrderItem.product_id).order_by(func.count(OrderItem.product_id).desc()).limit(limit).all()
 
-    # Récupérer les objets Product pour les IDs recommandés
-    recommendations = []
-    for product_id, count in recommended_product_ids:
-        product = db.session.get(Product, product_id)
-        if product:
-            recommendations.append(product)
-    
-    return recommendations
+    # Produits lus dans l'instantané du catalogue (les produits supprimés sont ignorés)
+    return current_catalog().products_by_ids(product_id for product_id, count in recommended_product_ids)
@@ -0,0 +1,143 @@
+'''
+Notifications de retour en stock des produits des listes de souhaits.
+
+Quand le stock d'un produit passe de 0 à une valeur positive (édition dans
+l'administration, import), un `restock_event` est enregistré dans la même
+transaction : la sauvegarde ne fait rien de plus. Le worker de notifications
+diffuse ensuite l'événement en arrière-plan : une seule requête INSERT ...
+SELECT crée une notification pour chaque client qui suit le produit (index
+ix_wishlist_item_product_id), sauf s'il a déjà été prévenu pour ce produit
+pendant RESTOCK_NOTIFICATION_COOLDOWN_HOURS.
+'''
+from datetime import datetime, timedelta, timezone
+import sqlalchemy as sa
+from flask import current_app
+from sqlalchemy.orm import aliased
+from ..db_routing import RoutingSession
+from ..extensions import db
+from ..models import CustomerNotification, Product, RestockEvent, WishlistItem
+from .metrics import metrics
+from .notifications import BACK_IN_STOCK, NOTIFICATIONS_PENDING_INFO_KEY
+
+# Marqueur posé dans Session.info : identifiants des produits revenus en stock
+RESTOCKED_INFO_KEY = 'restocked_products'
+
+
+def _utcnow():
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def _was_restocked(product):
+    history = sa.inspect(product).attrs.stock.history
+    if not history.deleted or not history.added:
+        return False
+    previous, current = history.deleted[0], history.added[0]
+    return (previous or 0) <= 0 and (current or 0) > 0
+
+
+def record_restocks(product_ids, session=None):
+    """Enregistre des retours en stock (à appeler par les mises à jour en masse du stock)."""
+    product_ids = sorted(set(product_ids))
+    if not product_ids:
+        return 0
+    session = session or db.session
+    now = _utcnow()
+    session.execute(sa.insert(RestockEvent), [{'product_id': product_id, 'created_at': now}
+                                              for product_id in product_ids])
+    session.info[NOTIFICATIONS_PENDING_INFO_KEY] = True
+    return len(product_ids)
+
+
+def fan_out_restock(product_id, now=None, session=None):
+    """Crée les notifications de retour en stock d'un produit ; retourne leur nombre."""
+    session = session or db.session
+    now = now or _utcnow()
+    cooldown_start = now - timedelta(hours=current_app.config['RESTOCK_NOTIFICATION_COOLDOWN_HOURS'])
+    # Alias : la sous-requête ne doit pas être corrélée à la table de l'INSERT
+    previous = aliased(CustomerNotification)
+    recently_notified = (
+        sa.select(previous.id)
+        .where(previous.customer_id == WishlistItem.customer_id,
+               previous.product_id == WishlistItem.product_id,
+               previous.kind == BACK_IN_STOCK,
+               previous.created_at > cooldown_start)
+        .correlate(WishlistItem)
+        .exists()
+    )
+    recipients = (
+        sa.select(WishlistItem.customer_id, WishlistItem.product_id,
+                  sa.literal(BACK_IN_STOCK), sa.literal(now))
+        .where(WishlistItem.product_id == product_id, ~recently_notified)
+    )
+    result = session.execute(
+        sa.insert(CustomerNotification)
+        .from_select(['customer_id', 'product_id', 'kind', 'created_at'], recipients)
+    )
+    return result.rowcount
+
+
+def process_restock_events(limit=20, now=None):
+    """
+    Diffuse les retours en stock en attente, un produit à la fois. Plusieurs
+    événements non traités pour un même produit sont diffusés une seule fois.
+    Retourne le nombre de produits traités.
+    """
+    product_ids = db.session.execute(
+        db.select(RestockEvent.product_id)
+        .filter(RestockEvent.processed_at.is_(None))
+        .group_by(RestockEvent.product_id)
+        .order_by(sa.func.min(RestockEvent.id))
+        .limit(limit)
+    ).scalars().all()
+    now = now or _utcnow()
+    processed = 0
+    for product_id in product_ids:
+        # Prise en charge conditionnelle : un autre processus peut traiter le même produit
+        claimed = db.session.execute(
+            sa.update(RestockEvent)
+            .where(RestockEvent.product_id == product_id, RestockEvent.processed_at.is_(None))
+            .values(processed_at=now)
+            .returning(RestockEvent.id)
+            .execution_options(synchronize_session=False)
+        ).scalars().all()
+        if not claimed:
+            db.session.rollback()
+            continue
+        # Produit supprimé ou de nouveau épuisé entre-temps : rien à annoncer
+        stock = db.session.execute(db.select(Product.stock).filter_by(id=product_id)).scalar()
+        fanout = fan_out_restock(product_id, now=now) if stock and stock > 0 else 0
+        db.session.execute(
+            sa.update(RestockEvent).where(RestockEvent.id == max(claimed)).values(fanout_count=fanout)
+            .execution_options(synchronize_session=False)
+        )
+        db.session.commit()
+        metrics.incr('restock_notifications_enqueued', fanout)
+        processed += 1
+    return processed
+
+
+@sa.event.listens_for(Product.stock, 'set', active_history=True)
+def _load_previous_stock(target, value, oldvalue, initiator):
+    # active_history : l'ancien stock est chargé avant d'être remplacé, même
+    # après un commit, pour que l'historique permette de détecter le passage de 0 à >0
+    pass
+
+
+@sa.event.listens_for(RoutingSession, 'before_flush')
+def _collect_restocks(session, flush_context, instances):
+    for obj in session.dirty:
+        if isinstance(obj, Product) and _was_restocked(obj):
+            session.info.setdefault(RESTOCKED_INFO_KEY, set()).add(obj.id)
+
+
+@sa.event.listens_for(RoutingSession, 'before_commit')
+def _record_restocks(session):
+    session.flush()
+    product_ids = session.info.pop(RESTOCKED_INFO_KEY, None)
+    if product_ids:
+        record_restocks(product_ids, session=session)
+
+
+@sa.event.listens_for(RoutingSession, 'after_rollback')
+def _forget_restocks(session):
+    session.info.pop(RESTOCKED_INFO_KEY, None)
@@ -0,0 +1,199 @@
+'''
+Table de faits des ventes : `sales_daily`, une ligne par jour (UTC) et par
+produit vendu, avec la catégorie du produit, les unités, le chiffre d'affaires
+(quantité × price_at_purchase) et le nombre de commandes.
+
+Seules les commandes finalisées (FINALIZED_STATUSES) sont comptées. Quand une
+commande entre dans un statut finalisé ou en sort (set_order_status), les
+cellules (jour, produit) de ses lignes sont recalculées juste avant le commit ;
+quand un produit change de catégorie, ses lignes suivent. Les rapports
+(`sales_rollup`) agrègent donc des jours au lieu des lignes de commande.
+
+`flask rebuild-sales-facts` recalcule toute la table.
+'''
+from collections import defaultdict
+from datetime import date, datetime, time, timedelta
+from typing import NamedTuple
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql, sqlite
+from ..db_routing import RoutingSession
+from ..extensions import db
+from ..models import Category, Order, OrderItem, OrderStatusEvent, Product, SalesDaily
+from .order_sequence import FINALIZED_STATUSES
+
+# Marqueurs posés dans Session.info : commandes et produits dont les faits sont à recalculer
+STALE_ORDERS_INFO_KEY = 'stale_sales_orders'
+RECATEGORIZED_PRODUCTS_INFO_KEY = 'recategorized_sales_products'
+
+FACT_COLUMNS = ('day', 'product_id', 'category_id', 'units', 'revenue', 'order_count')
+ROLLUPS = ('day', 'month', 'product', 'category')
+
+
+class SalesRow(NamedTuple):
+    key: object
+    label: str
+    units: int
+    revenue: float
+    order_count: int
+
+
+def _facts_select(*criteria):
+    """Agrégat des lignes de commandes finalisées par jour et par produit."""
+    day = sa.func.date(Order.date_ordered)
+    return (
+        sa.select(day, OrderItem.product_id, Product.category_id,
+                  sa.func.sum(OrderItem.quantity),
+                  sa.func.sum(OrderItem.quantity * OrderItem.price_at_purchase),
+                  sa.func.count(sa.distinct(Order.id)))
+        .join(Order, OrderItem.order_id == Order.id)
+        .join(Product, OrderItem.product_id == Product.id)
+        .where(Order.status.in_(FINALIZED_STATUSES), *criteria)
+        .group_by(day, OrderItem.product_id, Product.category_id)
+    )
+
+
+def _upsert_facts(session, select):
+    """INSERT ... SELECT qui remplace les cellules (jour, produit) déjà présentes."""
+    dialect = session.get_bind(mapper=sa.inspect(SalesDaily)).dialect.name
+    insert = {'postgresql': postgresql.insert, 'sqlite': sqlite.insert}[dialect]
+    statement = insert(SalesDaily.__table__).from_select(FACT_COLUMNS, select)
+    return statement.on_conflict_do_update(
+        index_elements=['day', 'product_id'],
+        set_={column: statement.excluded[column] for column in FACT_COLUMNS[2:]},
+    )
+
+
+def refresh_sales_facts(cells, session=None):
+    """
+    Recalcule les cellules (jour, produit_id) données (à committer par l'appelant).
+
+    Chaque cellule est écrite par un upsert sur la clé (jour, produit) : deux
+    transactions qui recalculent la même cellule se succèdent sur la ligne au
+    lieu de se disputer la clé primaire (DELETE puis INSERT). Seules les
+    cellules qui n'ont plus de ventes sont supprimées.
+    """
+    session = session or db.session
+    products_by_day = defaultdict(set)
+    for day, product_id in cells:
+        products_by_day[day].add(product_id)
+    for day, product_ids in sorted(products_by_day.items()):
+        start = datetime.combine(day, time.min)
+        facts = _facts_select(
+            Order.date_ordered >= start,
+            Order.date_ordered < start + timedelta(days=1),
+            OrderItem.product_id.in_(sorted(product_ids)),
+        )
+        session.execute(_upsert_facts(session, facts))
+        sold = sa.select(facts.subquery().c.product_id)
+        session.execute(
+            sa.delete(SalesDaily.__table__)
+            .where(SalesDaily.day == day, SalesDaily.product_id.in_(sorted(product_ids)),
+                   SalesDaily.product_id.not_in(sold))
+        )
+    return sum(len(product_ids) for product_ids in products_by_day.values())
+
+
+def recategorize_sales_facts(product_ids, session=None):
+    """Reporte la catégorie actuelle des produits donnés sur leurs lignes de ventes."""
+    session = session or db.session
+    session.execute(
+        sa.update(SalesDaily.__table__)
+        .where(SalesDaily.product_id.in_(sorted(product_ids)))
+        .values(category_id=sa.select(Product.category_id)
+                .where(Product.id == SalesDaily.product_id).scalar_subquery())
+    )
+
+
+def rebuild_sales_facts():
+    """Recalcule toute la table à partir des commandes ; retourne le nombre de lignes."""
+    db.session.execute(sa.delete(SalesDaily.__table__))
+    db.session.execute(sa.insert(SalesDaily.__table__).from_select(FACT_COLUMNS, _facts_select()))
+    db.session.commit()
+    return db.session.execute(sa.select(sa.func.count()).select_from(SalesDaily)).scalar_one()
+
+
+def sales_rollup(start, end, by='day', category_id=None, product_id=None, limit=None):
+    """
+    Ventes du jour `start` au jour `end` inclus, regroupées par jour, mois,
+    produit ou catégorie (voir ROLLUPS). Les regroupements temporels sont
+    triés par date, les autres par unités vendues décroissantes. Hors
+    regroupement par produit, `order_count` additionne les commandes de
+    chaque produit (une commande de deux produits compte deux fois).
+    """
+    if by not in ROLLUPS:
+        raise ValueError(f'Regroupement inconnu : {by}')
+    criteria = [SalesDaily.day >= start, SalesDaily.day <= end]
+    if category_id is not None:
+        criteria.append(SalesDaily.category_id == category_id)
+    if product_id is not None:
+        criteria.append(SalesDaily.product_id == product_id)
+    measures = (sa.func.sum(SalesDaily.units).label('units'),
+                sa.func.sum(SalesDaily.revenue).label('revenue'),
+                sa.func.sum(SalesDaily.order_count).label('order_count'))
+
+    if by in ('day', 'month'):
+        rows = db.session.execute(
+            sa.select(SalesDaily.day, *measures).where(*criteria)
+            .group_by(SalesDaily.day).order_by(SalesDaily.day)
+        ).all()
+        if by == 'day':
+            result = [SalesRow(day, day.isoformat(), units, revenue, order_count)
+                      for day, units, revenue, order_count in rows]
+        else:
+            # Au plus quelques centaines de jours : le regroupement par mois se fait ici
+            months = {}
+            for day, units, revenue, order_count in rows:
+                month = date(day.year, day.month, 1)
+                previous = months.get(month, (0, 0, 0))
+                months[month] = (previous[0] + units, previous[1] + revenue, previous[2] + order_count)
+            result = [SalesRow(month, month.strftime('%Y-%m'), *totals) for month, totals in months.items()]
+        return result[:limit] if limit else result
+
+    if by == 'product':
+        key, label = SalesDaily.product_id, Product.name
+        query = sa.select(key, label, *measures).join(Product, Product.id == SalesDaily.product_id)
+    else:
+        key, label = SalesDaily.category_id, Category.name
+        query = sa.select(key, label, *measures).outerjoin(Category, Category.id == SalesDaily.category_id)
+    query = query.where(*criteria).group_by(key, label).order_by(sa.desc('units'), key)
+    if limit:
+        query = query.limit(limit)
+    return [SalesRow(row_key, row_label or 'Sans catégorie', units, revenue, order_count)
+            for row_key, row_label, units, revenue, order_count in db.session.execute(query)]
+
+
+def _crosses_finalization(event):
+    return (event.from_status in FINALIZED_STATUSES) != (event.to_status in FINALIZED_STATUSES)
+
+
+@sa.event.listens_for(RoutingSession, 'before_flush')
+def _track_sales_facts(session, flush_context, instances):
+    for obj in session.new:
+        if isinstance(obj, OrderStatusEvent) and obj.order is not None and _crosses_finalization(obj):
+            session.info.setdefault(STALE_ORDERS_INFO_KEY, set()).add(obj.order)
+    for obj in session.dirty:
+        if isinstance(obj, Product) and sa.inspect(obj).attrs.category_id.history.has_changes():
+            session.info.setdefault(RECATEGORIZED_PRODUCTS_INFO_KEY, set()).add(obj.id)
+
+
+@sa.event.listens_for(RoutingSession, 'before_commit')
+def _refresh_stale_sales_facts(session):
+    session.flush()
+    orders = session.info.pop(STALE_ORDERS_INFO_KEY, None)
+    if orders:
+        # Les lignes des commandes n'existent qu'après le flush (cf. checkout)
+        rows = session.execute(
+            sa.select(Order.date_ordered, OrderItem.product_id)
+            .join(OrderItem, OrderItem.order_id == Order.id)
+            .where(Order.id.in_([order.id for order in orders]))
+        ).all()
+        refresh_sales_facts({(ordered_at.date(), product_id) for ordered_at, product_id in rows}, session=session)
+    product_ids = session.info.pop(RECATEGORIZED_PRODUCTS_INFO_KEY, None)
+    if product_ids:
+        recategorize_sales_facts(product_ids, session=session)
+
+
+@sa.event.listens_for(RoutingSession, 'after_rollback')
+def _forget_stale_sales_facts(session):
+    session.info.pop(STALE_ORDERS_INFO_KEY, None)
+    session.info.pop(RECATEGORIZED_PRODUCTS_INFO_KEY, None)
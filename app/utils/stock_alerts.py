@@ -0,0 +1,165 @@
+'''
+Alertes de stock faible tenues à jour par événement.
+
+À chaque flush, les produits dont le stock ou le seuil a changé (commande à la
+livraison, paiement confirmé, webhook, édition dans l'administration) sont
+comparés à leur seuil : une alerte est ouverte quand le stock passe sous le
+seuil, mise à jour tant qu'il y reste, et supprimée quand il remonte. Le
+tableau de bord lit donc directement la petite table `low_stock_alert`.
+
+Les nouvelles alertes sont envoyées au personnel par un récapitulatif groupé
+(`flask low-stock-digest`, à planifier) ; une alerte n'est notifiée qu'une fois
+par passage sous le seuil. Le récapitulatif liste aussi, à chaque passage tant
+que le personnel ne les a pas traitées, les commandes payées en attente de
+stock (paiement encaissé pour un stock devenu insuffisant).
+'''
+from datetime import datetime, timezone
+import sqlalchemy as sa
+from flask import current_app, render_template
+from flask_mailman import EmailMessage
+from ..db_routing import RoutingSession
+from ..extensions import db
+from ..models import LowStockAlert, Order, Product, StaffUser
+from .metrics import metrics
+from .order_sequence import PAID_AWAITING_STOCK_STATUS
+
+_WATCHED_ATTRIBUTES = ('stock', 'min_stock_threshold')
+
+
+def _utcnow():
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def is_low_stock(product):
+    return product.stock <= product.min_stock_threshold
+
+
+def _stock_changed(product):
+    state = sa.inspect(product)
+    return state.pending or any(state.attrs[name].history.has_changes() for name in _WATCHED_ATTRIBUTES)
+
+
+def _apply_column_defaults(product):
+    # Produit pas encore inséré : les valeurs par défaut des colonnes ne sont pas encore posées
+    for name in _WATCHED_ATTRIBUTES:
+        if getattr(product, name) is None:
+            setattr(product, name, Product.__table__.c[name].default.arg)
+
+
+def sync_low_stock_alert(product):
+    """Ouvre, met à jour ou ferme l'alerte du produit selon son stock actuel."""
+    if sa.inspect(product).pending:
+        _apply_column_defaults(product)
+    alert = product.low_stock_alert
+    if is_low_stock(product):
+        if alert is None:
+            product.low_stock_alert = LowStockAlert(stock=product.stock, threshold=product.min_stock_threshold)
+            metrics.incr('low_stock_alerts_opened')
+        elif (alert.stock, alert.threshold) != (product.stock, product.min_stock_threshold):
+            alert.stock = product.stock
+            alert.threshold = product.min_stock_threshold
+            alert.updated_at = _utcnow()
+    elif alert is not None:
+        product.low_stock_alert = None  # delete-orphan : la ligne est supprimée
+        metrics.incr('low_stock_alerts_closed')
+
+
+def refresh_low_stock_alerts(product_ids, session=None):
+    """
+    Équivalent ensembliste de sync_low_stock_alert pour les mises à jour en
+    masse du stock (import) : ouvre, met à jour et ferme les alertes des
+    produits donnés en trois requêtes au plus.
+    """
+    product_ids = sorted(set(product_ids))
+    if not product_ids:
+        return
+    session = session or db.session
+    rows = session.execute(
+        sa.select(Product.id, Product.stock, Product.min_stock_threshold,
+                  LowStockAlert.id, LowStockAlert.stock, LowStockAlert.threshold)
+        .outerjoin(LowStockAlert, LowStockAlert.product_id == Product.id)
+        .where(Product.id.in_(product_ids))
+    ).all()
+    now = _utcnow()
+    opened, updated, closed = [], [], []
+    for product_id, stock, threshold, alert_id, alert_stock, alert_threshold in rows:
+        if stock <= threshold:
+            if alert_id is None:
+                opened.append({'product_id': product_id, 'stock': stock, 'threshold': threshold,
+                               'created_at': now, 'updated_at': now})
+            elif (alert_stock, alert_threshold) != (stock, threshold):
+                updated.append({'id': alert_id, 'stock': stock, 'threshold': threshold, 'updated_at': now})
+        elif alert_id is not None:
+            closed.append(alert_id)
+    if opened:
+        session.execute(sa.insert(LowStockAlert), opened)
+        metrics.incr('low_stock_alerts_opened', len(opened))
+    if updated:
+        session.execute(sa.update(LowStockAlert), updated)
+    if closed:
+        session.execute(sa.delete(LowStockAlert).where(LowStockAlert.id.in_(closed))
+                        .execution_options(synchronize_session=False))
+        metrics.incr('low_stock_alerts_closed', len(closed))
+
+
+@sa.event.listens_for(RoutingSession, 'before_flush')
+def _track_stock_changes(session, flush_context, instances):
+    products = [obj for obj in list(session.new) + list(session.dirty)
+                if isinstance(obj, Product) and _stock_changed(obj)]
+    if not products:
+        return
+    with session.no_autoflush:
+        for product in products:
+            sync_low_stock_alert(product)
+
+
+def digest_recipients():
+    """Adresses des administrateurs, sauf si LOW_STOCK_DIGEST_RECIPIENTS est défini."""
+    configured = current_app.config.get('LOW_STOCK_DIGEST_RECIPIENTS')
+    if configured:
+        return list(configured)
+    return list(db.session.execute(db.select(StaffUser.email).filter_by(role='admin')).scalars())
+
+
+def send_low_stock_digest(now=None):
+    """
+    Envoie en un seul e-mail les alertes pas encore notifiées et les commandes
+    payées en attente de stock, puis marque les alertes. Retourne le nombre
+    d'alertes et de commandes envoyées ; en cas d'échec de l'envoi, elles
+    restent en attente pour le prochain passage.
+    """
+    alerts = db.session.execute(
+        db.select(LowStockAlert).options(db.joinedload(LowStockAlert.product))
+        .filter(LowStockAlert.notified_at.is_(None))
+        .order_by(LowStockAlert.stock, LowStockAlert.id)
+    ).scalars().all()
+    awaiting_orders = db.session.execute(
+        db.select(Order).filter_by(status=PAID_AWAITING_STOCK_STATUS).order_by(Order.id)
+    ).scalars().all()
+    if not alerts and not awaiting_orders:
+        return 0
+    recipients = digest_recipients()
+    if not recipients:
+        current_app.logger.warning("Récapitulatif de stock faible non envoyé : aucun destinataire.")
+        return 0
+
+    subject = f"Stock faible : {len(alerts)} produit(s) à réapprovisionner"
+    if awaiting_orders:
+        subject += f", {len(awaiting_orders)} commande(s) payée(s) en attente de stock"
+    msg = EmailMessage(subject=subject,
+                       body=render_template('low_stock_digest.html', alerts=alerts, awaiting_orders=awaiting_orders),
+                       from_email=current_app.config['MAIL_DEFAULT_SENDER'],
+                       to=recipients)
+    msg.content_subtype = "html"
+    msg.send()
+
+    if alerts:
+        db.session.execute(
+            sa.update(LowStockAlert)
+            .where(LowStockAlert.id.in_([alert.id for alert in alerts]))
+            .values(notified_at=now or _utcnow())
+            .execution_options(synchronize_session=False)
+        )
+        db.session.commit()
+    metrics.incr('low_stock_digest_alerts', len(alerts))
+    return len(alerts) + len(awaiting_orders)
@@ -0,0 +1,105 @@
+'''
+Rendu HTML en flux pour les pages lourdes de la boutique.
+
+`stream_page()` remplace `render_template()` dans les vues concernées : la
+page est envoyée par morceaux pendant le rendu du template (`stream_template`
+de Flask), au lieu d'être assemblée entièrement avant le premier octet. Les
+templates marquent par `{{ flush_point() }}` les endroits où le début de page
+doit partir tout de suite (le <head> et la barre de navigation, pour que le
+navigateur commence à charger CSS, JS et images) ; entre deux points, les
+morceaux sont regroupés jusqu'à STREAM_CHUNK_BYTES caractères.
+
+Pour que le premier morceau parte avant les requêtes lentes, la vue ne les
+exécute pas elle-même : elle passe au template des valeurs `deferred(...)`,
+calculées quand le rendu les atteint (avis, bannières...).
+
+Les en-têtes, le cookie de session et les cookies posés par les hooks
+after_request (ex. `set_session_cookie`) sont envoyés avant le corps : tout
+ce qui, pendant le rendu, écrirait dans la session est donc fait avant le
+premier octet (jeton CSRF, messages flash consommés, utilisateur chargé
+depuis le cookie « se souvenir de moi »). Une erreur pendant le rendu ne peut
+plus produire une page 500 : elle est journalisée et la réponse interrompue.
+
+STREAM_TEMPLATES=0 revient au rendu en un bloc (flush_point() n'écrit alors rien).
+'''
+from functools import partial
+from flask import Response, current_app, g, get_flashed_messages, render_template, stream_template
+from flask_login import current_user
+from flask_wtf.csrf import generate_csrf
+from markupsafe import Markup
+from werkzeug.local import LocalProxy
+from .metrics import metrics
+
+# Marqueur émis par flush_point() pendant un rendu en flux, retiré de la réponse
+FLUSH_MARKER = Markup('\x00flush\x00')
+STREAMING_FLAG_KEY = '_streaming_render'
+_UNSET = object()
+
+
+def init_streaming(app):
+    app.config.setdefault('STREAM_CHUNK_BYTES', 8192)
+    app.add_template_global(flush_point)
+
+
+def flush_point():
+    """Point d'envoi immédiat du début de page (sans effet hors rendu en flux)."""
+    return FLUSH_MARKER if g.get(STREAMING_FLAG_KEY) else ''
+
+
+class _Deferred:
+    def __init__(self, f):
+        self._f = f
+        self._value = _UNSET
+
+    def __call__(self):
+        if self._value is _UNSET:
+            self._value = self._f()
+        return self._value
+
+
+def deferred(f, *args, **kwargs):
+    """Valeur de template calculée au premier accès pendant le rendu, puis mémorisée."""
+    return LocalProxy(_Deferred(partial(f, *args, **kwargs)))
+
+
+def _prepare_session():
+    # Écritures en session que le rendu ferait trop tard, une fois les en-têtes envoyés
+    if current_app.config.get('WTF_CSRF_ENABLED', True):
+        generate_csrf()
+    get_flashed_messages()
+    current_user._get_current_object()
+
+
+def _chunks(pieces, chunk_size, template_name, logger):
+    buffer, size = [], 0
+    try:
+        for piece in pieces:
+            *flushed, piece = piece.split(FLUSH_MARKER)
+            for part in flushed:
+                buffer.append(part)
+                if any(buffer):
+                    yield ''.join(buffer)
+                    metrics.incr('template_stream_flushes', template=template_name)
+                buffer, size = [], 0
+            buffer.append(piece)
+            size += len(piece)
+            if size >= chunk_size:
+                yield ''.join(buffer)
+                buffer, size = [], 0
+        if buffer:
+            yield ''.join(buffer)
+    except Exception:
+        logger.exception('Rendu en flux de %s interrompu', template_name)
+        raise
+
+
+def stream_page(template_name, **context):
+    """Comme render_template, mais envoie la page au fil du rendu (voir le docstring du module)."""
+    if not current_app.config['STREAM_TEMPLATES']:
+        return render_template(template_name, **context)
+    _prepare_session()
+    setattr(g, STREAMING_FLAG_KEY, True)
+    metrics.incr('template_streams', template=template_name)
+    pieces = stream_template(template_name, **context)
+    return Response(_chunks(pieces, current_app.config['STREAM_CHUNK_BYTES'], template_name, current_app.logger),
+                    mimetype='text/html')
@@ -0,0 +1,144 @@
+'''
+Versions des lignes du catalogue et version globale du catalogue.
+
+Les modèles qui héritent de CatalogVersionedMixin (produits, catégories,
+images, avis, bannières, réalisations, pages) voient leur colonne `version`
+incrémentée et leur `updated_at` mis à jour à chaque UPDATE ORM. Toute
+transaction qui crée, modifie ou supprime une ligne du catalogue (produits,
+catégories, images, avis ; pas les contenus éditoriaux, dont le modèle a
+`bumps_catalog_version = False`) fait aussi avancer la version globale du
+catalogue (table catalog_version, une seule ligne), juste avant le commit :
+ce compteur sert d'empreinte du catalogue pour les ETags de l'API et
+l'invalidation des caches. Il a sa propre table pour qu'un paiement qui
+décrémente le stock ne verrouille pas la ligne des compteurs de commandes
+(order_sequence) pendant le reste de sa transaction.
+
+Pour valider un cache sans relire les données : `row_etag()` (une ligne),
+`last_modified()` (une table, ex. lastmod du sitemap) et `changed_since()`
+(lignes créées ou modifiées depuis une date, pour une synchronisation
+incrémentale ; les suppressions n'y apparaissent pas).
+
+Les UPDATE en masse (`sa.update(Product)...`) ne passent pas par ces hooks :
+ils doivent renseigner `version` et `updated_at` et appeler
+`bump_catalog_version()` eux-mêmes.
+'''
+import hashlib
+from datetime import datetime, timezone
+import sqlalchemy as sa
+from flask import request
+from sqlalchemy.exc import IntegrityError
+from .db_routing import RoutingSession
+from .extensions import db
+from .models import CatalogVersion, CatalogVersionedMixin
+
+CATALOG_VERSION_ROW_ID = 1
+# Marqueur posé dans Session.info quand la transaction a modifié le catalogue
+CATALOG_CHANGED_INFO_KEY = 'catalog_changed'
+# Marqueur posé quand le compteur a avancé, consommé après le commit (catalog_snapshot.py)
+CATALOG_BUMPED_INFO_KEY = 'catalog_version_bumped'
+
+
+def catalog_version():
+    """Version globale actuelle du catalogue (0 si elle n'a jamais avancé)."""
+    value = db.session.execute(
+        sa.select(CatalogVersion.value).where(CatalogVersion.id == CATALOG_VERSION_ROW_ID)).scalar()
+    return value or 0
+
+
+def _increment(session):
+    stmt = (sa.update(CatalogVersion)
+            .where(CatalogVersion.id == CATALOG_VERSION_ROW_ID)
+            .values(value=CatalogVersion.value + 1)
+            .returning(CatalogVersion.value)
+            .execution_options(synchronize_session=False))
+    return session.execute(stmt).scalar()
+
+
+def bump_catalog_version(session=None):
+    """Fait avancer la version globale ; la ligne reste verrouillée jusqu'à la fin de la transaction."""
+    session = session or db.session
+    session.info[CATALOG_BUMPED_INFO_KEY] = True
+    value = _increment(session)
+    if value is None:
+        # Ligne absente (base créée sans la migration) : on la crée puis on réessaie
+        try:
+            with session.begin_nested():
+                session.add(CatalogVersion(id=CATALOG_VERSION_ROW_ID, value=0))
+        except IntegrityError:
+            pass  # Créée entre-temps par une autre transaction
+        value = _increment(session)
+    return value
+
+
+def make_etag(*parts):
+    """ETag faible construit à partir des éléments qui déterminent la réponse."""
+    digest = hashlib.sha1('|'.join(str(part) for part in parts).encode()).hexdigest()[:20]
+    return digest
+
+
+def etag_matches(etag):
+    """Vrai si le client possède déjà cette version (If-None-Match)."""
+    return request.if_none_match.contains_weak(etag)
+
+
+def _utcnow():
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def _as_utc(value):
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+def row_etag(obj, *parts):
+    """ETag d'une ligne versionnée : table, clé primaire, version (et éléments de réponse en plus)."""
+    identity = sa.inspect(obj).identity
+    return make_etag(obj.__tablename__, *identity, obj.version, *parts)
+
+
+def last_modified(model, *criteria):
+    """Date de la dernière modification d'une table versionnée (None si vide)."""
+    return db.session.execute(sa.select(sa.func.max(model.updated_at)).where(*criteria)).scalar()
+
+
+def modified_after(model, since):
+    """Critère SQL : lignes créées ou modifiées après `since` (date naïve UTC ou avec fuseau)."""
+    return model.updated_at > _as_utc(since)
+
+
+def changed_since(model, since, *criteria):
+    """Requête des lignes créées ou modifiées après `since`, de la plus ancienne à la plus récente."""
+    primary_key = sa.inspect(model).primary_key
+    return sa.select(model).where(modified_after(model, since), *criteria).order_by(model.updated_at, *primary_key)
+
+
+def _bumps_catalog(obj):
+    return isinstance(obj, CatalogVersionedMixin) and obj.bumps_catalog_version
+
+
+@sa.event.listens_for(RoutingSession, 'before_flush')
+def _bump_row_versions(session, flush_context, instances):
+    changed = any(_bumps_catalog(obj) for obj in list(session.new) + list(session.deleted))
+    for obj in session.dirty:
+        if isinstance(obj, CatalogVersionedMixin) and session.is_modified(obj, include_collections=False):
+            obj.version = (obj.version or 0) + 1
+            obj.updated_at = _utcnow()
+            changed = changed or obj.bumps_catalog_version
+    if changed:
+        session.info[CATALOG_CHANGED_INFO_KEY] = True
+
+
+@sa.event.listens_for(RoutingSession, 'before_commit')
+def _bump_catalog_version(session):
+    # Le flush final du commit a lieu après cet événement : on l'anticipe pour
+    # connaître toutes les modifications de la transaction.
+    session.flush()
+    if session.info.pop(CATALOG_CHANGED_INFO_KEY, False):
+        bump_catalog_version(session)
+
+
+@sa.event.listens_for(RoutingSession, 'after_rollback')
+def _forget_catalog_changes(session):
+    session.info.pop(CATALOG_CHANGED_INFO_KEY, None)
+    session.info.pop(CATALOG_BUMPED_INFO_KEY, None)
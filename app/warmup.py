@@ -0,0 +1,56 @@
+'''
+Préchauffage de l'application avant le fork des workers gunicorn.
+
+Avec `preload_app = True` (voir gunicorn.conf.py), l'application est créée une
+seule fois dans le processus maître : les templates compilés et les modules
+importés sont ensuite partagés par tous les workers (copy-on-write), ce qui
+réduit le temps de démarrage à chaque déploiement ou montée en charge.
+'''
+from sqlalchemy import text
+from .extensions import db
+
+
+def compile_templates(app):
+    """Compile tous les templates Jinja2 dans le cache de l'environnement. Retourne le nombre compilé."""
+    compiled = 0
+    for name in app.jinja_env.list_templates():
+        if not name.endswith('.html'):
+            continue
+        try:
+            app.jinja_env.get_template(name)
+            compiled += 1
+        except Exception as e:
+            app.logger.warning(f"Préchauffage : impossible de compiler le template {name} : {e}")
+    return compiled
+
+
+def prime_database(app):
+    """
+    Crée le moteur SQLAlchemy et vérifie la connexion, puis ferme les connexions
+    ouvertes : les sockets ne doivent pas être partagées entre processus forkés.
+    """
+    with app.app_context():
+        with db.engine.connect() as connection:
+            connection.execute(text('SELECT 1'))
+        db.engine.dispose()
+
+
+def warmup_app(app):
+    """Préchauffe l'application dans le processus maître (templates, moteur de base de données)."""
+    count = compile_templates(app)
+    try:
+        prime_database(app)
+    except Exception as e:
+        app.logger.warning(f"Préchauffage : base de données injoignable : {e}")
+    app.logger.info(f"Préchauffage terminé : {count} templates compilés.")
+
+
+def init_worker_pool(app):
+    """
+    À appeler dans chaque worker après le fork : abandonne les connexions héritées
+    du maître sans les fermer, puis ouvre la première connexion du pool du worker.
+    """
+    with app.app_context():
+        db.engine.dispose(close=False)
+        with db.engine.connect() as connection:
+            connection.execute(text('SELECT 1'))
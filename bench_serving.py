@@ -0,0 +1,149 @@
+'''
+Banc d'essai du profil de service : lance gunicorn avec différentes combinaisons
+workers x threads et mesure le débit et la latence des pages de la boutique.
+
+Usage :
+    python bench_serving.py --workers 1 2 4 --threads 1 4 8 --duration 15 --clients 32
+    python bench_serving.py --worker-class eventlet --workers 1 2 --connections 50 100
+
+Les variables d'environnement habituelles (DATABASE_URL, SECRET_KEY...) sont
+transmises à gunicorn : lancer le banc contre une copie de la base de production.
+'''
+import os
+import sys
+import csv
+import time
+import socket
+import argparse
+import itertools
+import statistics
+import subprocess
+import threading
+import requests
+
+DEFAULT_PATHS = ['/', '/produits', '/produits?sort_by=price_asc', '/realisations', '/contact']
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def _wait_ready(url, timeout=60):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            requests.get(url, timeout=2, allow_redirects=False)
+            return True
+        except requests.RequestException:
+            time.sleep(0.3)
+    return False
+
+
+def start_server(worker_class, workers, threads, connections, port):
+    """Démarre gunicorn avec le profil demandé (via les variables lues par gunicorn.conf.py)."""
+    env = dict(os.environ,
+               WEB_WORKER_CLASS=worker_class,
+               WEB_CONCURRENCY=str(workers),
+               WEB_THREADS=str(threads),
+               WEB_WORKER_CONNECTIONS=str(connections))
+    return subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', 'wsgi:app', '--bind', f'127.0.0.1:{port}', '--log-level', 'warning'],
+        cwd=os.path.dirname(os.path.abspath(__file__)), env=env
+    )
+
+
+def run_load(base_url, paths, clients, duration):
+    """Envoie des requêtes en boucle depuis `clients` threads pendant `duration` secondes."""
+    latencies = []
+    errors = [0]
+    lock = threading.Lock()
+    stop_at = time.perf_counter() + duration
+
+    def client(offset):
+        session = requests.Session()
+        # Talisman redirige vers HTTPS : on se présente comme derrière le routeur Heroku
+        session.headers['X-Forwarded-Proto'] = 'https'
+        for path in itertools.islice(itertools.cycle(paths), offset, None):
+            if time.perf_counter() >= stop_at:
+                break
+            start = time.perf_counter()
+            try:
+                response = session.get(base_url + path, timeout=30)
+                ok = response.status_code < 500
+            except requests.RequestException:
+                ok = False
+            elapsed = time.perf_counter() - start
+            with lock:
+                if ok:
+                    latencies.append(elapsed)
+                else:
+                    errors[0] += 1
+
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(clients)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    latencies.sort()
+    count = len(latencies)
+    return {
+        'requests': count,
+        'errors': errors[0],
+        'rps': count / duration,
+        'p50_ms': statistics.median(latencies) * 1000 if latencies else 0,
+        'p95_ms': latencies[int(count * 0.95) - 1] * 1000 if count >= 20 else 0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare des combinaisons workers x threads de gunicorn.")
+    parser.add_argument('--worker-class', choices=['gthread', 'eventlet'], default='gthread')
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4])
+    parser.add_argument('--threads', type=int, nargs='+', default=[1, 4, 8])
+    parser.add_argument('--connections', type=int, nargs='+', default=[100],
+                        help="Connexions par worker (eventlet uniquement).")
+    parser.add_argument('--clients', type=int, default=32, help="Nombre de clients simultanés.")
+    parser.add_argument('--duration', type=int, default=15, help="Durée de chaque mesure, en secondes.")
+    parser.add_argument('--paths', nargs='+', default=DEFAULT_PATHS)
+    parser.add_argument('--csv', help="Fichier CSV où enregistrer les résultats.")
+    args = parser.parse_args()
+
+    if args.worker_class == 'eventlet':
+        combos = [(w, 1, c) for w in args.workers for c in args.connections]
+    else:
+        combos = [(w, t, 100) for w in args.workers for t in args.threads]
+
+    results = []
+    print(f"{'workers':>7} {'threads':>7} {'conn':>5} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'erreurs':>7}")
+    for workers, threads, connections in combos:
+        port = _free_port()
+        server = start_server(args.worker_class, workers, threads, connections, port)
+        base_url = f'http://127.0.0.1:{port}'
+        try:
+            if not _wait_ready(base_url + '/'):
+                print(f"Le serveur ({workers}x{threads}) n'a pas démarré.")
+                continue
+            run_load(base_url, args.paths, args.clients, 2)  # échauffement
+            stats = run_load(base_url, args.paths, args.clients, args.duration)
+        finally:
+            server.terminate()
+            server.wait(timeout=30)
+        row = dict(worker_class=args.worker_class, workers=workers, threads=threads,
+                   connections=connections, **stats)
+        results.append(row)
+        print(f"{workers:>7} {threads:>7} {connections:>5} {stats['rps']:>8.1f} "
+              f"{stats['p50_ms']:>8.1f} {stats['p95_ms']:>8.1f} {stats['errors']:>7}")
+
+    if args.csv and results:
+        with open(args.csv, 'w', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=list(results[0].keys()))
+            writer.writeheader()
+            writer.writerows(results)
+        print(f"Résultats enregistrés dans {args.csv}")
+
+
+if __name__ == "__main__":
+    main()
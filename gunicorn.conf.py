@@ -0,0 +1,39 @@
+# Configuration gunicorn, chargée automatiquement par `gunicorn wsgi:app` (voir Procfile).
+# Le profil (type de worker, nombre de workers et de threads) est lu depuis l'environnement :
+# voir app/serving.py pour la liste des variables.
+from app.serving import serving_profile
+
+_profile = serving_profile()
+
+worker_class = _profile['worker_class']
+workers = _profile['workers']
+threads = _profile['threads']
+worker_connections = _profile['worker_connections']
+timeout = _profile['timeout']
+graceful_timeout = 20
+keepalive = 5
+
+# L'application est créée une seule fois dans le maître puis partagée par les workers.
+# Avec eventlet, le monkey-patching doit précéder l'import de l'application : pas de préchargement.
+preload_app = worker_class != 'eventlet'
+
+
+def when_ready(server):
+    """Préchauffe l'application préchargée avant de forker les workers."""
+    if not preload_app:
+        return
+    from wsgi import app
+    from app.warmup import warmup_app
+    warmup_app(app)
+
+
+def post_fork(server, worker):
+    """Chaque worker repart d'un pool de connexions qui lui est propre."""
+    if not preload_app:
+        return
+    from wsgi import app
+    from app.warmup import init_worker_pool
+    try:
+        init_worker_pool(app)
+    except Exception as e:
+        worker.log.warning(f"Impossible d'initialiser le pool de connexions : {e}")
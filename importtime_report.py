@@ -0,0 +1,70 @@
+'''
+Rapport des temps d'import au démarrage de l'application (python -X importtime).
+
+Usage : python importtime_report.py [--top 25]
+
+Le même rapport est utilisé par tests/test_import_time.py pour vérifier que les
+modules lourds (stripe, openpyxl, cloudinary, PIL) ne sont pas chargés au
+démarrage d'un worker. pytz n'est pas vérifié : flask_wtf le charge déjà via babel.
+'''
+import os
+import sys
+import argparse
+import subprocess
+
+# Modules chargés uniquement par les vues qui en ont besoin (import différé)
+HEAVY_MODULES = ('stripe', 'openpyxl', 'cloudinary', 'PIL')
+
+STARTUP_CODE = (
+    "from app import create_app; "
+    "create_app({'TESTING': True, 'SQLALCHEMY_DATABASE_URI': 'sqlite:///:memory:'})"
+)
+
+
+def measure_imports(code=STARTUP_CODE, cwd=None):
+    """
+    Exécute `code` dans un interpréteur avec -X importtime et retourne la liste
+    des imports sous forme de tuples (module, self_us, cumulative_us).
+    """
+    cwd = cwd or os.path.dirname(os.path.abspath(__file__))
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', code],
+        cwd=cwd, capture_output=True, text=True, check=True
+    )
+    imports = []
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|', 2)
+        imports.append((name.strip(), int(self_us), int(cumulative_us)))
+    return imports
+
+
+def heavy_modules_loaded(imports):
+    """Retourne les modules lourds (ou leurs sous-modules) présents dans le rapport."""
+    loaded = set()
+    for name, _, _ in imports:
+        root = name.split('.')[0]
+        if root in HEAVY_MODULES:
+            loaded.add(root)
+    return sorted(loaded)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Mesure le temps d'import au démarrage de l'application.")
+    parser.add_argument("--top", type=int, default=25, help="Nombre de modules à afficher.")
+    args = parser.parse_args()
+
+    imports = measure_imports()
+    # Les modules de premier niveau (sans indentation) donnent le coût total
+    total_us = sum(cumulative for name, _, cumulative in imports if '.' not in name)
+    print(f"Modules importés : {len(imports)}")
+    print(f"{'cumulé (ms)':>12} {'propre (ms)':>12}  module")
+    for name, self_us, cumulative_us in sorted(imports, key=lambda i: i[2], reverse=True)[:args.top]:
+        print(f"{cumulative_us / 1000:>12.1f} {self_us / 1000:>12.1f}  {name}")
+
+    heavy = heavy_modules_loaded(imports)
+    if heavy:
+        print(f"\nAttention : modules lourds chargés au démarrage : {', '.join(heavy)}")
+        sys.exit(1)
+    print("\nAucun module lourd chargé au démarrage.")
@@ -0,0 +1,60 @@
+"""Add version and updated_at to catalog tables
+
+Revision ID: 7d2a9f5c1e86
+Revises: 6c1f8e4b0d75
+Create Date: 2026-10-19 12:25:27.405565
+
+"""
+from datetime import datetime, timezone
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7d2a9f5c1e86'
+down_revision = '6c1f8e4b0d75'
+branch_labels = None
+depends_on = None
+
+# Tables qui n'avaient pas encore de colonne version
+NEW_VERSIONED_TABLES = ('banner', 'page_content', 'post')
+# Table -> date connue la plus proche d'une dernière modification (sinon : date de la migration)
+UPDATED_AT_TABLES = {
+    'banner': 'created_at',
+    'category': None,
+    'page_content': None,
+    'post': 'created_at',
+    'product': None,
+    'product_image': None,
+    'review': 'date_posted',
+}
+
+
+def upgrade():
+    for table in NEW_VERSIONED_TABLES:
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            batch_op.add_column(sa.Column('version', sa.Integer(), server_default='1', nullable=False))
+
+    # updated_at est ajoutée vide, remplie pour les lignes existantes, puis rendue obligatoire
+    bind = op.get_bind()
+    now = datetime.now(timezone.utc).replace(tzinfo=None)
+    for table, source in UPDATED_AT_TABLES.items():
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            batch_op.add_column(sa.Column('updated_at', sa.DateTime(), nullable=True))
+        rows = sa.table(table, sa.column('updated_at', sa.DateTime), *([sa.column(source, sa.DateTime)] if source else []))
+        value = sa.func.coalesce(rows.c[source], now) if source else now
+        bind.execute(rows.update().values(updated_at=value))
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            batch_op.alter_column('updated_at', existing_type=sa.DateTime(), nullable=False)
+            batch_op.create_index(batch_op.f(f'ix_{table}_updated_at'), ['updated_at'], unique=False)
+
+
+def downgrade():
+    for table in reversed(UPDATED_AT_TABLES):
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            batch_op.drop_index(batch_op.f(f'ix_{table}_updated_at'))
+            batch_op.drop_column('updated_at')
+
+    for table in reversed(NEW_VERSIONED_TABLES):
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            batch_op.drop_column('version')
@@ -1,59 +1,279 @@
 import os
 import sys
-import shutil
-import filecmp
+import json
 import time
-from tqdm import tqdm
+import shutil
+import hashlib
+import argparse
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+try:
+    from tqdm import tqdm
+except ImportError:  # tqdm est optionnel : on se contente d'un affichage final
+    tqdm = None
+
+# Nom du manifeste enregistré à la racine du répertoire de destination.
+MANIFEST_NAME = '.sync_manifest.json'
+MANIFEST_VERSION = 1
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+def file_digest(path):
+    """Calcule l'empreinte SHA-256 du contenu d'un fichier."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def load_manifest(dst):
+    """
+    Charge le manifeste de la dernière synchronisation.
+    Retourne un dictionnaire vide si le manifeste est absent ou illisible.
+    """
+    path = os.path.join(dst, MANIFEST_NAME)
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    if data.get('version') != MANIFEST_VERSION:
+        return {}
+    return data.get('files', {})
+
+
+def save_manifest(dst, files):
+    """Écrit le manifeste de manière atomique (fichier temporaire puis remplacement)."""
+    path = os.path.join(dst, MANIFEST_NAME)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump({'version': MANIFEST_VERSION, 'files': files}, f, separators=(',', ':'), sort_keys=True)
+    os.replace(tmp_path, path)
+
 
-def sync_dirs(src, dst):
+def scan_tree(root, skip=()):
+    """
+    Parcourt un répertoire avec os.scandir et retourne deux dictionnaires :
+    - les fichiers, indexés par chemin relatif (séparateur '/'), avec taille et mtime ;
+    - les dossiers, indexés par chemin relatif.
+    """
+    files = {}
+    dirs = set()
+    stack = ['']
+    while stack:
+        rel_dir = stack.pop()
+        abs_dir = os.path.join(root, rel_dir) if rel_dir else root
+        with os.scandir(abs_dir) as it:
+            for entry in it:
+                rel_path = f'{rel_dir}/{entry.name}' if rel_dir else entry.name
+                if rel_path in skip:
+                    continue
+                if entry.is_dir(follow_symlinks=False):
+                    dirs.add(rel_path)
+                    stack.append(rel_path)
+                elif entry.is_file():
+                    st = entry.stat()
+                    files[rel_path] = {'size': st.st_size, 'mtime': st.st_mtime_ns}
+    return files, dirs
+
+
+def plan_sync(src, dst, checksum=False, full=False):
+    """
+    Compare la source avec le manifeste de la destination et retourne le plan
+    de synchronisation (copies, suppressions, dossiers à créer) ainsi que le
+    nouvel état du manifeste.
+
+    Seule la source est parcourue : l'état de la destination est connu grâce
+    au manifeste. Avec `full=True`, le manifeste est ignoré et la destination
+    est rescannée (à utiliser si elle a pu être modifiée à la main).
+    """
+    src_files, src_dirs = scan_tree(src)
+
+    if full or not os.path.exists(os.path.join(dst, MANIFEST_NAME)):
+        # Pas de manifeste : on reconstruit l'état à partir de la destination elle-même.
+        previous = {}
+        if os.path.isdir(dst):
+            dst_files, dst_dirs = scan_tree(dst, skip={MANIFEST_NAME, MANIFEST_NAME + '.tmp'})
+        else:
+            dst_files, dst_dirs = {}, set()
+    else:
+        previous = load_manifest(dst)
+        dst_files = previous
+        dst_dirs = {os.path.dirname(p).replace(os.sep, '/') for p in previous}
+        dst_dirs.discard('')
+        # Compléter avec les dossiers parents (ex. 'a/b' implique 'a')
+        for d in list(dst_dirs):
+            parent = os.path.dirname(d)
+            while parent:
+                dst_dirs.add(parent)
+                parent = os.path.dirname(parent)
+
+    to_copy = []
+    manifest = {}
+    for rel_path, info in src_files.items():
+        known = dst_files.get(rel_path)
+        entry = dict(info)
+        if known and known['size'] == info['size'] and known['mtime'] == info['mtime']:
+            # Fichier inchangé depuis la dernière synchronisation
+            if 'sha256' in known:
+                entry['sha256'] = known['sha256']
+            manifest[rel_path] = entry
+            continue
+        if checksum and known and known['size'] == info['size']:
+            # Même taille mais mtime différent : on compare le contenu avant de copier.
+            known_hash = known.get('sha256') or _dst_digest(dst, rel_path)
+            entry['sha256'] = file_digest(os.path.join(src, rel_path))
+            if known_hash == entry['sha256']:
+                manifest[rel_path] = entry
+                continue
+        to_copy.append(rel_path)
+        manifest[rel_path] = entry
+
+    to_delete = sorted(set(dst_files) - set(src_files))
+    dirs_to_create = sorted(src_dirs - dst_dirs)
+    # Suppression des dossiers du plus profond au moins profond
+    dirs_to_delete = sorted(dst_dirs - src_dirs, key=lambda d: d.count('/'), reverse=True)
+
+    return {
+        'copy': sorted(to_copy),
+        'delete': to_delete,
+        'mkdir': dirs_to_create,
+        'rmdir': dirs_to_delete,
+        'bytes': sum(src_files[p]['size'] for p in to_copy),
+        'manifest': manifest,
+    }
+
+
+def _dst_digest(dst, rel_path):
+    path = os.path.join(dst, rel_path)
+    if not os.path.isfile(path):
+        return None
+    return file_digest(path)
+
+
+def _copy_one(src, dst, rel_path):
+    shutil.copy2(os.path.join(src, rel_path), os.path.join(dst, rel_path))
+    return rel_path
+
+
+def _delete_one(dst, rel_path):
+    path = os.path.join(dst, rel_path)
+    if os.path.lexists(path):
+        os.remove(path)
+    return rel_path
+
+
+def _run_parallel(func, items, jobs, desc):
+    """Exécute `func` sur chaque élément via un pool de threads, avec une barre de progression optionnelle."""
+    if not items:
+        return
+    progress = tqdm(total=len(items), desc=desc, unit='fichier') if tqdm else None
+    try:
+        with ThreadPoolExecutor(max_workers=jobs) as executor:
+            futures = [executor.submit(func, item) for item in items]
+            for future in as_completed(futures):
+                future.result()
+                if progress:
+                    progress.update(1)
+    finally:
+        if progress:
+            progress.close()
+
+
+def sync_dirs(src, dst, jobs=8, dry_run=False, checksum=False, full=False):
     """
     Synchronise le répertoire de destination (dst) pour qu'il soit un miroir
     du répertoire source (src).
+
+    Un manifeste (taille, mtime et éventuellement empreinte SHA-256) est
+    conservé dans la destination : les fichiers inchangés depuis la dernière
+    exécution sont ignorés sans toucher à la destination. Les copies et les
+    suppressions sont réparties sur `jobs` threads.
+
+    Retourne un dictionnaire de statistiques (fichiers copiés, supprimés,
+    octets transférés, durée).
     """
-    comparison = filecmp.dircmp(src, dst)
-
-    # Copier les fichiers/dossiers qui sont dans src mais pas dans dst
-    for name in tqdm(comparison.left_only, desc=f"COPIE vers {os.path.basename(dst)}", unit="fichier"):
-        src_path = os.path.join(src, name)
-        dst_path = os.path.join(dst, name)
-        if os.path.isdir(src_path):
-            shutil.copytree(src_path, dst_path)
-        else:
-            shutil.copy2(src_path, dst_path)
-
-    # Mettre à jour les fichiers qui sont différents
-    for name in tqdm(comparison.diff_files, desc=f"MISE À JOUR dans {os.path.basename(dst)}", unit="fichier"):
-        src_path = os.path.join(src, name)
-        dst_path = os.path.join(dst, name)
-        shutil.copy2(src_path, dst_path)
-
-    # Supprimer les fichiers/dossiers qui sont dans dst mais pas dans src
-    for name in tqdm(comparison.right_only, desc=f"SUPPRESSION dans {os.path.basename(dst)}", unit="fichier"):
-        dst_path = os.path.join(dst, name)
-        if os.path.isdir(dst_path):
-            shutil.rmtree(dst_path)
-        else:
-            os.remove(dst_path)
+    start_time = time.perf_counter()
+    plan = plan_sync(src, dst, checksum=checksum, full=full)
+
+    stats = {
+        'copied': len(plan['copy']),
+        'deleted': len(plan['delete']),
+        'dirs_created': len(plan['mkdir']),
+        'dirs_deleted': len(plan['rmdir']),
+        'bytes': plan['bytes'],
+        'dry_run': dry_run,
+    }
+
+    if dry_run:
+        stats['plan'] = plan
+        stats['duration'] = time.perf_counter() - start_time
+        return stats
+
+    os.makedirs(dst, exist_ok=True)
+    for rel_dir in plan['mkdir']:
+        os.makedirs(os.path.join(dst, rel_dir), exist_ok=True)
+
+    _run_parallel(lambda p: _copy_one(src, dst, p), plan['copy'], jobs,
+                  f"COPIE vers {os.path.basename(dst)}")
+    _run_parallel(lambda p: _delete_one(dst, p), plan['delete'], jobs,
+                  f"SUPPRESSION dans {os.path.basename(dst)}")
+
+    for rel_dir in plan['rmdir']:
+        shutil.rmtree(os.path.join(dst, rel_dir), ignore_errors=True)
+
+    save_manifest(dst, plan['manifest'])
+    stats['duration'] = time.perf_counter() - start_time
+    return stats
+
+
+def format_report(stats):
+    """Formate un résumé lisible des statistiques de synchronisation."""
+    duration = max(stats['duration'], 1e-9)
+    mb = stats['bytes'] / (1024 * 1024)
+    lines = [
+        f"Fichiers copiés/mis à jour : {stats['copied']}",
+        f"Fichiers supprimés         : {stats['deleted']}",
+        f"Dossiers créés/supprimés   : {stats['dirs_created']}/{stats['dirs_deleted']}",
+        f"Volume transféré           : {mb:.2f} Mo",
+        f"Débit                      : {mb / duration:.2f} Mo/s, {stats['copied'] / duration:.1f} fichiers/s",
+    ]
+    return '\n'.join(lines)
+
+
+def print_plan(plan):
+    """Affiche le diff prévu par un dry-run."""
+    for rel_dir in plan['mkdir']:
+        print(f"  + {rel_dir}/")
+    for rel_path in plan['copy']:
+        print(f"  ~ {rel_path}")
+    for rel_path in plan['delete']:
+        print(f"  - {rel_path}")
+    for rel_dir in plan['rmdir']:
+        print(f"  - {rel_dir}/")
 
-    # Récursion dans les sous-dossiers communs
-    for common_dir in comparison.common_dirs:
-        new_src = os.path.join(src, common_dir)
-        new_dst = os.path.join(dst, common_dir)
-        sync_dirs(new_src, new_dst)
 
 if __name__ == "__main__":
-    if len(sys.argv) != 3:
-        print("Usage: python sync_dirs.py <répertoire_source> <répertoire_destination>")
-        sys.exit(1)
+    parser = argparse.ArgumentParser(description="Synchronise un répertoire de destination avec un répertoire source.")
+    parser.add_argument("source_dir", help="Répertoire source.")
+    parser.add_argument("dest_dir", help="Répertoire de destination.")
+    parser.add_argument("--jobs", type=int, default=8, help="Nombre de threads pour les copies et suppressions.")
+    parser.add_argument("--dry-run", action="store_true", help="Affiche les changements sans les appliquer.")
+    parser.add_argument("--checksum", action="store_true",
+                        help="Compare le contenu (SHA-256) quand seule la date de modification a changé.")
+    parser.add_argument("--full", action="store_true",
+                        help="Ignore le manifeste et rescane entièrement la destination.")
+    args = parser.parse_args()
 
-    source_dir = sys.argv[1]
-    dest_dir = sys.argv[2]
+    source_dir = args.source_dir
+    dest_dir = args.dest_dir
 
     if not os.path.isdir(source_dir):
         print(f"Erreur : Le répertoire source n'existe pas : {source_dir}")
         sys.exit(1)
 
-    if not os.path.isdir(dest_dir):
+    if not os.path.isdir(dest_dir) and not args.dry_run:
         print(f"Le répertoire de destination n'existe pas. Création de : {dest_dir}")
         os.makedirs(dest_dir)
 
@@ -61,12 +281,15 @@ if __name__ == "__main__":
     print(f"Démarrage de la synchronisation de '__{source_dir}__' vers '__{dest_dir}__'...")
 
     try:
-        sync_dirs(source_dir, dest_dir)
-        end_time = time.time()
-        duration = end_time - start_time
-        print(f"\nSynchronisation terminée avec succès en {duration:.2f} secondes.")
+        stats = sync_dirs(source_dir, dest_dir, jobs=args.jobs, dry_run=args.dry_run,
+                          checksum=args.checksum, full=args.full)
+        if args.dry_run:
+            print("\nMode dry-run : aucun changement appliqué.")
+            print_plan(stats['plan'])
+        print("\n" + format_report(stats))
+        print(f"\nSynchronisation terminée avec succès en {stats['duration']:.2f} secondes.")
     except Exception as e:
         end_time = time.time()
         duration = end_time - start_time
         print(f"\nUne erreur est survenue durant la synchronisation (durée: {duration:.2f}s) : {e}")
-        sys.exit(1)
\ No newline at end of file
+        sys.exit(1)
@@ -3,9 +3,14 @@ from app import create_app, db as _db
 import app.models # Ensure all models are loaded
 
 @pytest.fixture(scope='session')
-def app():
+def app(tmp_path_factory):
     """Create and configure a new app instance for the entire test session."""
+    # Bundles construits à la demande et cache webassets hors de static/
+    assets_dir = tmp_path_factory.mktemp('assets')
+    (assets_dir / '.webassets-cache').mkdir()
     app = create_app({
+        "ASSETS_DIRECTORY": str(assets_dir),
+        "ASSETS_CACHE": str(assets_dir / '.webassets-cache'),
         "TESTING": True,
         "SQLALCHEMY_DATABASE_URI": "sqlite:///:memory:",
         "WTF_CSRF_ENABLED": False,
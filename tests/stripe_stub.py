@@ -0,0 +1,66 @@
+'''
+Bouchon local de l'API Stripe pour les tests (sessions Checkout uniquement).
+
+Démarré dans un thread sur un port libre ; les tests pointent STRIPE_API_BASE
+vers `stub.url`. Chaque requête reçue est conservée dans `stub.requests`.
+Le serveur parle HTTP/1.1 et garde les connexions ouvertes (keep-alive).
+'''
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs
+
+
+class StripeStub:
+    def __init__(self):
+        self.requests = []
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def do_POST(self):
+                length = int(self.headers.get('Content-Length') or 0)
+                status, body = stub._handle(self.path, parse_qs(self.rfile.read(length).decode()),
+                                            self.headers, self.client_address[1])
+                data = json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, *args):
+                pass
+
+        self._server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self._server.daemon_threads = True
+        self.url = f'http://127.0.0.1:{self._server.server_port}'
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def calls(self, path):
+        return [r for r in self.requests if r['path'] == path]
+
+    def _handle(self, path, form, headers, client_port):
+        self.requests.append({
+            'path': path,
+            'form': form,
+            'idempotency_key': headers.get('Idempotency-Key'),
+            'client_port': client_port,
+        })
+        if path == '/v1/checkout/sessions':
+            session_id = f'cs_test_{len(self.calls(path))}'
+            return 200, {'id': session_id, 'object': 'checkout.session', 'status': 'open',
+                         'url': f'https://checkout.stripe.test/{session_id}',
+                         'expires_at': int(form['expires_at'][0])}
+        if path.startswith('/v1/checkout/sessions/') and path.endswith('/expire'):
+            return 200, {'id': path.split('/')[-2], 'object': 'checkout.session', 'status': 'expired'}
+        return 404, {'error': {'message': f'Unrecognized request URL (POST: {path})'}}
@@ -0,0 +1,77 @@
+from datetime import datetime
+from flask import g
+from app.admin.listing import AdminListing
+from app.admin.routes import CONTACT_MESSAGES_LISTING
+from app.models import Banner, Category, ContactMessage, Milestone, Post, StaffUser
+
+
+def _messages(db, count):
+    # Dates en double pour vérifier que la clé primaire départage le tri
+    messages = [ContactMessage(name=f'Client {i}', email=f'client{i}@example.com', message=f'Question {i}',
+                               date_posted=datetime(2026, 1, 1 + i // 2, 10)) for i in range(count)]
+    db.session.add_all(messages)
+    db.session.commit()
+    return messages
+
+
+def test_keyset_pages_walk_forward_and_back(app, db):
+    """
+    GIVEN sept messages dont plusieurs postés au même instant
+    WHEN on parcourt la liste par pages de trois, dans un sens puis dans l'autre
+    THEN chaque message apparaît une seule fois, dans l'ordre, et le filtre s'applique
+    """
+    _messages(db, 7)
+    listing = AdminListing('admin.admin_contact_messages', ContactMessage,
+                           columns=CONTACT_MESSAGES_LISTING.columns, filters=CONTACT_MESSAGES_LISTING.filters,
+                           default_sort='date_posted', per_page=3)
+    expected = [row.id for row in db.session.execute(
+        db.select(ContactMessage.id).order_by(ContactMessage.date_posted.desc(), ContactMessage.id.desc()))]
+
+    with app.test_request_context('/admin/contact-messages'):
+        pages = [listing.page({})]
+        while pages[-1].next_cursor:
+            pages.append(listing.page({'after': pages[-1].next_cursor}))
+        assert [[row.id for row in page.rows] for page in pages] == [expected[0:3], expected[3:6], expected[6:7]]
+        assert pages[0].prev_cursor is None and pages[1].prev_url
+
+        back = listing.page({'before': pages[2].prev_cursor})
+        assert [row.id for row in back.rows] == expected[3:6]
+        back = listing.page({'before': back.prev_cursor})
+        assert [row.id for row in back.rows] == expected[0:3] and back.prev_cursor is None
+
+        ascending = listing.page({'sort_by': 'name', 'sort_order': 'asc', 'q': 'client1'})
+        assert [row.name for row in ascending.rows] == ['Client 1']
+        # Un tri inconnu ou un curseur illisible retombent sur la première page par défaut
+        assert [row.id for row in listing.page({'sort_by': 'message', 'after': 'xx'}).rows] == expected[0:3]
+
+
+def test_admin_lists_render_projected_rows(app, db, test_client):
+    """
+    GIVEN une réalisation, une catégorie, une bannière, un palier et un message
+    WHEN un administrateur ouvre les listes de l'administration
+    THEN chaque liste s'affiche, avec les dates converties dans le fuseau d'affichage
+    """
+    admin = StaffUser(username='admin', email='admin@example.com', password='x', role='admin')
+    db.session.add(admin)
+    db.session.flush()
+    db.session.add_all([
+        Post(title='Poulailler', description='...', author_id=admin.id, created_at=datetime(2026, 1, 15, 12, 0)),
+        Category(name='Volaille'),
+        Banner(title='Promo Tabaski', message='Moutons', is_active=True, position='homepage'),
+        Milestone(order_number=100),
+    ])
+    db.session.commit()
+    _messages(db, 1)
+    with test_client.session_transaction() as sess:
+        sess['_user_id'] = admin.get_id()
+    g.pop('_login_user', None)
+
+    page = test_client.get('/admin/posts').get_data(as_text=True)
+    assert 'Poulailler' in page and '15/01/2026 à 13:00' in page and 'admin' in page
+    assert 'Volaille' in test_client.get('/admin/categories').get_data(as_text=True)
+    assert 'Promo Tabaski' in test_client.get('/admin/banners?position=homepage&is_active=1').get_data(as_text=True)
+    assert 'Promo Tabaski' not in test_client.get('/admin/banners?position=sidebar').get_data(as_text=True)
+    assert 'Palier n°' in test_client.get('/admin/milestones').get_data(as_text=True)
+    assert 'client0@example.com' in test_client.get('/admin/contact-messages?q=question').get_data(as_text=True)
+    page = test_client.get('/admin/users?role=admin').get_data(as_text=True)
+    assert 'admin@example.com' in page
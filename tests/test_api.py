@@ -0,0 +1,57 @@
+from app.models import Category, Product
+
+
+def _catalog(db, count=3):
+    category = Category(name='Épicerie')
+    db.session.add(category)
+    db.session.flush()
+    products = [Product(name=f'Produit {i}', price=100 * (i + 1), stock=i, category_id=category.id)
+                for i in range(count)]
+    db.session.add_all(products)
+    db.session.commit()
+    return category, products
+
+
+def test_products_keyset_pagination_and_sparse_fields(app, db, test_client):
+    """
+    GIVEN trois produits au catalogue
+    WHEN l'API est parcourue page par page avec une sélection de champs
+    THEN chaque page ne contient que les champs demandés et le curseur mène à la suite
+    """
+    _catalog(db)
+    first = test_client.get('/api/v1/products?limit=2&fields=name,in_stock').get_json()
+    assert [p['name'] for p in first['data']] == ['Produit 0', 'Produit 1']
+    assert set(first['data'][0]) == {'id', 'name', 'in_stock'}
+    assert first['data'][0]['in_stock'] is False
+
+    second = test_client.get(first['next']).get_json()
+    assert [p['name'] for p in second['data']] == ['Produit 2']
+    assert second['next'] is None
+
+    assert test_client.get('/api/v1/products?fields=password').status_code == 400
+
+
+def test_etag_changes_with_catalog_and_row_versions(app, db, test_client):
+    """
+    GIVEN une liste de produits et une fiche produit déjà récupérées avec leur ETag
+    WHEN le client revalide, puis qu'un produit est modifié
+    THEN l'API répond 304 tant que rien ne change, puis 200 avec une nouvelle version
+    """
+    _, products = _catalog(db, count=1)
+    product = products[0]
+
+    listing = test_client.get('/api/v1/products')
+    detail = test_client.get(f'/api/v1/products/{product.id}')
+    assert detail.get_json()['data']['version'] == 1
+    assert test_client.get('/api/v1/products', headers={'If-None-Match': listing.headers['ETag']}).status_code == 304
+    assert test_client.get(f'/api/v1/products/{product.id}',
+                           headers={'If-None-Match': detail.headers['ETag']}).status_code == 304
+
+    product.price = 250
+    db.session.commit()
+
+    listing_after = test_client.get('/api/v1/products', headers={'If-None-Match': listing.headers['ETag']})
+    detail_after = test_client.get(f'/api/v1/products/{product.id}', headers={'If-None-Match': detail.headers['ETag']})
+    assert listing_after.status_code == 200 and detail_after.status_code == 200
+    assert detail_after.get_json()['data']['version'] == 2
+    assert detail_after.get_json()['data']['price'] == 250
@@ -0,0 +1,30 @@
+import os
+from app.extensions import assets
+from app.utils.asset_pipeline import build_bundles, asset_urls, is_immutable_file
+
+
+def test_build_bundles_writes_fingerprinted_and_compressed_files(app, monkeypatch, tmp_path):
+    """
+    GIVEN les bundles css_all et js_all enregistrés
+    WHEN la compilation est lancée
+    THEN chaque bundle est écrit sous un nom empreinté avec sa variante .gz et le manifeste est résolu par asset_urls
+    """
+    # Sorties et cache de webassets dans un dossier temporaire : rien n'est écrit dans static/
+    static_folder = str(tmp_path)
+    cache_dir = tmp_path / '.webassets-cache'
+    cache_dir.mkdir()
+    monkeypatch.setitem(app.config, 'ASSETS_DIRECTORY', static_folder)
+    monkeypatch.setitem(app.config, 'ASSETS_CACHE', str(cache_dir))
+    with app.app_context():
+        manifest = build_bundles(assets, static_folder)
+        assert set(manifest) == {'css_all', 'js_all'}
+        for filename in manifest.values():
+            path = os.path.join(static_folder, filename)
+            assert os.path.exists(path)
+            assert os.path.exists(path + '.gz')
+            assert is_immutable_file(path, '/static/' + filename)
+        assert os.path.exists(os.path.join(static_folder, 'gen', 'manifest.json'))
+
+        monkeypatch.setitem(app.extensions, 'asset_manifest', manifest)
+        with app.test_request_context('/'):
+            assert asset_urls('css_all') == ['/static/' + manifest['css_all']]
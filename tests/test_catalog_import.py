@@ -0,0 +1,138 @@
+import io
+from sqlalchemy import event
+from openpyxl import Workbook
+from app.models import (Category, Customer, LowStockAlert, Product, RestockEvent, SmartShopping,
+                        WishlistItem)
+from app.versioning import catalog_version
+from app.utils.catalog_import import import_catalog
+from app.utils.metrics import metrics
+
+
+def _catalog(db):
+    volaille = Category(name='Volaille')
+    customer = Customer(username='awa', email='awa@example.com', password='x')
+    db.session.add_all([volaille, customer, Category(name='Oeufs')])
+    db.session.flush()
+    poulet = Product(name='Poulet fermier', price=3500, stock=0, category_id=volaille.id)
+    pintade = Product(name='Pintade', price=5000, stock=10, category_id=volaille.id)
+    db.session.add_all([poulet, pintade])
+    db.session.flush()
+    db.session.add_all([WishlistItem(customer_id=customer.id, product_id=poulet.id),
+                        SmartShopping(customer_id=customer.id, product_id=pintade.id, desired_price=4500)])
+    db.session.commit()
+    return poulet, pintade
+
+
+def _products(db):
+    db.session.expire_all()
+    return {p.name: (p.price, p.stock, p.category.name)
+            for p in db.session.execute(db.select(Product)).scalars()}
+
+
+def test_csv_import_upserts_in_batches_and_fires_hooks(app, db):
+    """
+    GIVEN un fichier CSV « à la française » avec des mises à jour, une création et des lignes invalides
+    WHEN il est importé par lots de deux lignes
+    THEN les lignes valides sont appliquées, les erreurs signalées, et retours en stock,
+         veilles de prix, alertes et version du catalogue suivent
+    """
+    poulet, pintade = _catalog(db)
+    version = catalog_version()
+    content = (
+        "ID Produit;Nom;Catégorie;Prix;Stock\n"
+        f"{poulet.id};;;;12\n"
+        ";Pintade;;4 500,00;\n"
+        ";Caille;oeufs;1500;2\n"
+        "999;;;;5\n"
+        ";Dinde;Bovins;9000;1\n"
+        f"{pintade.id};;;abc;\n"
+    )
+    report = import_catalog(io.BytesIO(content.encode('utf-8-sig')), 'stock.csv', chunk_size=2)
+
+    assert (report.rows, report.created, report.updated) == (6, 1, 2)
+    assert [line for line, _ in report.errors] == [5, 6, 7]
+    assert _products(db) == {'Poulet fermier': (3500, 12, 'Volaille'), 'Pintade': (4500, 10, 'Volaille'),
+                             'Caille': (1500, 2, 'Oeufs')}
+    assert report.restocked == 1 and report.price_watches_triggered == 1
+    assert db.session.execute(db.select(RestockEvent.product_id)).scalars().all() == [poulet.id]
+    assert db.session.execute(db.select(SmartShopping.status)).scalar_one() == 'triggered'
+    caille_alert = db.session.execute(db.select(LowStockAlert).join(Product).filter(Product.name == 'Caille')).scalar_one()
+    assert (caille_alert.stock, caille_alert.threshold) == (2, 5)
+    assert catalog_version() == version + 1
+    assert db.session.get(Product, pintade.id).version == 2
+
+
+def test_xlsx_export_round_trip_and_dry_run(app, db):
+    """
+    GIVEN un classeur au format de l'export Excel des produits
+    WHEN il est importé en simulation, puis pour de vrai
+    THEN la simulation ne change rien et l'import applique les nouvelles valeurs
+    """
+    poulet, pintade = _catalog(db)
+    workbook = Workbook()
+    sheet = workbook.active
+    sheet.append(['ID Produit', 'Nom', 'Catégorie', 'Description', 'Prix', 'Stock', 'Seuil de Stock'])
+    sheet.append([poulet.id, 'Poulet fermier', 'Volaille', 'Élevé en plein air', 3500, 30, 5])
+    sheet.append([pintade.id, 'Pintade', 'Volaille', None, 5000, 10, None])
+    stream = io.BytesIO()
+    workbook.save(stream)
+
+    stream.seek(0)
+    report = import_catalog(stream, 'produits.xlsx', dry_run=True)
+    assert (report.updated, report.unchanged, report.errors) == (1, 1, [])
+    assert _products(db)['Poulet fermier'] == (3500, 0, 'Volaille')
+    assert db.session.execute(db.select(db.func.count(RestockEvent.id))).scalar() == 0
+
+    stream.seek(0)
+    import_catalog(stream, 'produits.xlsx')
+    assert _products(db)['Poulet fermier'] == (3500, 30, 'Volaille')
+    assert db.session.get(Product, poulet.id).description == 'Élevé en plein air'
+
+
+def test_dry_run_counts_without_side_effects(app, db):
+    """
+    GIVEN un produit épuisé suivi en liste de souhaits et une veille de prix sur un autre
+    WHEN un import qui le réapprovisionne et baisse le prix est simulé
+    THEN le rapport compte le retour en stock et la veille atteinte, sans notification ni métrique
+    """
+    poulet, pintade = _catalog(db)
+    watches, notifications = metrics.get('price_watches_triggered'), metrics.get('customer_notifications_enqueued')
+    content = f"id,price,stock\n{poulet.id},,8\n{pintade.id},4000,\n"
+
+    report = import_catalog(io.BytesIO(content.encode()), 'stock.csv', dry_run=True)
+
+    assert (report.updated, report.restocked, report.price_watches_triggered) == (2, 1, 1)
+    assert metrics.get('price_watches_triggered') == watches
+    assert metrics.get('customer_notifications_enqueued') == notifications
+    assert db.session.execute(db.select(SmartShopping.status)).scalar_one() == 'active'
+    assert db.session.execute(db.select(db.func.count(RestockEvent.id))).scalar() == 0
+
+
+def test_price_import_keeps_concurrent_stock_changes(app, db):
+    """
+    GIVEN deux produits, dont l'un voit son stock décrémenté par un paiement pendant l'import
+    WHEN un fichier qui ne change que les prix est importé
+    THEN seule la colonne prix est écrite, le produit modifié entre-temps garde son stock
+         et sa ligne est signalée en conflit
+    """
+    poulet, pintade = _catalog(db)
+    statements = []
+
+    def _checkout_meanwhile(conn, cursor, statement, parameters, context, executemany):
+        if statement.startswith('UPDATE product') and not statements:
+            # Paiement concurrent, validé entre la lecture du lot et son écriture
+            cursor.connection.execute('UPDATE product SET stock = stock - 4, version = version + 1 WHERE id = ?',
+                                      (pintade.id,))
+        if statement.startswith('UPDATE product'):
+            statements.append(statement)
+
+    event.listen(db.engine, 'before_cursor_execute', _checkout_meanwhile)
+    try:
+        content = f"id,price\n{poulet.id},3000\n{pintade.id},4800\n"
+        report = import_catalog(io.BytesIO(content.encode()), 'prix.csv')
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', _checkout_meanwhile)
+
+    assert report.updated == 1 and [line for line, _ in report.errors] == [3]
+    assert all('stock' not in statement.split('WHERE')[0] for statement in statements)
+    assert _products(db) == {'Poulet fermier': (3000, 0, 'Volaille'), 'Pintade': (5000, 6, 'Volaille')}
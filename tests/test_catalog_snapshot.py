@@ -0,0 +1,81 @@
+import pytest
+from app.catalog_snapshot import current_catalog, invalidate_catalog_snapshot
+from app.models import Category, Product
+from app.utils.metrics import metrics
+
+
+@pytest.fixture
+def catalog_snapshot(app):
+    """Instantané vide au départ, vérifié seulement toutes les minutes pendant le test."""
+    app.config['CATALOG_SNAPSHOT_CHECK_SECONDS'] = 60
+    invalidate_catalog_snapshot()
+    metrics.reset()
+    yield
+    app.config['CATALOG_SNAPSHOT_CHECK_SECONDS'] = 5
+    invalidate_catalog_snapshot()
+
+
+def _catalog(db):
+    fruits = Category(name='Fruits')
+    epices = Category(name='Épices')
+    db.session.add_all([fruits, epices])
+    db.session.flush()
+    products = [
+        Product(name='Mangue', price=500, stock=3, category_id=fruits.id),
+        Product(name='ananas', price=900, stock=0, category_id=fruits.id),
+        Product(name='Poivre', price=300, stock=8, category_id=epices.id),
+    ]
+    db.session.add_all(products)
+    db.session.commit()
+    return fruits, epices, products
+
+
+def test_produits_filters_sorts_and_paginates_from_snapshot(app, db, test_client, catalog_snapshot):
+    """
+    GIVEN un catalogue de trois produits dans deux catégories
+    WHEN la page produits est consultée avec recherche, filtre et tri
+    THEN les résultats sont corrects et l'instantané n'est construit qu'une fois
+    """
+    fruits, epices, _ = _catalog(db)
+
+    page = test_client.get('/produits?sort_by=price_desc').get_data(as_text=True)
+    assert page.index('ananas') < page.index('Mangue') < page.index('Poivre')
+
+    page = test_client.get(f'/produits?category={fruits.id}').get_data(as_text=True)
+    assert 'ananas' in page and 'Mangue' in page and 'Poivre' not in page
+    # Tri par nom sans tenir compte de la casse
+    assert page.index('ananas') < page.index('Mangue')
+
+    # La recherche porte aussi sur le nom de la catégorie
+    page = test_client.get('/produits?q=ÉPICES').get_data(as_text=True)
+    assert 'Poivre' in page and 'Mangue' not in page
+
+    assert test_client.get('/produits?page=3').status_code == 404
+    assert metrics.get('catalog_snapshot_builds') == 1
+    assert [c.name for c in current_catalog().categories] == ['Fruits', 'Épices']
+
+
+def test_snapshot_rebuilt_after_catalog_commit(app, db, test_client, catalog_snapshot):
+    """
+    GIVEN un instantané du catalogue déjà construit
+    WHEN un produit est modifié puis un autre supprimé
+    THEN le panier et la page produits voient aussitôt le nouveau catalogue
+    """
+    _, _, (mangue, ananas, poivre) = _catalog(db)
+    with test_client.session_transaction() as sess:
+        sess['cart'] = {str(mangue.id): 2, str(poivre.id): 1}
+
+    assert '1,300.00' in test_client.get('/cart').get_data(as_text=True)
+    version = current_catalog().version
+
+    mangue.price = 600
+    db.session.commit()
+    db.session.delete(poivre)
+    db.session.commit()
+
+    cart_page = test_client.get('/cart').get_data(as_text=True)
+    assert '1,200.00' in cart_page and 'Poivre' not in cart_page
+    assert current_catalog().version == version + 2
+    assert current_catalog().product(mangue.id).price == 600
+    assert current_catalog().product(poivre.id) is None
+    assert metrics.get('catalog_snapshot_builds') == 2
@@ -0,0 +1,86 @@
+import gzip
+import json
+import brotli
+from app.extensions import cache
+from app.models import Category, Product
+from app.utils.metrics import metrics
+
+
+def _catalog(db, count=30):
+    category = Category(name='Épicerie')
+    db.session.add(category)
+    db.session.flush()
+    db.session.add_all([Product(name=f'Produit {i}', description='Produit de la ferme ' * 5, price=100 * (i + 1),
+                                stock=i, category_id=category.id) for i in range(count)])
+    db.session.commit()
+
+
+def test_pages_are_compressed_by_negotiated_encoding(app, db, test_client):
+    """
+    GIVEN la page produits (rendue en flux) et la page contact
+    WHEN le client accepte brotli ou seulement gzip
+    THEN la réponse est compressée dans l'encodage négocié, et ne l'est pas sans Accept-Encoding
+    """
+    _catalog(db)
+    plain = test_client.get('/produits')
+    assert 'Content-Encoding' not in plain.headers and 'Accept-Encoding' in plain.headers['Vary']
+
+    response = test_client.get('/produits', headers={'Accept-Encoding': 'gzip, deflate, br'})
+    assert response.headers['Content-Encoding'] == 'br' and 'Content-Length' not in response.headers
+    page = brotli.decompress(response.get_data()).decode()
+    assert 'Produit 0' in page and page.rstrip().endswith('</html>')
+
+    response = test_client.get('/contact', headers={'Accept-Encoding': 'gzip;q=1, br;q=0'})
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert 'Contact' in gzip.decompress(response.get_data()).decode()
+
+
+def test_small_responses_are_sent_as_is(app, db, test_client):
+    """
+    GIVEN une réponse JSON plus petite que COMPRESSION_MIN_BYTES
+    WHEN le client accepte gzip
+    THEN elle part sans compression
+    """
+    response = test_client.get('/api/v1/products', headers={'Accept-Encoding': 'gzip'})
+    assert response.status_code == 200 and 'Content-Encoding' not in response.headers
+
+
+def test_compressed_variant_cached_by_etag(app, db, test_client):
+    """
+    GIVEN une liste de l'API, qui porte un ETag
+    WHEN elle est demandée deux fois en gzip
+    THEN la seconde réponse reprend la variante compressée en cache, et les métriques sont alimentées
+    """
+    cache.clear()
+    _catalog(db)
+    hits = metrics.get('compression_cache_hits', encoding='gzip')
+    size_in = metrics.get('compression_bytes_in', encoding='gzip')
+    size_out = metrics.get('compression_bytes_out', encoding='gzip')
+    first = test_client.get('/api/v1/products?limit=30', headers={'Accept-Encoding': 'gzip'})
+    second = test_client.get('/api/v1/products?limit=30', headers={'Accept-Encoding': 'gzip'})
+
+    assert first.headers['Content-Encoding'] == 'gzip' and first.get_data() == second.get_data()
+    assert len(json.loads(gzip.decompress(second.get_data()))['data']) == 30
+    assert metrics.get('compression_cache_hits', encoding='gzip') == hits + 1
+    # Un seul passage par le compresseur, qui réduit la taille
+    assert 0 < metrics.get('compression_bytes_out', encoding='gzip') - size_out < \
+        metrics.get('compression_bytes_in', encoding='gzip') - size_in
+
+
+def test_pages_with_csrf_token_and_request_input_are_not_compressed(app, db, test_client, monkeypatch):
+    """
+    GIVEN la page produits, qui porte le jeton CSRF
+    WHEN elle est demandée avec une recherche (reprise dans la page), puis sans
+    THEN la page avec recherche part sans compression (BREACH), l'autre est compressée
+    """
+    monkeypatch.setitem(app.config, 'WTF_CSRF_ENABLED', True)
+    _catalog(db)
+    skips = metrics.get('compression_breach_skips')
+
+    response = test_client.get('/produits?search_query=Produit', headers={'Accept-Encoding': 'gzip, br'})
+    assert response.status_code == 200 and 'Content-Encoding' not in response.headers
+    assert 'name="csrf_token"' in response.get_data(as_text=True)
+    assert metrics.get('compression_breach_skips') == skips + 1
+
+    response = test_client.get('/produits', headers={'Accept-Encoding': 'gzip, br'})
+    assert response.headers['Content-Encoding'] == 'br'
@@ -0,0 +1,82 @@
+from flask import g
+from app.models import Customer, CustomerStats, Order, StaffUser
+from app.utils.customer_stats import rebuild_customer_stats
+from app.utils.order_events import set_order_status
+
+
+def _customer(db, username):
+    customer = Customer(username=username, email=f'{username}@example.com', password='x')
+    db.session.add(customer)
+    db.session.commit()
+    return customer
+
+
+def _order(db, customer, total_price, status):
+    order = Order(customer_id=customer.id, total_price=total_price)
+    set_order_status(order, status)
+    db.session.add(order)
+    db.session.commit()
+    return order
+
+
+def _stats(db, customer):
+    db.session.expire_all()
+    stats = db.session.get(CustomerStats, customer.id)
+    return stats.order_count, stats.revenue, stats.average_basket
+
+
+def test_stats_follow_order_finalization(app, db):
+    """
+    GIVEN un client qui vient de s'inscrire
+    WHEN ses commandes sont finalisées, restent en attente ou sont annulées
+    THEN ses statistiques ne comptent que les commandes finalisées
+    """
+    customer = _customer(db, 'awa')
+    assert _stats(db, customer) == (0, 0, 0)
+
+    first = _order(db, customer, 5000, 'Paiement à la livraison')
+    second = _order(db, customer, 3000, 'En attente de paiement')
+    assert _stats(db, customer) == (1, 5000, 5000)
+
+    set_order_status(second, 'Payée')
+    db.session.commit()
+    assert _stats(db, customer) == (2, 8000, 4000)
+
+    set_order_status(first, 'Annulée')
+    db.session.commit()
+    assert _stats(db, customer) == (1, 3000, 3000)
+
+    # Le recalcul complet donne le même résultat que la mise à jour incrémentale
+    db.session.execute(CustomerStats.__table__.delete())
+    db.session.commit()
+    assert rebuild_customer_stats(batch_size=1) == 1
+    assert _stats(db, customer) == (1, 3000, 3000)
+
+
+def test_directory_searches_sorts_and_guards_deletion(app, db, test_client):
+    """
+    GIVEN trois clients dont deux ont des commandes
+    WHEN l'annuaire est trié par chiffre d'affaires, filtré, puis qu'on supprime un client
+    THEN l'ordre et la recherche sont respectés et seul le client sans commande est supprimé
+    """
+    awa, binta, coumba = (_customer(db, name) for name in ('awa', 'binta', 'coumba'))
+    _order(db, awa, 2000, 'Payée')
+    _order(db, binta, 9000, 'Payée')
+
+    page = test_client.get('/admin/customers?sort_by=revenue&sort_order=desc').get_data(as_text=True)
+    assert page.index('binta@') < page.index('awa@') < page.index('coumba@')
+
+    page = test_client.get('/admin/customers?q=coum').get_data(as_text=True)
+    assert 'coumba@' in page and 'awa@' not in page
+
+    admin = StaffUser(username='admin', email='admin@example.com', password='x', role='admin')
+    db.session.add(admin)
+    db.session.commit()
+    with test_client.session_transaction() as sess:
+        sess['_user_id'] = admin.get_id()
+    g.pop('_login_user', None)
+    test_client.post(f'/admin/customer/delete/{awa.id}')
+    test_client.post(f'/admin/customer/delete/{coumba.id}')
+    db.session.expunge_all()
+    remaining = db.session.execute(db.select(Customer.username).order_by(Customer.username)).scalars().all()
+    assert remaining == ['awa', 'binta']
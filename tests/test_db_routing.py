@@ -0,0 +1,65 @@
+import pytest
+from app import create_app, db as _db
+from app.models import Category, Product
+
+
+@pytest.fixture
+def routed_app(tmp_path):
+    """Application avec une base principale et une « réplique », deux fichiers SQLite distincts."""
+    (tmp_path / '.webassets-cache').mkdir()
+    app = create_app({
+        "ASSETS_DIRECTORY": str(tmp_path),
+        "ASSETS_CACHE": str(tmp_path / '.webassets-cache'),
+        "TESTING": True,
+        "SECRET_KEY": "test",
+        "SQLALCHEMY_DATABASE_URI": f"sqlite:///{tmp_path / 'primary.db'}",
+        "SQLALCHEMY_BINDS": {"replica": f"sqlite:///{tmp_path / 'replica.db'}"},
+        "WTF_CSRF_ENABLED": False,
+        "LOGIN_DISABLED": True,
+    })
+    router = app.extensions['db_router']
+    with app.app_context():
+        _db.create_all()
+        _db.metadata.create_all(_db.engines['replica'])
+        # Le même produit porte un nom différent sur chaque base pour savoir laquelle a été lue
+        for engine, name in ((_db.engines[None], 'Produit principal'), (_db.engines['replica'], 'Produit replique')):
+            with engine.begin() as connection:
+                connection.execute(Category.__table__.insert().values(id=1, name='Volaille'))
+                connection.execute(Product.__table__.insert().values(id=1, name=name, category_id=1, price=10.0, stock=5))
+    yield app
+    router.health.reset()
+    with app.app_context():
+        _db.session.remove()
+        for engine in _db.engines.values():
+            engine.dispose()
+    # Flask-SQLAlchemy garde une MetaData par clé de bind : on la retire pour les autres tests
+    _db.metadatas.pop('replica', None)
+
+
+def test_reads_go_to_replica_until_client_writes(routed_app):
+    """
+    GIVEN une réplique configurée
+    WHEN un client consulte le catalogue, puis envoie un POST, puis reconsulte le catalogue
+    THEN la première lecture vient de la réplique et la suivante de la base principale
+    """
+    client = routed_app.test_client()
+    assert b'Produit replique' in client.get('/produit/1').data
+
+    client.post('/contact', data={'name': 'A', 'email': 'a@example.com', 'message': 'Bonjour'})
+    assert b'Produit principal' in client.get('/produit/1').data
+
+
+def test_lagging_replica_falls_back_to_primary(routed_app):
+    """
+    GIVEN une réplique dont le retard dépasse DB_REPLICA_MAX_LAG_SECONDS
+    WHEN un client consulte le catalogue
+    THEN la lecture se fait sur la base principale
+    """
+    router = routed_app.extensions['db_router']
+    router.health.reset()
+    router.health.lag_probe = lambda engine: 60.0
+    try:
+        assert b'Produit principal' in routed_app.test_client().get('/produit/1').data
+    finally:
+        from app.db_routing import measure_replica_lag
+        router.health.lag_probe = measure_replica_lag
@@ -0,0 +1,141 @@
+from contextlib import contextmanager
+import pytest
+from flask import g, session
+from sqlalchemy import event
+from app.models import Customer
+from app.identity import (bump_credential_version, forget_identity, invalidate_identity, load_identity,
+                          SNAPSHOT_SESSION_KEY)
+from app.extensions import cache
+
+
+@contextmanager
+def _customer_queries(db):
+    statements = []
+
+    def _record(conn, cursor, statement, parameters, context, executemany):
+        if 'FROM customer' in statement:
+            statements.append(statement)
+
+    # La requête de test réutilise le contexte d'application de la fixture : on vide
+    # la carte d'identité et l'utilisateur mémorisé dans g, comme au début d'une vraie requête.
+    db.session.expunge_all()
+    g.pop('_login_user', None)
+    engine = db.engine
+    event.listen(engine, 'before_cursor_execute', _record)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, 'before_cursor_execute', _record)
+
+
+@pytest.fixture
+def snapshots(app, monkeypatch):
+    # Le cache des tests est local au processus : on active l'instantané explicitement
+    monkeypatch.setitem(app.config, 'IDENTITY_SNAPSHOT', True)
+    cache.clear()
+
+
+def _login(test_client, customer):
+    with test_client.session_transaction() as sess:
+        sess['_user_id'] = customer.get_id()
+        sess['_fresh'] = True
+
+
+def test_identity_snapshot_avoids_user_query(app, db, test_client, snapshots):
+    """
+    GIVEN un client connecté dont l'identité a été chargée une première fois
+    WHEN il affiche de nouveau sa page de profil
+    THEN l'utilisateur est reconstruit depuis la session, sans requête sur la table customer
+    """
+    customer = Customer(username='awa', email='awa@example.com', password='x')
+    db.session.add(customer)
+    db.session.commit()
+    _login(test_client, customer)
+
+    with _customer_queries(db) as statements:
+        assert test_client.get('/profil').status_code == 200
+    assert len(statements) == 1
+
+    with _customer_queries(db) as statements:
+        response = test_client.get('/profil')
+    assert response.status_code == 200
+    assert b'awa@example.com' in response.data
+    assert statements == []
+
+
+def test_credential_change_invalidates_snapshot(app, db, test_client, snapshots):
+    """
+    GIVEN un client connecté avec un instantané d'identité en session
+    WHEN ses identifiants sont modifiés ailleurs (nouvelle version publiée)
+    THEN la requête suivante recharge l'utilisateur depuis la base
+    """
+    customer = Customer(username='moussa', email='moussa@example.com', password='x')
+    db.session.add(customer)
+    db.session.commit()
+    _login(test_client, customer)
+    test_client.get('/profil')
+
+    with app.test_request_context():
+        customer.email = 'nouveau@example.com'
+        bump_credential_version(customer)
+        db.session.commit()
+        invalidate_identity(customer)
+
+    with _customer_queries(db) as statements:
+        response = test_client.get('/profil')
+    assert b'nouveau@example.com' in response.data
+    assert len(statements) == 1
+    with test_client.session_transaction() as sess:
+        assert sess[SNAPSHOT_SESSION_KEY]['cv'] == 2
+
+
+def test_missing_published_version_reloads_identity(app, db, test_client, snapshots):
+    """
+    GIVEN un client connecté avec un instantané d'identité en session
+    WHEN la version publiée a disparu du cache (expirée, évincée)
+    THEN la requête suivante recharge l'utilisateur depuis la base au lieu de croire l'instantané
+    """
+    customer = Customer(username='fatou', email='fatou@example.com', password='x')
+    db.session.add(customer)
+    db.session.commit()
+    _login(test_client, customer)
+    test_client.get('/profil')
+    cache.clear()
+
+    with _customer_queries(db) as statements:
+        assert test_client.get('/profil').status_code == 200
+    assert len(statements) == 1
+
+
+def test_deleted_account_snapshot_is_rejected(app, db, snapshots):
+    """
+    GIVEN un instantané d'identité valide pour un client
+    WHEN le compte est supprimé
+    THEN l'instantané n'est plus accepté et l'utilisateur n'est plus chargé
+    """
+    customer = Customer(username='ibrahima', email='ibrahima@example.com', password='x')
+    db.session.add(customer)
+    db.session.commit()
+    user_id_str = customer.get_id()
+
+    with app.test_request_context():
+        assert load_identity(user_id_str) is not None
+        snapshot = session[SNAPSHOT_SESSION_KEY]
+
+        db.session.delete(customer)
+        db.session.commit()
+        forget_identity(user_id_str)
+
+        session[SNAPSHOT_SESSION_KEY] = snapshot
+        assert load_identity(user_id_str) is None
+        assert SNAPSHOT_SESSION_KEY not in session
+
+
+def test_snapshot_disabled_without_shared_cache(app):
+    """
+    GIVEN la configuration par défaut (cache SimpleCache propre à chaque worker)
+    WHEN l'application est créée
+    THEN l'instantané d'identité est désactivé
+    """
+    assert app.config['CACHE_TYPE'] == 'SimpleCache'
+    assert app.config['IDENTITY_SNAPSHOT'] is False
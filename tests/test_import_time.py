@@ -0,0 +1,12 @@
+from importtime_report import measure_imports, heavy_modules_loaded
+
+
+def test_startup_does_not_import_heavy_modules():
+    """
+    GIVEN le rapport python -X importtime de create_app()
+    WHEN on liste les modules importés au démarrage
+    THEN aucun module lourd (stripe, openpyxl, cloudinary, PIL) n'est chargé
+    """
+    imports = measure_imports()
+    assert any(name == 'app' for name, _, _ in imports)
+    assert heavy_modules_loaded(imports) == []
@@ -0,0 +1,50 @@
+from flask import render_template_string
+from app.extensions import lazy_context
+from app.utils.lazy_context import unused_values
+from app.utils.metrics import metrics
+
+
+def _counting_factory(monkeypatch, name, result):
+    calls = []
+
+    def factory():
+        calls.append(name)
+        return result
+    monkeypatch.setitem(lazy_context._factories, name, factory)
+    return calls
+
+
+def test_unused_context_values_are_not_computed(app, db, monkeypatch):
+    """
+    GIVEN les valeurs de contexte globales `active_banners` et `newsletter_form`
+    WHEN un template qui ne les lit pas est rendu (ex. corps d'e-mail)
+    THEN aucune n'est calculée, et elles sont signalées comme inutilisées par ce template
+    """
+    metrics.reset()
+    banner_calls = _counting_factory(monkeypatch, 'active_banners', [])
+    form_calls = _counting_factory(monkeypatch, 'newsletter_form', None)
+
+    with app.test_request_context():
+        assert render_template_string('Commande confirmée') == 'Commande confirmée'
+
+    assert banner_calls == [] and form_calls == []
+    assert set(unused_values(lazy_context, '<string>')) >= {'active_banners', 'newsletter_form'}
+
+
+def test_context_value_is_computed_once_per_request(app, db, monkeypatch):
+    """
+    GIVEN un template qui lit plusieurs fois `active_banners`
+    WHEN il est rendu deux fois dans la même requête
+    THEN la valeur n'est calculée qu'une fois et son utilisation est comptabilisée
+    """
+    metrics.reset()
+    banner_calls = _counting_factory(monkeypatch, 'active_banners', ['a', 'b'])
+    template = '{% if active_banners %}{{ active_banners|length }}{% endif %}'
+
+    with app.test_request_context():
+        assert render_template_string(template) == '2'
+        assert render_template_string(template) == '2'
+
+    assert banner_calls == ['active_banners']
+    assert metrics.get('template_context_used', template='<string>', variable='active_banners') == 2
+    assert 'active_banners' not in unused_values(lazy_context, '<string>')
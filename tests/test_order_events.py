@@ -0,0 +1,45 @@
+from datetime import datetime, timedelta
+from app.models import Customer, Order
+from app.utils.order_events import set_order_status, orders_entering, throughput_by_status, time_in_status
+
+
+def test_status_transitions_are_logged_and_reported(app, db):
+    """
+    GIVEN une commande créée puis passée par 'Payée' et 'Expédiée'
+    WHEN les transitions sont journalisées avec leurs dates
+    THEN les rapports donnent les entrées par statut, les commandes expédiées et le temps passé dans 'Payée'
+    """
+    customer = Customer(username='ibou', email='ibou@example.com', password='x')
+    db.session.add(customer)
+    db.session.commit()
+
+    order = Order(customer_id=customer.id, total_price=2500)
+    created = set_order_status(order, 'En attente de paiement', actor='customer-1')
+    db.session.add(order)
+    db.session.commit()
+    assert created.from_status is None
+
+    paid = set_order_status(order, 'Payée', actor='stripe')
+    db.session.commit()
+    shipped_event = set_order_status(order, 'Expédiée', actor='staff-1')
+    assert set_order_status(order, 'Expédiée') is None
+    db.session.commit()
+
+    t0 = datetime(2026, 1, 5, 8, 0)
+    created.created_at = t0
+    paid.created_at = t0 + timedelta(minutes=5)
+    shipped_event.created_at = t0 + timedelta(hours=3, minutes=5)
+    db.session.commit()
+
+    start, end = t0, t0 + timedelta(days=1)
+    assert [e.to_status for e in order.status_events] == ['En attente de paiement', 'Payée', 'Expédiée']
+    assert throughput_by_status(start, end) == {'En attente de paiement': 1, 'Payée': 1, 'Expédiée': 1}
+    assert orders_entering('Expédiée', start, end) == [order.id]
+
+    paid_stats = time_in_status('Payée', start, end)
+    assert paid_stats['orders'] == 1 and paid_stats['still_in_status'] == 0
+    assert paid_stats['average_seconds'] == 3 * 3600
+
+    shipped_stats = time_in_status('Expédiée', start, end, now=t0 + timedelta(hours=4, minutes=5))
+    assert shipped_stats['still_in_status'] == 1
+    assert shipped_stats['max_seconds'] == 3600
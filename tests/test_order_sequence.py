@@ -0,0 +1,62 @@
+from app.models import Customer, Order, Milestone
+from app.utils.order_sequence import assign_sequence_number, peek_next_order_number
+
+
+def _order(db, customer, status):
+    order = Order(customer_id=customer.id, total_price=1000, status=status)
+    db.session.add(order)
+    db.session.flush()
+    return order
+
+
+def test_finalized_orders_get_consecutive_numbers_and_milestones(app, db):
+    """
+    GIVEN un palier gagnant à la 2e commande finalisée et une commande en attente intercalée
+    WHEN les commandes sont finalisées une à une
+    THEN les rangs se suivent sans tenir compte des identifiants et seule la 2e est gagnante
+    """
+    customer = Customer(username='fatou', email='fatou@example.com', password='x')
+    db.session.add_all([customer, Milestone(order_number=2)])
+    db.session.commit()
+    assert peek_next_order_number() == 1
+
+    first = _order(db, customer, 'Paiement à la livraison')
+    assert assign_sequence_number(first)
+    pending = _order(db, customer, 'En attente de paiement')
+    assert not assign_sequence_number(pending)
+    second = _order(db, customer, 'Payée')
+    assign_sequence_number(second)
+    db.session.commit()
+
+    assert (first.sequence_number, second.sequence_number) == (1, 2)
+    assert pending.sequence_number is None
+    assert not first.is_milestone and second.is_milestone
+    assert peek_next_order_number() == 3
+
+    # Une commande déjà numérotée garde son rang si son statut change encore
+    second.status = 'Expédiée'
+    assert not assign_sequence_number(second)
+    assert second.sequence_number == 2
+
+
+def test_milestone_added_elsewhere_applies_immediately(app, db):
+    """
+    GIVEN une première commande finalisée alors qu'aucun palier n'existe
+    WHEN un palier est ajouté directement en base, comme depuis un autre worker
+    THEN la commande suivante qui atteint ce rang est gagnante
+    """
+    customer = Customer(username='awa', email='awa@example.com', password='x')
+    db.session.add(customer)
+    db.session.commit()
+    first = _order(db, customer, 'Payée')
+    assign_sequence_number(first)
+    db.session.commit()
+    assert not first.is_milestone
+
+    db.session.execute(db.insert(Milestone).values(order_number=2))
+    db.session.commit()
+
+    second = _order(db, customer, 'Payée')
+    assign_sequence_number(second)
+    db.session.commit()
+    assert second.is_milestone
@@ -0,0 +1,62 @@
+from datetime import datetime, timedelta
+from app.extensions import cache
+from app.models import Post, StaffUser
+from app.utils.post_media import POST_CARD_CACHE_KEY, youtube_video_id
+
+
+def _author(db):
+    author = StaffUser(username='redac', email='redac@example.com', password='x', role='editor')
+    db.session.add(author)
+    db.session.flush()
+    return author
+
+
+def test_embed_and_summary_computed_on_save(app, db, test_client):
+    """
+    GIVEN une réalisation avec un lien YouTube et une longue description
+    WHEN elle est enregistrée, puis son lien modifié
+    THEN l'URL d'intégration, la miniature et le résumé sont calculés à l'enregistrement
+    """
+    cache.clear()
+    post = Post(title='Poulailler', description='Construction du nouveau poulailler. ' * 10,
+                video_url='https://www.youtube.com/watch?v=dQw4w9WgXcQ&t=10', author_id=_author(db).id)
+    db.session.add(post)
+    db.session.commit()
+    assert post.embed_url == 'https://www.youtube.com/embed/dQw4w9WgXcQ'
+    assert post.thumbnail_url == 'https://img.youtube.com/vi/dQw4w9WgXcQ/hqdefault.jpg'
+    assert len(post.summary) <= 100 and post.summary.endswith('...')
+
+    post.video_url = 'https://youtu.be/abc123'
+    db.session.commit()
+    assert post.video_id == 'abc123'
+    assert 'https://www.youtube.com/embed/abc123' in test_client.get(f'/realisations/{post.id}').get_data(as_text=True)
+    assert youtube_video_id('https://www.youtube.com/shorts/xyz') == 'xyz'
+    assert youtube_video_id('https://example.com/watch?v=xyz') is None
+
+
+def test_realisations_feed_pages_and_refreshes_cards(app, db, test_client):
+    """
+    GIVEN quinze réalisations
+    WHEN on parcourt le fil des réalisations, puis qu'une réalisation est renommée
+    THEN le fil est découpé en pages de douze et la nouvelle version a sa propre carte en cache
+    """
+    cache.clear()
+    author = _author(db)
+    start = datetime(2026, 1, 1)
+    posts = [Post(title=f'Chantier {i:02d}', description=f'Étape {i}', author_id=author.id,
+                  created_at=start + timedelta(days=i)) for i in range(15)]
+    db.session.add_all(posts)
+    db.session.commit()
+
+    first = test_client.get('/realisations').get_data(as_text=True)
+    assert 'Chantier 14' in first and 'Chantier 03' in first and 'Chantier 02' not in first
+    assert cache.get(POST_CARD_CACHE_KEY.format(posts[14].id, 1))
+    next_url = first.split('href="/realisations?after=')[1].split('"')[0]
+    second = test_client.get(f'/realisations?after={next_url}').get_data(as_text=True)
+    assert 'Chantier 02' in second and 'Chantier 00' in second and 'Chantier 03' not in second
+
+    posts[14].title = 'Chantier terminé'
+    db.session.commit()
+    assert posts[14].version == 2
+    assert 'Chantier terminé' in test_client.get('/realisations').get_data(as_text=True)
+    assert 'Chantier terminé' in cache.get(POST_CARD_CACHE_KEY.format(posts[14].id, 2))
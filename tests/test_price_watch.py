@@ -0,0 +1,119 @@
+from datetime import datetime, timedelta, timezone
+from app.models import (Category, Customer, CustomerNotification, Product, SmartShopping,
+                        SmartShoppingReservation)
+from app.utils import notifications
+from app.utils.notifications import enqueue_notifications, send_pending_notifications, PRICE_DROP
+from app.utils.price_watch import expire_reservations
+
+
+def _setup(db):
+    category = Category(name='Volaille')
+    customers = [Customer(username=f'client{i}', email=f'client{i}@example.com', password='x') for i in range(2)]
+    db.session.add_all([category, *customers])
+    db.session.flush()
+    poulet = Product(name='Poulet fermier', price=3500, stock=10, category_id=category.id)
+    pintade = Product(name='Pintade', price=5000, stock=10, category_id=category.id)
+    db.session.add_all([poulet, pintade])
+    db.session.flush()
+    return customers, poulet, pintade
+
+
+def _watch(customer, product, desired_price):
+    return SmartShopping(customer_id=customer.id, product_id=product.id, desired_price=desired_price)
+
+
+def test_price_change_triggers_matching_watches_only(app, db):
+    """
+    GIVEN des veilles de prix sur deux produits
+    WHEN le prix d'un produit baisse
+    THEN seules les veilles de ce produit dont le prix souhaité est atteint sont déclenchées,
+         avec une réservation et une notification en attente
+    """
+    (alice, bob), poulet, pintade = _setup(db)
+    reached = _watch(alice, poulet, 3000)
+    too_low = _watch(bob, poulet, 2500)
+    other_product = _watch(bob, pintade, 6000)
+    db.session.add_all([reached, too_low, other_product])
+    db.session.commit()
+
+    poulet.price = 3000
+    db.session.commit()
+    db.session.expire_all()
+
+    assert (reached.status, too_low.status, other_product.status) == ('triggered', 'active', 'active')
+    assert reached.triggered_at is not None
+    (reservation,) = reached.reservations
+    assert reservation.status == 'active'
+    assert reservation.expires_at - reservation.reserved_at == timedelta(hours=24)
+    notifications = db.session.execute(db.select(CustomerNotification)).scalars().all()
+    assert [(n.customer_id, n.kind, n.product_id, n.price, n.sent_at) for n in notifications] == [
+        (alice.id, 'price_drop', poulet.id, 3000, None)]
+
+    # Une nouvelle baisse ne redéclenche pas une veille déjà déclenchée
+    poulet.price = 2400
+    db.session.commit()
+    db.session.expire_all()
+    assert too_low.status == 'triggered'
+    assert db.session.execute(db.select(db.func.count(CustomerNotification.id))).scalar() == 2
+
+
+def test_notifications_batched_per_customer_and_reservations_expire(app, db):
+    """
+    GIVEN un client dont deux veilles sont déclenchées
+    WHEN les notifications sont envoyées puis les réservations échues balayées
+    THEN le client reçoit un seul e-mail et ses réservations expirent
+    """
+    (alice, _), poulet, pintade = _setup(db)
+    db.session.add_all([_watch(alice, poulet, 3200), _watch(alice, pintade, 4500)])
+    db.session.commit()
+    poulet.price = 3200
+    pintade.price = 4500
+    db.session.commit()
+
+    mailman = app.extensions['mailman']
+    mailman.outbox = []
+    assert send_pending_notifications() == 2
+    assert send_pending_notifications() == 0
+    assert len(mailman.outbox) == 1
+    assert 'Poulet fermier' in mailman.outbox[0].body and 'Pintade' in mailman.outbox[0].body
+
+    later = datetime.now(timezone.utc).replace(tzinfo=None) + timedelta(hours=25)
+    assert expire_reservations(now=later) == 2
+    statuses = db.session.execute(db.select(SmartShoppingReservation.status)).scalars().all()
+    assert statuses == ['expired', 'expired']
+
+
+def test_concurrent_senders_do_not_send_twice(app, db, monkeypatch):
+    """
+    GIVEN des notifications en attente pour deux clients
+    WHEN un second worker passe pendant que le premier envoie ses e-mails, puis qu'un bail a expiré
+    THEN le second n'envoie rien de ce qui est déjà pris en charge, et un bail expiré est repris
+    """
+    (alice, bob), poulet, _ = _setup(db)
+    enqueue_notifications([{'customer_id': customer.id, 'kind': PRICE_DROP, 'product_id': poulet.id, 'price': 3000}
+                           for customer in (alice, bob)])
+    db.session.commit()
+    mailman = app.extensions['mailman']
+    mailman.outbox = []
+    overlapping = []
+
+    class _SlowMessage(notifications.EmailMessage):
+        def send(self, *args, **kwargs):
+            if not overlapping:
+                overlapping.append(send_pending_notifications())
+            return super().send(*args, **kwargs)
+
+    monkeypatch.setattr(notifications, 'EmailMessage', _SlowMessage)
+    assert send_pending_notifications() == 2
+    assert overlapping == [0] and len(mailman.outbox) == 2
+
+    # Prise en charge abandonnée (processus arrêté) : reprise après NOTIFICATION_CLAIM_SECONDS
+    enqueue_notifications([{'customer_id': alice.id, 'kind': PRICE_DROP, 'product_id': poulet.id, 'price': 2900}])
+    db.session.commit()
+    now = datetime.now(timezone.utc).replace(tzinfo=None)
+    db.session.execute(db.update(CustomerNotification).where(CustomerNotification.sent_at.is_(None))
+                       .values(claimed_at=now - timedelta(seconds=app.config['NOTIFICATION_CLAIM_SECONDS'] - 60)))
+    db.session.commit()
+    assert send_pending_notifications() == 0
+    later = now + timedelta(seconds=120)
+    assert send_pending_notifications(now=later) == 1
@@ -0,0 +1,65 @@
+from werkzeug.middleware.proxy_fix import ProxyFix
+from app.extensions import limiter
+from app.utils.metrics import metrics
+from app.utils.rate_limits import client_ip
+
+
+def test_contact_form_is_rate_limited(app, test_client):
+    """
+    GIVEN une limite de 2 envois par minute sur le formulaire de contact
+    WHEN le même client envoie le formulaire 3 fois
+    THEN le troisième envoi est rejeté en 429 et comptabilisé dans les métriques
+    """
+    app.config['RATELIMIT_FORM_IP'] = '2 per minute'
+    limiter.reset()
+    metrics.reset()
+    form_data = {'name': 'Test', 'email': 'test@example.com', 'message': 'Bonjour'}
+    try:
+        assert test_client.post('/contact', data=form_data).status_code == 302
+        assert test_client.post('/contact', data=form_data).status_code == 302
+        assert test_client.post('/contact', data=form_data).status_code == 429
+        assert metrics.get('rate_limit_rejections', endpoint='main.contact', limit='2 per 1 minute') == 1
+    finally:
+        app.config.pop('RATELIMIT_FORM_IP')
+        limiter.reset()
+
+
+def test_login_is_limited_per_username(app, test_client):
+    """
+    GIVEN une limite de 2 tentatives de connexion par minute et par nom d'utilisateur
+    WHEN trois tentatives visent le même nom, puis une vise un autre nom
+    THEN la troisième est rejetée et l'autre nom d'utilisateur n'est pas affecté
+    """
+    app.config['RATELIMIT_LOGIN_USERNAME'] = '2 per minute'
+    limiter.reset()
+    try:
+        for _ in range(2):
+            assert test_client.post('/auth/login', data={'username': 'victime', 'password': 'x'}).status_code == 200
+        assert test_client.post('/auth/login', data={'username': 'victime', 'password': 'x'}).status_code == 429
+        assert test_client.post('/auth/login', data={'username': 'autre', 'password': 'x'}).status_code == 200
+    finally:
+        app.config.pop('RATELIMIT_LOGIN_USERNAME')
+        limiter.reset()
+
+
+def test_forged_forwarded_for_does_not_change_client_ip(app, test_client, monkeypatch):
+    """
+    GIVEN une limite de 2 envois par minute sur le formulaire de contact, sans proxy de confiance
+    WHEN un client change d'en-tête X-Forwarded-For à chaque envoi
+    THEN il reste limité ; derrière un proxy de confiance, seule l'adresse ajoutée par celui-ci compte
+    """
+    monkeypatch.setitem(app.config, 'RATELIMIT_FORM_IP', '2 per minute')
+    limiter.reset()
+    form_data = {'name': 'Test', 'email': 'test@example.com', 'message': 'Bonjour'}
+    try:
+        statuses = [test_client.post('/contact', data=form_data,
+                                     headers={'X-Forwarded-For': f'10.0.0.{i}'}).status_code for i in range(3)]
+        assert statuses == [302, 302, 429]
+    finally:
+        limiter.reset()
+
+    monkeypatch.setattr(app, 'wsgi_app', ProxyFix(app.wsgi_app, x_for=1))
+    seen = []
+    monkeypatch.setitem(app.view_functions, 'main.index', lambda: seen.append(client_ip()) or '')
+    test_client.get('/', headers={'X-Forwarded-For': '6.6.6.6, 203.0.113.7'})
+    assert seen == ['203.0.113.7']
@@ -0,0 +1,79 @@
+from datetime import datetime, timedelta, timezone
+from app.models import Category, Customer, CustomerNotification, Product, RestockEvent, WishlistItem
+from app.utils.notification_worker import process_notifications
+from app.utils.restock import process_restock_events
+
+
+def _wishlisted_product(db, followers=3):
+    category = Category(name='Volaille')
+    db.session.add(category)
+    db.session.flush()
+    product = Product(name='Pintade', price=5000, stock=0, category_id=category.id)
+    customers = [Customer(username=f'client{i}', email=f'client{i}@example.com', password='x')
+                 for i in range(followers)]
+    db.session.add_all([product, *customers])
+    db.session.flush()
+    db.session.add_all(WishlistItem(customer_id=c.id, product_id=product.id) for c in customers)
+    db.session.commit()
+    return product
+
+
+def _notification_count(db):
+    return db.session.execute(db.select(db.func.count(CustomerNotification.id))).scalar()
+
+
+def test_restock_recorded_then_fanned_out_in_background(app, db):
+    """
+    GIVEN un produit épuisé suivi par trois clients
+    WHEN son stock redevient positif puis que le worker passe
+    THEN la sauvegarde n'enregistre qu'un événement, et le worker notifie chaque client par e-mail
+    """
+    product = _wishlisted_product(db)
+    product.stock = 5
+    db.session.commit()
+
+    (event,) = db.session.execute(db.select(RestockEvent)).scalars().all()
+    assert event.product_id == product.id and event.processed_at is None
+    assert _notification_count(db) == 0
+
+    mailman = app.extensions['mailman']
+    mailman.outbox = []
+    while process_notifications():
+        pass
+    db.session.expire_all()
+    assert event.processed_at is not None and event.fanout_count == 3
+    assert sorted(m.to[0] for m in mailman.outbox) == ['client0@example.com', 'client1@example.com', 'client2@example.com']
+    assert 'Pintade' in mailman.outbox[0].body
+
+
+def test_restock_notifications_respect_cooldown(app, db):
+    """
+    GIVEN des clients déjà prévenus du retour en stock d'un produit
+    WHEN le produit s'épuise et revient deux fois, avant puis après le délai de carence
+    THEN les clients ne sont prévenus à nouveau qu'après le délai
+    """
+    product = _wishlisted_product(db, followers=2)
+    product.stock = 5
+    db.session.commit()
+    process_restock_events()
+    assert _notification_count(db) == 2
+
+    product.stock = 0
+    db.session.commit()
+    product.stock = 2
+    db.session.commit()
+    # Deux événements en attente pour le même produit : une seule diffusion
+    product.stock = 0
+    db.session.commit()
+    product.stock = 1
+    db.session.commit()
+    assert process_restock_events() == 1
+    assert _notification_count(db) == 2
+
+    product.stock = 0
+    db.session.commit()
+    product.stock = 3
+    db.session.commit()
+    later = datetime.now(timezone.utc).replace(tzinfo=None) + timedelta(hours=25)
+    process_restock_events(now=later)
+    assert _notification_count(db) == 4
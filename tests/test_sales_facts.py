@@ -0,0 +1,126 @@
+from datetime import date, datetime
+from sqlalchemy import event
+from app.models import Category, Customer, Order, OrderItem, Product, SalesDaily
+from app.utils.order_events import set_order_status
+from app.utils.sales_facts import rebuild_sales_facts, refresh_sales_facts, sales_rollup
+
+
+def _catalog(db):
+    volaille, oeufs = Category(name='Volaille'), Category(name='Oeufs')
+    customer = Customer(username='awa', email='awa@example.com', password='x')
+    db.session.add_all([volaille, oeufs, customer])
+    db.session.flush()
+    # Deux produits distincts portant le même nom
+    poulet_fermier = Product(name='Poulet', price=5000, stock=50, category_id=volaille.id)
+    poulet_chair = Product(name='Poulet', price=3000, stock=50, category_id=volaille.id)
+    plateau = Product(name="Plateau d'oeufs", price=2500, stock=50, category_id=oeufs.id)
+    db.session.add_all([poulet_fermier, poulet_chair, plateau])
+    db.session.commit()
+    return customer, (poulet_fermier, poulet_chair, plateau), (volaille, oeufs)
+
+
+def _order(db, customer, ordered_at, lines, status='Payée'):
+    order = Order(customer_id=customer.id, date_ordered=ordered_at,
+                  total_price=sum(product.price * quantity for product, quantity in lines))
+    set_order_status(order, status)
+    db.session.add(order)
+    db.session.flush()
+    db.session.add_all(OrderItem(order_id=order.id, product_id=product.id, quantity=quantity,
+                                 price_at_purchase=product.price) for product, quantity in lines)
+    db.session.commit()
+    return order
+
+
+def _facts(db):
+    db.session.expire_all()
+    return sorted((fact.day, fact.product_id, fact.category_id, fact.units, fact.revenue, fact.order_count)
+                  for fact in db.session.execute(db.select(SalesDaily)).scalars())
+
+
+def test_facts_follow_order_statuses_and_categories(app, db):
+    """
+    GIVEN des commandes finalisées, en attente puis annulées sur deux jours
+    WHEN leurs statuts changent et qu'un produit change de catégorie
+    THEN la table de faits reste identique à un recalcul complet
+    """
+    customer, (fermier, chair, plateau), (volaille, oeufs) = _catalog(db)
+    _order(db, customer, datetime(2026, 3, 1, 9), [(fermier, 2), (plateau, 1)])
+    _order(db, customer, datetime(2026, 3, 1, 18), [(fermier, 1)], status='Paiement à la livraison')
+    pending = _order(db, customer, datetime(2026, 3, 2, 10), [(chair, 4)], status='En attente de paiement')
+    cancelled = _order(db, customer, datetime(2026, 3, 2, 11), [(plateau, 3)])
+
+    assert _facts(db) == sorted([
+        (date(2026, 3, 1), fermier.id, volaille.id, 3, 15000, 2),
+        (date(2026, 3, 1), plateau.id, oeufs.id, 1, 2500, 1),
+        (date(2026, 3, 2), plateau.id, oeufs.id, 3, 7500, 1),
+    ])
+
+    set_order_status(pending, 'Payée')
+    set_order_status(cancelled, 'Annulée')
+    db.session.commit()
+    chair.category_id = oeufs.id
+    db.session.commit()
+    assert _facts(db) == sorted([
+        (date(2026, 3, 1), fermier.id, volaille.id, 3, 15000, 2),
+        (date(2026, 3, 1), plateau.id, oeufs.id, 1, 2500, 1),
+        (date(2026, 3, 2), chair.id, oeufs.id, 4, 12000, 1),
+    ])
+
+    incremental = _facts(db)
+    assert rebuild_sales_facts() == 3
+    assert _facts(db) == incremental
+
+
+def test_rollups_and_dashboard(app, db, test_client):
+    """
+    GIVEN des ventes de deux produits homonymes sur deux mois
+    WHEN on agrège par jour, mois, produit et catégorie, puis qu'on ouvre le tableau de bord
+    THEN les produits homonymes restent distincts et la période est respectée
+    """
+    customer, (fermier, chair, plateau), (volaille, oeufs) = _catalog(db)
+    _order(db, customer, datetime(2026, 2, 27, 12), [(chair, 5)])
+    _order(db, customer, datetime(2026, 3, 1, 12), [(fermier, 2), (chair, 1), (plateau, 1)])
+
+    by_day = sales_rollup(date(2026, 2, 1), date(2026, 3, 31))
+    assert [(row.label, row.revenue) for row in by_day] == [('2026-02-27', 15000), ('2026-03-01', 15500)]
+    by_month = sales_rollup(date(2026, 2, 1), date(2026, 3, 31), by='month')
+    assert [(row.label, row.units) for row in by_month] == [('2026-02', 5), ('2026-03', 4)]
+    by_product = sales_rollup(date(2026, 2, 1), date(2026, 3, 31), by='product')
+    assert [(row.key, row.units) for row in by_product] == [(chair.id, 6), (fermier.id, 2), (plateau.id, 1)]
+    by_category = sales_rollup(date(2026, 3, 1), date(2026, 3, 1), by='category')
+    assert [(row.label, row.revenue) for row in by_category] == [('Volaille', 13000), ('Oeufs', 2500)]
+
+    page = test_client.get('/admin/dashboard?start_date=2026-03-01&end_date=2026-03-01').get_data(as_text=True)
+    assert f'/admin/product/edit/{fermier.id}' in page and f'/admin/product/edit/{chair.id}' in page
+    assert '15500' in page
+
+
+def test_refresh_overwrites_cells_written_concurrently(app, db):
+    """
+    GIVEN une cellule (jour, produit) écrite par une autre transaction pendant le recalcul
+    WHEN la même cellule est recalculée
+    THEN la ligne existante est mise à jour avec l'agrégat recalculé, sans conflit de clé primaire
+    """
+    customer, (fermier, chair, plateau), (volaille, oeufs) = _catalog(db)
+    _order(db, customer, datetime(2026, 3, 1, 9), [(fermier, 2)])
+    db.session.execute(db.delete(SalesDaily))
+    db.session.commit()
+    inserted = []
+
+    def _refresh_meanwhile(conn, cursor, statement, parameters, context, executemany):
+        if statement.startswith('INSERT INTO sales_daily') and not inserted:
+            # Recalcul concurrent, validé entre le début du nôtre et son écriture
+            cursor.connection.execute(
+                'INSERT INTO sales_daily (day, product_id, category_id, units, revenue, order_count) '
+                'VALUES (?, ?, ?, 1, 5000, 1)', ('2026-03-01', fermier.id, volaille.id))
+            inserted.append(statement)
+
+    event.listen(db.engine, 'before_cursor_execute', _refresh_meanwhile)
+    try:
+        assert refresh_sales_facts({(date(2026, 3, 1), fermier.id), (date(2026, 3, 1), plateau.id)}) == 2
+        db.session.commit()
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', _refresh_meanwhile)
+
+    assert inserted
+    assert _facts(db) == [(date(2026, 3, 1), fermier.id, volaille.id, 2, 10000, 1)]
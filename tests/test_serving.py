@@ -0,0 +1,27 @@
+from app.serving import serving_profile, pool_dimensions, build_engine_options
+
+
+def test_pool_is_sized_from_workers_and_threads():
+    """
+    GIVEN un profil gthread de 2 workers x 4 threads et un budget de 20 connexions
+    WHEN on calcule les options du moteur PostgreSQL
+    THEN chaque worker a un pool de 4 connexions, un débordement limité et un statement_timeout
+    """
+    profile = serving_profile({'WEB_CONCURRENCY': '2', 'WEB_THREADS': '4', 'DB_MAX_CONNECTIONS': '20',
+                               'DB_STATEMENT_TIMEOUT_MS': '5000'})
+    options = build_engine_options('postgresql://u:p@localhost/db', profile)
+    assert options['pool_size'] == 4
+    assert options['max_overflow'] == 2
+    assert options['pool_pre_ping'] is True
+    assert options['connect_args'] == {'options': '-c statement_timeout=5000'}
+
+
+def test_pool_respects_connection_budget():
+    """
+    GIVEN plus de threads au total que de connexions autorisées par le plan
+    WHEN on calcule la taille du pool
+    THEN le budget est réparti entre les workers sans débordement
+    """
+    profile = serving_profile({'WEB_CONCURRENCY': '4', 'WEB_THREADS': '8', 'DB_MAX_CONNECTIONS': '20'})
+    assert pool_dimensions(profile) == (5, 0)
+    assert build_engine_options('sqlite:///:memory:', profile) == {}
@@ -0,0 +1,69 @@
+from app.models import Category, LowStockAlert, Product, StaffUser
+from app.utils.stock_alerts import send_low_stock_digest
+
+
+def _product(db, name='Poulet fermier', stock=10, threshold=5):
+    category = db.session.execute(db.select(Category).filter_by(name='Volaille')).scalar()
+    if category is None:
+        category = Category(name='Volaille')
+        db.session.add(category)
+        db.session.flush()
+    product = Product(name=name, price=3500, stock=stock, min_stock_threshold=threshold, category_id=category.id)
+    db.session.add(product)
+    db.session.commit()
+    return product
+
+
+def _alerts(db):
+    return db.session.execute(db.select(LowStockAlert)).scalars().all()
+
+
+def test_alert_follows_threshold_crossings(app, db):
+    """
+    GIVEN un produit au-dessus de son seuil de stock
+    WHEN son stock descend sous le seuil, continue de baisser, puis remonte
+    THEN une alerte est ouverte, mise à jour, puis supprimée
+    """
+    product = _product(db)
+    assert _alerts(db) == []
+
+    product.stock -= 6
+    db.session.commit()
+    (alert,) = _alerts(db)
+    assert (alert.product_id, alert.stock, alert.threshold) == (product.id, 4, 5)
+
+    product.stock -= 4
+    db.session.commit()
+    (alert,) = _alerts(db)
+    assert alert.stock == 0
+
+    product.stock = 20
+    db.session.commit()
+    assert _alerts(db) == []
+
+    # Un seuil relevé au-dessus du stock ouvre aussi une alerte
+    product.min_stock_threshold = 25
+    db.session.commit()
+    assert [a.threshold for a in _alerts(db)] == [25]
+
+
+def test_digest_groups_new_alerts_once(app, db):
+    """
+    GIVEN deux produits passés sous leur seuil et un administrateur
+    WHEN le récapitulatif est envoyé deux fois
+    THEN un seul e-mail liste les deux produits et le second passage n'envoie rien
+    """
+    db.session.add(StaffUser(username='admin', email='admin@example.com', password='x', role='admin'))
+    _product(db, name='Poulet fermier', stock=2)
+    _product(db, name='Pintade', stock=0)
+    mailman = app.extensions['mailman']
+    mailman.outbox = []
+
+    assert send_low_stock_digest() == 2
+    assert send_low_stock_digest() == 0
+
+    assert len(mailman.outbox) == 1
+    message = mailman.outbox[0]
+    assert message.to == ['admin@example.com']
+    assert 'Poulet fermier' in message.body and 'Pintade' in message.body
+    assert all(alert.notified_at is not None for alert in _alerts(db))
@@ -0,0 +1,61 @@
+from app.models import Category, Customer, Product, Review
+from app.utils.metrics import metrics
+from app.utils.streaming import FLUSH_MARKER
+
+
+def _product_with_review(db):
+    category = Category(name='Volaille')
+    customer = Customer(username='awa', email='awa@example.com', password='x')
+    db.session.add_all([category, customer])
+    db.session.flush()
+    product = Product(name='Poulet fermier', price=3500, stock=4, category_id=category.id)
+    db.session.add(product)
+    db.session.flush()
+    db.session.add(Review(rating=5, comment='Excellent poulet', product_id=product.id, customer_id=customer.id))
+    db.session.commit()
+    return product
+
+
+def test_product_page_streams_head_before_reviews(app, db, test_client):
+    """
+    GIVEN un produit avec un avis
+    WHEN on ouvre sa page
+    THEN le haut de page part dans un premier morceau, avant les avis, sans marqueur de flush
+    """
+    product = _product_with_review(db)
+    response = test_client.get(f'/produit/{product.id}')
+    chunks = [chunk.decode() for chunk in response.response]
+    response.close()
+
+    assert '</nav>' in chunks[0] and 'Excellent poulet' not in chunks[0]
+    page = ''.join(chunks)
+    assert 'Poulet fermier' in page and 'Excellent poulet' in page
+    assert FLUSH_MARKER not in page
+
+
+def test_session_writes_happen_before_streaming(app, db, test_client, monkeypatch):
+    """
+    GIVEN un message flash en attente et la protection CSRF active
+    WHEN on ouvre deux fois la page produits
+    THEN le message n'est affiché qu'une fois et le jeton CSRF de la page est enregistré en session
+    """
+    monkeypatch.setitem(app.config, 'WTF_CSRF_ENABLED', True)
+    with test_client.session_transaction() as sess:
+        sess['_flashes'] = [('success', 'Commande validée')]
+
+    assert 'Commande validée' in test_client.get('/produits').get_data(as_text=True)
+    assert 'Commande validée' not in test_client.get('/produits').get_data(as_text=True)
+    with test_client.session_transaction() as sess:
+        assert sess.get('csrf_token')
+
+
+def test_streaming_can_be_disabled(app, db, test_client, monkeypatch):
+    """
+    GIVEN STREAM_TEMPLATES désactivé
+    WHEN on ouvre la page produits
+    THEN elle est rendue en un seul bloc
+    """
+    monkeypatch.setitem(app.config, 'STREAM_TEMPLATES', False)
+    streams = metrics.get('template_streams', template='produits.html')
+    assert 'Nos Produits' in test_client.get('/produits').get_data(as_text=True)
+    assert metrics.get('template_streams', template='produits.html') == streams
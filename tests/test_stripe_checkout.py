@@ -0,0 +1,134 @@
+from datetime import timedelta
+import pytest
+import sqlalchemy as sa
+from app.catalog_snapshot import current_catalog
+from app.models import Customer, Product, Category, CartItem, Order, OrderStatusEvent, WebhookEvent
+from app.payments.stripe_checkout import sweep_abandoned_orders
+from tests.stripe_stub import StripeStub
+
+
+@pytest.fixture
+def stripe_stub(app, monkeypatch):
+    stub = StripeStub().start()
+    monkeypatch.setitem(app.config, 'STRIPE_API_BASE', stub.url)
+    monkeypatch.setitem(app.config, 'STRIPE_SECRET_KEY', 'sk_test_stub')
+    yield stub
+    stub.stop()
+
+
+def _customer_with_cart(db, test_client):
+    customer = Customer(username='khady', email='khady@example.com', password='x')
+    category = Category(name='Fruits')
+    db.session.add_all([customer, category])
+    db.session.flush()
+    product = Product(name='Mangues', price=1500, stock=10, category_id=category.id)
+    db.session.add(product)
+    db.session.flush()
+    cart_item = CartItem(customer_id=customer.id, product_id=product.id, quantity=2)
+    db.session.add(cart_item)
+    db.session.commit()
+    with test_client.session_transaction() as sess:
+        sess['_user_id'] = customer.get_id()
+    return customer, cart_item
+
+
+def test_unchanged_cart_reuses_pending_order_and_session(app, db, test_client, stripe_stub):
+    """
+    GIVEN un client avec un panier, et l'API Stripe remplacée par un bouchon local
+    WHEN il valide deux fois le paiement par carte, puis modifie son panier et valide de nouveau
+    THEN la même session est réutilisée sans appel à Stripe, puis remplacée sur la même commande
+    """
+    customer, cart_item = _customer_with_cart(db, test_client)
+
+    first = test_client.post('/checkout', data={'payment_method': 'stripe'})
+    second = test_client.post('/checkout', data={'payment_method': 'stripe'})
+    assert first.status_code == second.status_code == 303
+    assert first.location == second.location == 'https://checkout.stripe.test/cs_test_1'
+    assert len(stripe_stub.calls('/v1/checkout/sessions')) == 1
+
+    cart_item.quantity = 3
+    db.session.commit()
+    third = test_client.post('/checkout', data={'payment_method': 'stripe'})
+    assert third.location == 'https://checkout.stripe.test/cs_test_2'
+    assert [r['path'] for r in stripe_stub.requests][-2:] == ['/v1/checkout/sessions/cs_test_1/expire',
+                                                             '/v1/checkout/sessions']
+    # Connexion HTTP réutilisée d'un appel à l'autre
+    assert len({r['client_port'] for r in stripe_stub.requests}) == 1
+
+    db.session.expire_all()
+    orders = db.session.execute(db.select(Order).filter_by(customer_id=customer.id)).scalars().all()
+    assert len(orders) == 1
+    assert [(item.quantity, item.price_at_purchase) for item in orders[0].items] == [(3, 1500)]
+    assert orders[0].total_price == 4500
+
+
+def test_sweeper_cancels_expired_pending_orders(app, db, test_client, stripe_stub):
+    """
+    GIVEN une commande en attente dont la session Stripe a expiré depuis plus que le délai de grâce
+    WHEN le balayage des commandes abandonnées est lancé
+    THEN la commande est annulée par lot et la transition est journalisée
+    """
+    customer, _ = _customer_with_cart(db, test_client)
+    test_client.post('/checkout', data={'payment_method': 'stripe'})
+    order = db.session.execute(db.select(Order).filter_by(customer_id=customer.id)).scalar_one()
+
+    assert sweep_abandoned_orders() == 0
+    later = order.stripe_session_expires_at + timedelta(seconds=app.config['STRIPE_SWEEP_GRACE_SECONDS'] + 1)
+    assert sweep_abandoned_orders(now=later) == 1
+
+    db.session.expire_all()
+    assert db.session.get(Order, order.id).status == 'Annulée'
+    event = db.session.execute(db.select(OrderStatusEvent).filter_by(order_id=order.id, to_status='Annulée')).scalar_one()
+    assert event.actor == 'sweeper'
+
+
+def test_checkout_charges_database_price_not_snapshot(app, db, test_client, stripe_stub, monkeypatch):
+    """
+    GIVEN un instantané du catalogue en mémoire, puis un prix modifié en base sans l'invalider
+    WHEN le client paie par carte, puis à la livraison
+    THEN Stripe, les lignes et le total de commande utilisent le prix de la base
+    """
+    monkeypatch.setitem(app.config, 'CATALOG_SNAPSHOT_CHECK_SECONDS', 3600)
+    customer, cart_item = _customer_with_cart(db, test_client)
+    assert current_catalog().product(cart_item.product_id).price == 1500
+    # UPDATE en masse : ne fait pas avancer la version du catalogue, l'instantané reste périmé
+    db.session.execute(sa.update(Product).where(Product.id == cart_item.product_id).values(price=2000))
+    db.session.commit()
+    assert current_catalog().product(cart_item.product_id).price == 1500
+
+    test_client.post('/checkout', data={'payment_method': 'stripe'})
+    form = stripe_stub.calls('/v1/checkout/sessions')[-1]['form']
+    assert form['line_items[0][price_data][unit_amount]'] == ['2000']
+    pending = db.session.execute(db.select(Order).filter_by(customer_id=customer.id)).scalar_one()
+    assert pending.total_price == 4000 and pending.items[0].price_at_purchase == 2000
+
+    test_client.post('/checkout', data={'payment_method': 'cod'})
+    db.session.expire_all()
+    order = db.session.execute(db.select(Order).filter_by(customer_id=customer.id, status='Paiement à la livraison')).scalar_one()
+    assert order.total_price == 4000 and order.items[0].price_at_purchase == 2000
+
+
+def test_sweeper_spares_orders_with_unresolved_payment_events(app, db, test_client, stripe_stub):
+    """
+    GIVEN une commande en attente, session expirée, dont la notification de paiement est encore retentée
+    WHEN le balayage des commandes abandonnées est lancé
+    THEN la commande n'est pas annulée tant que la notification n'est pas traitée
+    """
+    customer, _ = _customer_with_cart(db, test_client)
+    test_client.post('/checkout', data={'payment_method': 'stripe'})
+    order = db.session.execute(db.select(Order).filter_by(customer_id=customer.id)).scalar_one()
+    event = WebhookEvent(provider='stripe', event_id='evt_retry', event_type='checkout.session.completed',
+                         order_id=order.id, payload='{}', status='pending', attempts=3)
+    db.session.add(event)
+    db.session.commit()
+    later = order.stripe_session_expires_at + timedelta(seconds=app.config['STRIPE_SWEEP_GRACE_SECONDS'] + 1)
+
+    assert sweep_abandoned_orders(now=later) == 0
+    event.status = 'failed'
+    db.session.commit()
+    assert sweep_abandoned_orders(now=later) == 0
+    assert db.session.get(Order, order.id).status == 'En attente de paiement'
+
+    event.status = 'done'
+    db.session.commit()
+    assert sweep_abandoned_orders(now=later) == 1
@@ -0,0 +1,54 @@
+import os
+from sync_dirs import sync_dirs, MANIFEST_NAME
+
+
+def _write(path, content):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w') as f:
+        f.write(content)
+
+
+def test_sync_copies_then_skips_unchanged_files(tmp_path):
+    """
+    GIVEN un répertoire source contenant des fichiers et un sous-dossier
+    WHEN la synchronisation est exécutée deux fois de suite
+    THEN la première exécution copie tout et écrit le manifeste, la seconde ne copie rien
+    """
+    src, dst = tmp_path / 'src', tmp_path / 'dst'
+    _write(str(src / 'a.jpg'), 'a')
+    _write(str(src / 'sub' / 'b.jpg'), 'bb')
+    os.makedirs(dst)
+
+    stats = sync_dirs(str(src), str(dst), jobs=2)
+    assert stats['copied'] == 2
+    assert (dst / 'sub' / 'b.jpg').read_text() == 'bb'
+    assert (dst / MANIFEST_NAME).exists()
+
+    stats = sync_dirs(str(src), str(dst), jobs=2)
+    assert stats['copied'] == 0
+    assert stats['deleted'] == 0
+
+
+def test_sync_deletes_and_dry_run(tmp_path):
+    """
+    GIVEN une destination déjà synchronisée
+    WHEN un fichier et un dossier sont supprimés de la source
+    THEN le dry-run annonce les suppressions sans les appliquer, puis la vraie exécution les applique
+    """
+    src, dst = tmp_path / 'src', tmp_path / 'dst'
+    _write(str(src / 'a.jpg'), 'a')
+    _write(str(src / 'old' / 'c.jpg'), 'c')
+    os.makedirs(dst)
+    sync_dirs(str(src), str(dst))
+
+    os.remove(src / 'old' / 'c.jpg')
+    os.rmdir(src / 'old')
+
+    stats = sync_dirs(str(src), str(dst), dry_run=True)
+    assert stats['plan']['delete'] == ['old/c.jpg']
+    assert stats['plan']['rmdir'] == ['old']
+    assert (dst / 'old' / 'c.jpg').exists()
+
+    sync_dirs(str(src), str(dst))
+    assert not (dst / 'old').exists()
+    assert (dst / 'a.jpg').exists()
@@ -0,0 +1,66 @@
+from datetime import datetime, timedelta, timezone
+from app.models import Banner, Category, OrderSequence, PageContent, Product
+from app.versioning import catalog_version, changed_since, last_modified, row_etag
+
+
+def test_updates_bump_row_version_timestamp_and_catalog(app, db):
+    """
+    GIVEN une bannière et une page enregistrées il y a une semaine
+    WHEN la bannière est modifiée
+    THEN sa version, son updated_at et son ETag avancent, pas la version du catalogue,
+         et seule elle ressort des modifications récentes
+    """
+    week_ago = datetime.now(timezone.utc).replace(tzinfo=None) - timedelta(days=7)
+    banner = Banner(title='Promo Tabaski', position='top', updated_at=week_ago)
+    page = PageContent(page_name='a-propos', title='À propos', updated_at=week_ago)
+    db.session.add_all([banner, page])
+    db.session.commit()
+    etag, version = row_etag(banner), catalog_version()
+    since = week_ago + timedelta(days=1)
+    assert db.session.execute(changed_since(Banner, since)).scalars().all() == []
+
+    banner.message = 'Moutons disponibles'
+    db.session.commit()
+    assert banner.version == 2 and banner.updated_at > since
+    assert row_etag(banner) != etag and catalog_version() == version
+    assert db.session.execute(changed_since(Banner, since.replace(tzinfo=timezone.utc))).scalars().all() == [banner]
+    assert db.session.execute(changed_since(PageContent, since)).scalars().all() == []
+    assert last_modified(PageContent) == week_ago
+
+
+def test_api_incremental_sync_and_sitemap_lastmod(app, db, test_client):
+    """
+    GIVEN deux produits dont un modifié récemment
+    WHEN un client synchronise l'API avec changed_since, puis lit le sitemap
+    THEN seul le produit modifié est renvoyé, avec son updated_at, et le sitemap porte les lastmod
+    """
+    category = Category(name='Volaille')
+    db.session.add(category)
+    db.session.flush()
+    old = datetime(2026, 1, 1)
+    db.session.add_all([Product(name='Poulet', price=3500, category_id=category.id, updated_at=old),
+                        Product(name='Pintade', price=5000, category_id=category.id, updated_at=old)])
+    db.session.commit()
+    pintade = db.session.execute(db.select(Product).filter_by(name='Pintade')).scalar_one()
+    pintade.price = 4500
+    db.session.commit()
+
+    data = test_client.get('/api/v1/products?changed_since=2026-02-01T00:00:00&fields=name,updated_at').get_json()['data']
+    assert [row['name'] for row in data] == ['Pintade'] and data[0]['updated_at'] > '2026-02-01'
+    assert test_client.get('/api/v1/products?changed_since=hier').status_code == 400
+
+    sitemap = test_client.get('/sitemap.xml').get_data(as_text=True)
+    assert '<lastmod>2026-01-01</lastmod>' in sitemap
+
+
+def test_catalog_version_does_not_use_order_counters(app, db):
+    """
+    GIVEN le catalogue
+    WHEN une catégorie est créée
+    THEN la version globale avance dans sa propre table, sans ligne dans order_sequence
+    """
+    version = catalog_version()
+    db.session.add(Category(name='Épices'))
+    db.session.commit()
+    assert catalog_version() == version + 1
+    assert db.session.get(OrderSequence, 'catalog_version') is None
@@ -0,0 +1,152 @@
+import hmac
+import json
+import time
+import hashlib
+from datetime import datetime, timedelta, timezone
+from app.models import Customer, Product, Category, Order, OrderItem, StaffUser, WebhookEvent
+from app.payments import providers
+from app.payments.webhooks import process_pending_events
+from app.utils.order_events import set_order_status
+from app.utils.order_sequence import PAID_AWAITING_STOCK_STATUS
+from app.utils.stock_alerts import send_low_stock_digest
+
+WAVE_SECRET = 'wave-test-secret'
+
+
+def _pending_order(db, stock=5, quantity=2):
+    customer = Customer(username='aminata', email='aminata@example.com', password='x')
+    category = Category(name='Légumes')
+    db.session.add_all([customer, category])
+    db.session.flush()
+    product = Product(name='Oignons', price=500, stock=stock, category_id=category.id)
+    db.session.add(product)
+    db.session.flush()
+    order = Order(customer_id=customer.id, total_price=500 * quantity)
+    set_order_status(order, 'En attente de paiement')
+    order.items.append(OrderItem(product_id=product.id, quantity=quantity, price_at_purchase=500))
+    db.session.add(order)
+    db.session.commit()
+    return order, product
+
+
+def _post_wave_event(test_client, event_id, order_id, secret=WAVE_SECRET):
+    body = json.dumps({'id': event_id, 'type': 'checkout.session.completed',
+                       'data': {'client_reference': str(order_id), 'payment_status': 'succeeded'}}).encode()
+    timestamp = str(int(time.time()))
+    signature = hmac.new(secret.encode(), timestamp.encode() + body, hashlib.sha256).hexdigest()
+    return test_client.post('/paiements/webhook/wave', data=body, content_type='application/json',
+                            headers={'Wave-Signature': f't={timestamp},v1={signature}'})
+
+
+def _enable_wave(app, monkeypatch):
+    monkeypatch.setitem(app.config, 'ENABLE_WAVE_MONEY', True)
+    monkeypatch.setitem(app.config, 'WAVE_WEBHOOK_SECRET', WAVE_SECRET)
+
+
+def test_webhook_is_stored_once_and_processed_in_background(app, db, test_client, monkeypatch):
+    """
+    GIVEN une commande en attente de paiement et le fournisseur Wave activé
+    WHEN la même notification signée est reçue deux fois, puis les événements sont traités
+    THEN un seul événement est enregistré, la commande est payée et le stock décrémenté une fois
+    """
+    _enable_wave(app, monkeypatch)
+    order, product = _pending_order(db)
+
+    assert _post_wave_event(test_client, 'EV_1', order.id).status_code == 200
+    assert _post_wave_event(test_client, 'EV_1', order.id).status_code == 200
+    assert db.session.execute(db.select(db.func.count(WebhookEvent.id))).scalar() == 1
+    assert db.session.get(Order, order.id).status == 'En attente de paiement'
+
+    assert process_pending_events() == 1
+    db.session.expire_all()
+    assert db.session.get(Order, order.id).status == 'Payée'
+    assert db.session.get(Product, product.id).stock == 3
+    event = db.session.execute(db.select(WebhookEvent)).scalar_one()
+    assert (event.status, event.attempts) == ('done', 1)
+    assert process_pending_events() == 0
+
+
+def test_invalid_signature_is_rejected(app, db, test_client, monkeypatch):
+    """
+    GIVEN le fournisseur Wave activé
+    WHEN une notification est signée avec un mauvais secret
+    THEN elle est refusée en 400 et rien n'est enregistré
+    """
+    _enable_wave(app, monkeypatch)
+    assert _post_wave_event(test_client, 'EV_2', 1, secret='mauvais').status_code == 400
+    assert db.session.execute(db.select(WebhookEvent)).first() is None
+
+
+def test_paid_order_with_insufficient_stock_is_kept_and_reported(app, db, test_client, monkeypatch):
+    """
+    GIVEN une commande dont le stock est devenu insuffisant avant la confirmation du paiement
+    WHEN sa notification de paiement est traitée, puis le récapitulatif du personnel envoyé
+    THEN le paiement est gardé (commande « Payée - stock insuffisant », stock à zéro, événement traité)
+         et la commande figure dans le récapitulatif envoyé aux administrateurs
+    """
+    _enable_wave(app, monkeypatch)
+    order, product = _pending_order(db, stock=1, quantity=2)
+    db.session.add(StaffUser(username='gerant', email='gerant@example.com', password='x', role='admin'))
+    db.session.commit()
+    _post_wave_event(test_client, 'EV_3', order.id)
+
+    process_pending_events()
+    db.session.expire_all()
+    event = db.session.execute(db.select(WebhookEvent)).scalar_one()
+    assert (event.status, event.attempts) == ('done', 1)
+    order = db.session.get(Order, order.id)
+    assert order.status == PAID_AWAITING_STOCK_STATUS and order.sequence_number is not None
+    assert db.session.get(Product, product.id).stock == 0
+
+    mailman = app.extensions['mailman']
+    mailman.outbox = []
+    assert send_low_stock_digest() >= 1
+    digest = mailman.outbox[-1]
+    assert digest.to == ['gerant@example.com'] and f'Commande #{order.id}' in digest.body
+
+
+def test_failed_event_is_retried_later(app, db, test_client, monkeypatch):
+    """
+    GIVEN une commande en attente de paiement
+    WHEN le traitement de sa notification échoue sur une erreur passagère
+    THEN l'événement reste en attente avec une nouvelle tentative planifiée et l'erreur enregistrée
+    """
+    _enable_wave(app, monkeypatch)
+    order, _ = _pending_order(db)
+    _post_wave_event(test_client, 'EV_4', order.id)
+
+    def _unavailable(order_id, actor):
+        raise ConnectionError('Base momentanément indisponible')
+    monkeypatch.setattr(providers, 'mark_order_paid', _unavailable)
+
+    process_pending_events()
+    db.session.expire_all()
+    event = db.session.execute(db.select(WebhookEvent)).scalar_one()
+    assert event.status == 'pending' and event.attempts == 1
+    assert 'indisponible' in event.last_error
+    assert event.next_attempt_at > datetime.now(timezone.utc).replace(tzinfo=None) + timedelta(seconds=20)
+    assert db.session.get(Order, order.id).status == 'En attente de paiement'
+
+
+def test_orange_money_status_changes_are_distinct_events(app, db, test_client, monkeypatch):
+    """
+    GIVEN le fournisseur Orange Money activé et une commande en attente
+    WHEN la même transaction est notifiée PENDING, puis SUCCESS, puis SUCCESS de nouveau
+    THEN les deux statuts sont enregistrés, la répétition est ignorée et la commande est payée
+    """
+    monkeypatch.setitem(app.config, 'ENABLE_ORANGE_MONEY', True)
+    monkeypatch.setitem(app.config, 'ORANGE_MONEY_WEBHOOK_SECRET', 'om-secret')
+    order, _ = _pending_order(db)
+    with app.test_request_context():
+        params = providers.orange_money_notify_params(order.id)
+
+    for status in ('PENDING', 'SUCCESS', 'SUCCESS'):
+        response = test_client.post('/paiements/webhook/orange_money', query_string=params,
+                                    json={'txnid': 'MP2401', 'status': status, 'notif_token': 't'})
+        assert response.status_code == 200
+
+    event_ids = db.session.execute(db.select(WebhookEvent.event_id).order_by(WebhookEvent.id)).scalars().all()
+    assert event_ids == ['MP2401:PENDING', 'MP2401:SUCCESS']
+    process_pending_events()
+    db.session.expire_all()
+    assert db.session.get(Order, order.id).status == 'Payée'
@@ -1,13 +1,7 @@
-# Monkey-patch for collections.Mapping import error in old libraries
-import collections
-if not hasattr(collections, 'Mapping'):
-    import collections.abc
-    collections.Mapping = collections.abc.Mapping
-
 from app import create_app
-from waitress import serve
 
 app = create_app()
 
 if __name__ == "__main__":
-    serve(app, host="0.0.0.0", port=8000)
\ No newline at end of file
+    from waitress import serve
+    serve(app, host="0.0.0.0", port=8000)